@@ -0,0 +1,81 @@
+"""Rebuild a topology table from a delta change stream written by the simulator.
+
+The simulator appends neighbor_distances_delta.csv and clusterhead_distances_delta.csv as
+version, time, op (ADD/CHANGE/REMOVE) rows. Replaying them up to a timestamp gives the
+table exactly as the old full rewrites would have left it at that time.
+
+Usage:
+    python compact_topology_deltas.py neighbor_distances_delta.csv -o neighbor_distances.csv
+    python compact_topology_deltas.py clusterhead_distances_delta.csv --at 1500 -o clusterhead_distances.csv
+"""
+import argparse
+import csv
+
+KEY_COLUMNS = {
+    "node_id": ["node_id", "neighbor_id"],
+    "clusterhead_1": ["clusterhead_1", "clusterhead_2"],
+}
+
+
+def key_columns(header):
+    """Return the key columns of a stream from its header (the columns right after 'op')."""
+    first = header[3]
+    return KEY_COLUMNS.get(first, [first])
+
+
+def reconstruct(path, at_time=None):
+    """
+    Replay a delta stream and return the table at a timestamp.
+
+    Args:
+        path (str): delta stream written by DeltaCsvExporter.
+        at_time (float): rebuild the table as of this simulation time, None for the end.
+
+    Returns:
+        (list, dict, float): data columns, {key tuple: row list} and the time of the last
+        applied export.
+    """
+    table = {}
+    last_time = None
+    with open(path, newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        n_keys = len(key_columns(header))
+        for row in reader:
+            t = float(row[1])
+            if at_time is not None and t > at_time:
+                break  # exports are appended in time order
+            op = row[2]
+            data = row[3:]
+            key = tuple(data[:n_keys])
+            if op == "REMOVE":
+                table.pop(key, None)
+            else:
+                table[key] = data
+            last_time = t
+    return header[3:], table, last_time
+
+
+def compact(path, out_path, at_time=None):
+    """Write the table reconstructed from a delta stream in the original full-export schema."""
+    columns, table, last_time = reconstruct(path, at_time)
+    with open(out_path, "w", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(columns)
+        for key in sorted(table, key=lambda k: tuple(int(x) for x in k)):
+            w.writerow(table[key])
+    return len(table), last_time
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("stream", help="delta stream, e.g. neighbor_distances_delta.csv")
+    parser.add_argument("--at", type=float, default=None, help="simulation time to rebuild (default: end of run)")
+    parser.add_argument("-o", "--output", default=None, help="output CSV (default: stream name without _delta)")
+    args = parser.parse_args()
+
+    out = args.output or args.stream.replace("_delta", "")
+    if out == args.stream:
+        out = args.stream.replace(".csv", "_snapshot.csv")
+    rows, last_time = compact(args.stream, out, args.at)
+    print(f"Rebuilt {rows} rows as of t={last_time} into '{out}'")
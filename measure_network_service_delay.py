@@ -1,94 +1,149 @@
+import sys
+
+import numpy as np
 import pandas as pd
-import math
-
-# Load and normalize
-df = pd.read_csv("packet_routes.csv")
-df['source'] = df['source'].astype(str).str.strip('"').str.strip()
-df['dest']   = df['dest'].astype(str).str.strip('"').str.strip()
-df['time']   = df['time'].astype(float)
-
-df['is_request'] = df['packet_type'] == 'NETWORK_REQUEST'
-df['is_reply']   = df['packet_type'] == 'NETWORK_REPLY'
-
-# Track active request blocks by (source,dest)
-active_blocks = {}
-
-# Store results
-blocks = []
-
-for _, row in df.iterrows():
-    key = (row['source'], row['dest'])
-    
-    # Handle requests
-    if row['is_request']:
-        if key not in active_blocks:
-            active_blocks[key] = {
-                'first_request_time': row['time'],
-                'request_source': row['source'],
-                'request_dest': row['dest'],
-                'reply_times': [],
-                'direct_reply_time': None
-            }
-
-    # Handle replies
-    elif row['is_reply']:
-        # A reply matches a request if: request.source = reply.dest AND request.dest = reply.source
-        matching_key = (row['dest'], row['source'])
-        if matching_key in active_blocks:
-            block = active_blocks[matching_key]
-            t = row['time']
-            block['reply_times'].append(t)
-            
-            # Track DIRECT reply time
-            if str(row.get('path_type','')).upper() == 'DIRECT':
-                block['direct_reply_time'] = t
-                
-                # Determine last intermediate reply
-                if len(block['reply_times']) >= 2:
-                    last_intermediate = block['reply_times'][-2]
-                    used_fallback = False
-                else:
-                    last_intermediate = block['direct_reply_time']
-                    used_fallback = True
-
-                delta = block['direct_reply_time'] - block['first_request_time']
-
-                blocks.append({
-                    'request_source': block['request_source'],
-                    'request_dest': block['request_dest'],
-                    'first_request_time': block['first_request_time'],
-                    'last_intermediate_reply_time': (None if used_fallback else block['reply_times'][-2]),
-                    'direct_reply_time': block['direct_reply_time'],
-                    'delta': delta,
-                    'used_fallback_direct_as_intermediate': used_fallback,
-                    'num_replies': len(block['reply_times'])
-                })
-
-                # Remove completed block
-                del active_blocks[matching_key]
-
-# Handle any remaining requests that never got a DIRECT reply
-for block in active_blocks.values():
-    blocks.append({
-        'request_source': block['request_source'],
-        'request_dest': block['request_dest'],
-        'first_request_time': block['first_request_time'],
-        'last_intermediate_reply_time': None,
-        'direct_reply_time': None,
-        'delta': None,
-        'used_fallback_direct_as_intermediate': False,
-        'num_replies': len(block['reply_times'])
+
+INPUT_FILE = "packet_routes.csv"
+OUTPUT_FILE = "network_service_delay_results.csv"
+PERCENTILES_FILE = "network_service_delay_percentiles.csv"
+CHUNK_SIZE = 500_000  # rows of packet_routes.csv read at a time
+PERCENTILES = [50, 90, 95, 99]
+
+RESULT_COLUMNS = ['request_source', 'request_dest', 'first_request_time', 'last_intermediate_reply_time',
+                  'direct_reply_time', 'delta', 'used_fallback_direct_as_intermediate', 'num_replies']
+KEY = ['k1', 'k2']
+SEG = ['k1', 'k2', 'seg']
+
+# A request opens a block keyed by (source,dest). A reply belongs to the block whose key is
+# (reply.dest, reply.source); every reply after the first request of the block is counted and
+# the first DIRECT reply closes it. Events of one key are therefore cut into segments that end
+# at each DIRECT reply; a segment becomes a block at its first request and replies before that
+# request are ignored, exactly like the row-by-row matcher this replaces.
+
+
+def read_events(path, chunk_size):
+    """Yield NETWORK_REQUEST/NETWORK_REPLY rows of the trace chunk by chunk with typed columns."""
+    offset = 0
+    for chunk in pd.read_csv(path, chunksize=chunk_size, dtype=str, keep_default_na=False):
+        path_col = 'path_type' if 'path_type' in chunk.columns else chunk.columns[-1]
+        chunk['row'] = np.arange(offset, offset + len(chunk), dtype=np.int64)
+        offset += len(chunk)
+        ptype = chunk['packet_type']
+        chunk = chunk[(ptype == 'NETWORK_REQUEST') | (ptype == 'NETWORK_REPLY')]
+        if chunk.empty:
+            continue
+        source = chunk['source'].str.strip('"').str.strip()
+        dest = chunk['dest'].str.strip('"').str.strip()
+        is_request = (chunk['packet_type'] == 'NETWORK_REQUEST').to_numpy()
+        yield pd.DataFrame({
+            'row': chunk['row'].to_numpy(),
+            'time': chunk['time'].astype(np.float64).to_numpy(),
+            'k1': np.where(is_request, source, dest),
+            'k2': np.where(is_request, dest, source),
+            'is_request': is_request,
+            'is_direct': ~is_request & (chunk[path_col].str.upper() == 'DIRECT').to_numpy(),
+        })
+
+
+def match_blocks(ev):
+    """
+    Match requests with replies in a batch of events sorted by row.
+
+    Returns:
+        (DataFrame, DataFrame): closed blocks, and the events of blocks still waiting for their
+        DIRECT reply (to be carried into the next batch).
+    """
+    ev = ev.reset_index(drop=True)
+    direct = ev['is_direct'].astype(np.int64)
+    ev['seg'] = direct.groupby([ev['k1'], ev['k2']], sort=False).cumsum() - direct
+
+    requests = ev[ev['is_request']]
+    opened = requests.groupby(SEG, sort=False).agg(first_row=('row', 'min'), first_request_time=('time', 'first'))
+    ev = ev.merge(opened, left_on=SEG, right_index=True, how='inner')
+    ev = ev[ev['row'] >= ev['first_row']]
+
+    closed_keys = ev.loc[ev['is_direct'], SEG]
+    closed_idx = pd.MultiIndex.from_frame(closed_keys)
+    in_closed = pd.MultiIndex.from_frame(ev[SEG]).isin(closed_idx)
+    pending = ev.loc[~in_closed, ['row', 'time', 'k1', 'k2', 'is_request', 'is_direct']]
+
+    ev = ev[in_closed]
+    replies = ev[~ev['is_request']]
+    blocks = replies.groupby(SEG, sort=False).agg(num_replies=('row', 'size'))
+    blocks = blocks.join(opened['first_request_time'])
+    finals = replies[replies['is_direct']].set_index(SEG)
+    blocks['direct_reply_time'] = finals['time']
+    blocks['close_row'] = finals['row']
+    intermediate = replies[~replies['is_direct']].groupby(SEG, sort=False)['time'].last()
+    blocks['last_intermediate_reply_time'] = intermediate
+    return blocks.reset_index(), pending
+
+
+def finish_blocks(blocks, closed):
+    """Shape matched blocks into the result schema."""
+    out = pd.DataFrame({
+        'request_source': blocks['k1'],
+        'request_dest': blocks['k2'],
+        'first_request_time': blocks['first_request_time'],
     })
+    if closed:
+        out['last_intermediate_reply_time'] = blocks['last_intermediate_reply_time']
+        out['direct_reply_time'] = blocks['direct_reply_time']
+        out['delta'] = blocks['direct_reply_time'] - blocks['first_request_time']
+        out['used_fallback_direct_as_intermediate'] = blocks['num_replies'] < 2
+    else:
+        out['last_intermediate_reply_time'] = np.nan
+        out['direct_reply_time'] = np.nan
+        out['delta'] = np.nan
+        out['used_fallback_direct_as_intermediate'] = False
+    out['num_replies'] = blocks['num_replies'].astype(np.int64)
+    return out[RESULT_COLUMNS]
+
+
+def measure_service_delay(path=INPUT_FILE, chunk_size=CHUNK_SIZE):
+    """Stream the trace and return one row per NETWORK_REQUEST block in the original schema."""
+    results = []
+    pending = None
+    for events in read_events(path, chunk_size):
+        if pending is not None and not pending.empty:
+            events = pd.concat([pending, events], ignore_index=True)
+        blocks, pending = match_blocks(events)
+        if not blocks.empty:
+            results.append(finish_blocks(blocks.sort_values('close_row'), closed=True))
+
+    # Handle any remaining requests that never got a DIRECT reply
+    if pending is not None and not pending.empty:
+        first = pending[pending['is_request']].groupby(KEY, sort=False).agg(
+            first_row=('row', 'min'), first_request_time=('time', 'first'))
+        counts = pending[~pending['is_request']].groupby(KEY, sort=False).size()
+        first['num_replies'] = counts.reindex(first.index, fill_value=0)
+        results.append(finish_blocks(first.sort_values('first_row').reset_index(), closed=False))
+
+    if not results:
+        return pd.DataFrame(columns=RESULT_COLUMNS)
+    return pd.concat(results, ignore_index=True)
+
+
+def latency_percentiles(results, percentiles=PERCENTILES):
+    """Return service delay percentiles of the closed blocks."""
+    delta = results['delta'].dropna().to_numpy(dtype=np.float64)
+    rows = [{'percentile': f"p{p}", 'delta': np.percentile(delta, p) if len(delta) else np.nan} for p in percentiles]
+    rows.append({'percentile': 'mean', 'delta': delta.mean() if len(delta) else np.nan})
+    rows.append({'percentile': 'max', 'delta': delta.max() if len(delta) else np.nan})
+    return pd.DataFrame(rows)
 
-results = pd.DataFrame(blocks)
 
-# Optional: replace missing last_intermediate_reply_time with None for clarity
-results['last_intermediate_reply_time'] = results['last_intermediate_reply_time'].where(
-    pd.notna(results['last_intermediate_reply_time']), None)
+if __name__ == "__main__":
+    input_file = sys.argv[1] if len(sys.argv) > 1 else INPUT_FILE
+    results = measure_service_delay(input_file)
 
-# Write to CSV
-results.to_csv("network_service_delay_results.csv", index=False)
+    # Write to CSV
+    results.to_csv(OUTPUT_FILE, index=False)
+    percentiles = latency_percentiles(results)
+    percentiles.to_csv(PERCENTILES_FILE, index=False)
 
-print(f"Results written to 'network_service_delay_results.csv'")
-print(f"Total requests processed: {len(results)}")
-print(f"Unique clusterheads: {results['request_source'].nunique()}")
+    print(f"Results written to '{OUTPUT_FILE}'")
+    print(f"Total requests processed: {len(results)}")
+    print(f"Unique clusterheads: {results['request_source'].nunique()}")
+    for _, row in percentiles.iterrows():
+        print(f"  {row['percentile']:>5}: {row['delta']}")
@@ -0,0 +1,93 @@
+"""Measures the cost of visualisation calls in a headless run.
+
+Runs the same 5k-node simulation twice with SIM_VISUALIZATION off: once with nodes drawing
+through the old __getattr__-based fake scene, once through the NullSink installed by
+wsnlab_vis.Simulator. Each node changes role every tick and reports it the way the scenario
+code does (node color, tx range circle, parent link), so the difference between the two
+runs is the headless visualisation overhead.
+
+Usage: python benchmark_headless_vis.py [nodes] [ticks]
+"""
+import sys
+import time
+
+from source import wsnlab_vis as wsn
+
+NODE_COUNT = 5000
+TICKS = 50
+
+
+###########################################################
+class _FakeScene:
+    """The headless scene used before VisSink: every attribute is a generated no-op."""
+    def _fake_method(self, *args, **kwargs):
+        pass
+
+    def __getattr__(self, name):
+        return self._fake_method
+
+
+###########################################################
+class BenchNode(wsn.Node):
+    """Node reporting a role change per tick through its VisSink."""
+
+    def run(self):
+        for tick in range(TICKS):
+            yield self.timeout(1)
+            self.vis.nodecolor(self.id, 1, tick % 2, 0)
+            self.remove_tx_range()
+            self.draw_tx_range()
+            self.parent_gui = tick
+            self.erase_parent()
+            self.draw_parent()
+
+
+###########################################################
+class LegacyNode(wsn.Node):
+    """Node drawing directly on a _FakeScene like the scenario code used to."""
+
+    def init(self):
+        self.scene = _FakeScene()
+
+    def run(self):
+        for tick in range(TICKS):
+            yield self.timeout(1)
+            self.scene.nodecolor(self.id, 1, tick % 2, 0)
+            if hasattr(self, "tx_range_obj"):
+                self.scene.delshape(self.tx_range_obj)
+                self.tx_range_obj = None
+            tx_id = f"tx_{self.id}"
+            self.scene.delshape(tx_id)
+            self.tx_range_obj = tx_id
+            self.scene.circle(self.pos[0], self.pos[1], self.tx_range, id=tx_id, line="wsnsimpy:tx")
+            self.parent_gui = tick
+            if self.parent_gui is not None:
+                self.scene.dellink(self.parent_gui, self.id, "parent")
+            self.scene.addlink(self.parent_gui, self.id, "parent")
+            self.parent_link_id = [self.parent_gui, self.id, "parent"]
+
+
+###########################################################
+def run_once(node_class, node_count):
+    """Builds a headless network of node_count nodes and returns the wall time of its run."""
+    sim = wsn.Simulator(duration=TICKS + 1, timescale=0, visual=False)
+    # nodes are appended directly: add_node keeps every neighbor list sorted, which is
+    # quadratic in node_count and irrelevant here
+    for i in range(node_count):
+        sim.nodes.append(node_class(sim, i, (i % 100, i // 100)))
+    start = time.perf_counter()
+    sim.run()
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    node_count = int(sys.argv[1]) if len(sys.argv) > 1 else NODE_COUNT
+    if len(sys.argv) > 2:
+        TICKS = int(sys.argv[2])
+    legacy = run_once(LegacyNode, node_count)
+    null_sink = run_once(BenchNode, node_count)
+    calls = node_count * TICKS
+    print(f"{node_count} nodes x {TICKS} role changes")
+    print(f"  _FakeScene: {legacy:.3f} s ({legacy / calls * 1e6:.2f} us per role change)")
+    print(f"  NullSink:   {null_sink:.3f} s ({null_sink / calls * 1e6:.2f} us per role change)")
+    print(f"  speedup:    {legacy / null_sink:.2f}x")
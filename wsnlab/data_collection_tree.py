@@ -129,7 +129,7 @@ class SensorNode(wsn.Node):
         Returns:
 
         """
-        self.scene.nodecolor(self.id, 1, 1, 1) # sets self color to white
+        self.vis.nodecolor(self.id, 1, 1, 1) # sets self color to white
         self.sleep()
         self.addr = None
         self.ch_addr = None #clusterhead address
@@ -183,16 +183,16 @@ class SensorNode(wsn.Node):
 
         if recolor:
             if new_role == Roles.UNDISCOVERED:
-                self.scene.nodecolor(self.id, 1, 1, 1)
+                self.vis.nodecolor(self.id, 1, 1, 1)
             elif new_role == Roles.UNREGISTERED:
-                self.scene.nodecolor(self.id, 1, 1, 0)
+                self.vis.nodecolor(self.id, 1, 1, 0)
             elif new_role == Roles.REGISTERED:
-                self.scene.nodecolor(self.id, 0, 1, 0)
+                self.vis.nodecolor(self.id, 0, 1, 0)
             elif new_role == Roles.CLUSTER_HEAD:
-                self.scene.nodecolor(self.id, 0, 0, 1)
+                self.vis.nodecolor(self.id, 0, 0, 1)
                 self.draw_tx_range()
             elif new_role == Roles.ROOT:
-                self.scene.nodecolor(self.id, 0, 0, 0)
+                self.vis.nodecolor(self.id, 0, 0, 0)
                 self.set_timer('TIMER_EXPORT_CH_CSV', config.EXPORT_CH_CSV_INTERVAL)
                 self.set_timer('TIMER_EXPORT_NEIGHBOR_CSV', config.EXPORT_NEIGHBOR_CSV_INTERVAL)
 
@@ -204,7 +204,7 @@ class SensorNode(wsn.Node):
         if self.role != Roles.UNDISCOVERED:
             self.kill_all_timers()
             self.log('I became UNREGISTERED')
-        self.scene.nodecolor(self.id, 1, 1, 0)
+        self.vis.nodecolor(self.id, 1, 1, 0)
         self.erase_parent()
         self.addr = None
         self.ch_addr = None
@@ -524,7 +524,7 @@ class SensorNode(wsn.Node):
                     write_clusterhead_distances_csv("clusterhead_distances.csv")
                 except Exception as e:
                     self.log(f"CH CSV export error: {e}")
-                self.scene.nodecolor(self.id, 0, 0, 1)
+                self.vis.nodecolor(self.id, 0, 0, 1)
                 self.ch_addr = pck['addr']
                 self.send_network_update()
                 # yield self.timeout(.5)
@@ -579,7 +579,7 @@ class SensorNode(wsn.Node):
 
         """
         if name == 'TIMER_ARRIVAL':  # it wakes up and set timer probe once time arrival timer fired
-            self.scene.nodecolor(self.id, 1, 0, 0)  # sets self color to red
+            self.vis.nodecolor(self.id, 1, 0, 0)  # sets self color to red
             self.wake_up()
             self.wake_up_time = self.now #measure time when powered on
             self.set_timer('TIMER_PROBE', 1)
@@ -592,7 +592,7 @@ class SensorNode(wsn.Node):
             else:  # if the counter reached the threshold
                 if self.is_root_eligible:  # if the node is root eligible, it becomes root
                     self.set_role(Roles.ROOT)
-                    self.scene.nodecolor(self.id, 0, 0, 0)
+                    self.vis.nodecolor(self.id, 0, 0, 0)
                     self.addr = wsn.Addr(self.id, 254)
                     self.ch_addr = wsn.Addr(self.id, 254)
                     self.root_addr = self.addr
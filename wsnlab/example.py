@@ -74,7 +74,7 @@ class SensorNode(wsn.Node):
         Returns:
 
         """
-        self.scene.nodecolor(self.id, 1, 1, 1) # sets self color to white
+        self.vis.nodecolor(self.id, 1, 1, 1) # sets self color to white
         self.sleep()
         self.addr = None
         self.ch_addr = None
@@ -96,7 +96,7 @@ class SensorNode(wsn.Node):
         if self.role != Roles.UNDISCOVERED:
             self.kill_all_timers()
             self.log('I became UNREGISTERED')
-        self.scene.nodecolor(self.id, 1, 1, 0)
+        self.vis.nodecolor(self.id, 1, 1, 0)
         self.erase_parent()
         self.addr = None
         self.ch_addr = None
@@ -137,16 +137,16 @@ class SensorNode(wsn.Node):
 
         if recolor:
             if new_role == Roles.UNDISCOVERED:
-                self.scene.nodecolor(self.id, 150, 150, 150)
+                self.vis.nodecolor(self.id, 150, 150, 150)
             elif new_role == Roles.UNREGISTERED:
-                self.scene.nodecolor(self.id, 1, 0.5, 0)
+                self.vis.nodecolor(self.id, 1, 0.5, 0)
             elif new_role == Roles.REGISTERED:
-                self.scene.nodecolor(self.id, 0, 1, 0)
+                self.vis.nodecolor(self.id, 0, 1, 0)
             elif new_role == Roles.CLUSTER_HEAD:
-                self.scene.nodecolor(self.id, 0, 0, 1)
+                self.vis.nodecolor(self.id, 0, 0, 1)
                 self.draw_tx_range()
             elif new_role == Roles.ROOT:
-                self.scene.nodecolor(self.id, 0, 0, 0)
+                self.vis.nodecolor(self.id, 0, 0, 0)
                 #self.draw_tx_range()
                 self.set_timer('TIMER_EXPORT_CH_CSV', config.EXPORT_CH_CSV_INTERVAL)
                 self.set_timer('TIMER_EXPORT_NEIGHBOR_CSV', config.EXPORT_NEIGHBOR_CSV_INTERVAL)
@@ -351,7 +351,7 @@ class SensorNode(wsn.Node):
                     write_clusterhead_distances_csv("clusterhead_distances.csv")
                 except Exception as e:
                     self.log(f"CH CSV export error: {e}")
-                self.scene.nodecolor(self.id, 0, 0, 1)
+                self.vis.nodecolor(self.id, 0, 0, 1)
                 self.ch_addr = pck['addr']
                 self.send_network_update()
                 # yield self.timeout(.5)
@@ -5,6 +5,7 @@ sys.path.insert(1, '.')
 from source import wsnlab_vis as wsn
 import math
 from source import config
+from source.address_allocator import AddressAllocator
 from collections import Counter
 
 import csv  # <— add this near your other imports
@@ -97,7 +98,7 @@ class SensorNode(wsn.Node):
         Returns:
 
         """
-        self.scene.nodecolor(self.id, 1, 1, 1) # sets self color to white
+        self.vis.nodecolor(self.id, 1, 1, 1) # sets self color to white
         self.sleep()
         self.addr = None
         self.ch_addr = None #clusterhead address
@@ -111,6 +112,8 @@ class SensorNode(wsn.Node):
         self.hop_count = 99999
         self.neighbors_table = {}  # keeps neighbor information with received HB messages
         self.candidate_parents_table = []
+        self.node_allocator = None  # member node ids, while cluster head
+        self.net_id_allocator = None  # network ids, while root
         self.child_networks_table = {}
         self.members_table = []
         self.net_req_flag = None
@@ -179,20 +182,20 @@ class SensorNode(wsn.Node):
 
         if recolor:
             if new_role == Roles.UNDISCOVERED:
-                self.scene.nodecolor(self.id, 1, 1, 1)
+                self.vis.nodecolor(self.id, 1, 1, 1)
             elif new_role == Roles.UNREGISTERED:
-                self.scene.nodecolor(self.id, 1, 1, 0)
+                self.vis.nodecolor(self.id, 1, 1, 0)
             elif new_role == Roles.REGISTERED:
-                self.scene.nodecolor(self.id, 0, 1, 0)
+                self.vis.nodecolor(self.id, 0, 1, 0)
             elif new_role == Roles.CLUSTER_HEAD:
-                self.scene.nodecolor(self.id, 0, 0, 1)
+                self.vis.nodecolor(self.id, 0, 0, 1)
                 if config.ALLOW_TX_POWER_CHOICE:
                     self.assign_tx_power()
                 else:
                     self.assign_tx_power(config.NODE_DEFAULT_TX_POWER)
                 self.draw_tx_range()
             elif new_role == Roles.ROOT:
-                self.scene.nodecolor(self.id, 0, 0, 0)
+                self.vis.nodecolor(self.id, 0, 0, 0)
                 self.assign_tx_power(config.NODE_DEFAULT_TX_POWER)
                 self.set_timer('TIMER_EXPORT_CH_CSV', config.EXPORT_CH_CSV_INTERVAL)
                 self.set_timer('TIMER_EXPORT_NEIGHBOR_CSV', config.EXPORT_NEIGHBOR_CSV_INTERVAL)
@@ -201,7 +204,7 @@ class SensorNode(wsn.Node):
         if self.role != Roles.UNDISCOVERED:
             self.kill_all_timers()
             self.log('I became UNREGISTERED')
-        self.scene.nodecolor(self.id, 1, 1, 0)
+        self.vis.nodecolor(self.id, 1, 1, 0)
         self.erase_parent()
         self.addr = None
         self.ch_addr = None
@@ -230,6 +233,8 @@ class SensorNode(wsn.Node):
             pck['distance'] = math.hypot(x1 - x2, y1 - y2)
         pck['neighbor_hop_count'] = 1
         self.neighbors_table[pck['gui']] = pck
+        if self.node_allocator is not None:  # a member heard is alive
+            self.node_allocator.renew(pck['gui'], self.now)
 
         if pck['gui'] not in self.child_networks_table.keys() or pck['addr'] not in self.members_table:
             if not any(d['gui'] == pck['gui'] for d in self.candidate_parents_table):
@@ -386,7 +391,7 @@ class SensorNode(wsn.Node):
         Returns:
 
         """
-        self.route_and_forward_package({'dest': self.root_addr, 'type': 'NETWORK_REQUEST', 'source': self.addr})
+        self.route_and_forward_package({'dest': self.root_addr, 'type': 'NETWORK_REQUEST', 'source': self.addr, 'gui': self.id})
 
     ###################
     def send_network_reply(self, dest, addr):
@@ -476,35 +481,29 @@ class SensorNode(wsn.Node):
                 self.send_heart_beat()
             if pck['type'] == 'JOIN_REQUEST':  # it waits and sends join reply message once received join request
                 # yield self.timeout(.5)
-                avail_node_id = None
-                for node_id, avail in self.node_available_dict.items():
-                    if avail is None or avail == pck['gui']:
-                        avail_node_id = node_id
-                        break
+                avail_node_id = self.node_allocator.allocate(pck['gui'], self.now)  # same id again if it asked before
                 if avail_node_id is not None:
-                    self.node_available_dict[avail_node_id] = pck['gui'] #this network is now being used
                     self.send_join_reply(pck['gui'], wsn.Addr(self.ch_addr.net_addr, avail_node_id))
             if pck['type'] == 'NETWORK_REQUEST':  # it sends a network reply to requested node
                 # yield self.timeout(.5)
                 if self.role == Roles.ROOT:
-                    avail_net_id = None
-                    for net_id, avail in self.net_id_available_dict.items():
-                        if avail is None or avail == pck['source']:
-                            avail_net_id = net_id
-                            break
+                    avail_net_id = self.net_id_allocator.allocate(pck['gui'], self.now)  # same id again if it asked before
                     if avail_net_id is None:
                         print("BUG")
-                        print(self.net_id_available_dict)
                         self.log(pck)
-                    new_addr = wsn.Addr(avail_net_id,254)
-                    self.net_id_available_dict[avail_net_id] = pck['source'] #this network is now being used
-                    self.send_network_reply(pck['source'],new_addr)
+                    else:
+                        new_addr = wsn.Addr(avail_net_id,254)
+                        self.send_network_reply(pck['source'],new_addr)
             if pck['type'] == 'JOIN_ACK':
                 self.members_table.append(pck['source'])
             if pck['type'] == 'NETWORK_UPDATE':
                 self.child_networks_table[pck['gui']] = pck['child_networks']
+                self.node_allocator.renew(pck['gui'], self.now)  # a member cluster head is alive
                 if self.role != Roles.ROOT:
                     self.send_network_update()
+                else:  # the networks listed below the root are alive
+                    for net_id in pck['child_networks']:
+                        self.net_id_allocator.renew_id(net_id, self.now)
             if pck['type'] == 'TABLE_SHARE':
                 #if neighbor in table share data is not our neighbor, append to neighbor table with hop_count + 1, next_hop = source addr of message
                 if self.role != Roles.ROOT:
@@ -550,22 +549,17 @@ class SensorNode(wsn.Node):
                     write_clusterhead_distances_csv("clusterhead_distances.csv")
                 except Exception as e:
                     self.log(f"CH CSV export error: {e}")
-                self.scene.nodecolor(self.id, 0, 0, 1)
+                self.vis.nodecolor(self.id, 0, 0, 1)
                 self.ch_addr = pck['addr']
                 self.send_network_update()
-                self.node_available_dict = {i: None for i in range(1, config.NUM_OF_CHILDREN+1)} #what we will need to add for this to be stable is the reopening of a lost network, but we get there when we get there
+                self.node_allocator = AddressAllocator(1, config.NUM_OF_CHILDREN, config.NODE_ADDR_LEASE_TIME)
 
                 # yield self.timeout(.5)
                 self.send_heart_beat()
                 for gui in self.received_JR_guis:
                     # yield self.timeout(random.uniform(.1,.5))
-                    avail_node_id = None
-                    for node_id, avail in self.node_available_dict.items():
-                        if avail is None or avail == gui:
-                            avail_node_id = node_id
-                            break
+                    avail_node_id = self.node_allocator.allocate(gui, self.now)  # same id again if it asked before
                     if avail_node_id is not None:
-                        self.node_available_dict[avail_node_id] = gui#this network is now being used
                         self.send_join_reply(gui, wsn.Addr(self.ch_addr.net_addr,avail_node_id))
 
         elif self.role == Roles.UNDISCOVERED:  # if the node is undiscovered
@@ -620,7 +614,7 @@ class SensorNode(wsn.Node):
 
         """
         if name == 'TIMER_ARRIVAL':  # it wakes up and set timer probe once time arrival timer fired
-            self.scene.nodecolor(self.id, 1, 0, 0)  # sets self color to red
+            self.vis.nodecolor(self.id, 1, 0, 0)  # sets self color to red
             self.wake_up()
             self.wake_up_time = self.now #measure time when powered on
             self.set_timer('TIMER_PROBE', 1)
@@ -633,13 +627,14 @@ class SensorNode(wsn.Node):
             else:  # if the counter reached the threshold
                 if self.is_root_eligible:  # if the node is root eligible, it becomes root
                     self.set_role(Roles.ROOT)
-                    self.scene.nodecolor(self.id, 0, 0, 0)
+                    self.vis.nodecolor(self.id, 0, 0, 0)
                     self.addr = wsn.Addr(0, 254)
                     self.ch_addr = wsn.Addr(0, 254)
                     self.root_addr = self.addr
                     self.hop_count = 0
-                    self.net_id_available_dict = {i: None for i in range(1, config.NUM_OF_CLUSTERS)} #what we will need to add for this to be stable is the reopening of a lost network, but we get there when we get there
-                    self.node_available_dict = {i: None for i in range(1, config.NUM_OF_CHILDREN+1)} #what we will need to add for this to be stable is the reopening of a lost network, but we get there when we get there
+                    # no lease: NETWORK_UPDATEs are only sent on topology changes here and would not renew it
+                    self.net_id_allocator = AddressAllocator(1, config.NUM_OF_CLUSTERS - 1)
+                    self.node_allocator = AddressAllocator(1, config.NUM_OF_CHILDREN, config.NODE_ADDR_LEASE_TIME)
 
                     self.set_timer('TIMER_HEART_BEAT', config.HEART_BEAT_TIME_INTERVAL)
                 else:  # otherwise it keeps trying to sending probe after a long time
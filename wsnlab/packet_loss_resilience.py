@@ -5,9 +5,19 @@ sys.path.insert(1, '.')
 from source import wsnlab_vis as wsn
 import math
 from source import config
+from source.address_allocator import AddressAllocator, BlockAllocator
 from collections import Counter
 from source.address_registry import ADDR_TO_NODE
+from source.fib import ForwardingTable
+from source.candidate_parents import CandidateParents
+from source.table_share import TableShare, share_size, ack_size
+from source.trickle import Trickle
+from source.probe_response import ProbeResponder
+from source.network_request import NetworkRequest, NetworkReplies
+from source.network_update import NetworkUpdates, merge_update, update_size
 from source.wsnlab import Roles
+from source.topology_export import DeltaCsvExporter, PairDistanceExporter
+from source import distances
 import csv  # <— add this near your other imports
 random.seed(config.SEED if hasattr(config, "SEED") else 42)
 # Track where each node is placed
@@ -128,7 +138,7 @@ class SensorNode(wsn.Node):
         Returns:
 
         """
-        self.scene.nodecolor(self.id, 1, 1, 1) # sets self color to white
+        self.vis.nodecolor(self.id, 1, 1, 1) # sets self color to white
         self.sleep()
         self.addr = None
         self.transfer_engaged = None
@@ -144,11 +154,24 @@ class SensorNode(wsn.Node):
         self.hop_count = 99999
         self.jr_threshold = 5
         self.neighbors_table = {}  # keeps neighbor information with received HB messages
-        self.candidate_parents_table = []
+        self.candidate_parents_table = CandidateParents(self.jr_threshold)
+        self.node_allocator = None  # member node ids, while cluster head
+        self.net_id_allocator = None  # network ids, while root
+        self.net_blocks = None  # blocks of network ids below our own, while cluster head or root with NET_ID_DELEGATION
         self.child_networks_table = {}
         self.members_table = []
+        self.fib = ForwardingTable()  # address indexes over the three tables above
+        self.table_share = TableShare()  # entry versions for delta table shares
+        self.network_updates = NetworkUpdates()  # networks last reported to the parent
+        self.trickle = Trickle(config.HEART_BEAT_TIME_INTERVAL, config.HEART_BEAT_MAX_INTERVAL,
+                               config.HEART_BEAT_REDUNDANCY, config.HEART_BEAT_MAX_SILENCE)  # heart beat schedule if HEART_BEAT_TRICKLE
+        self.probe_responder = ProbeResponder(config.PROBE_RESPONSE_JITTER, config.PROBE_RESPONSE_REDUNDANCY,
+                                              config.PROBE_RESPONSE_MIN_INTERVAL)  # heart beat replies to PROBE
         self.net_req_flag = None
-        self.join_req_attempts = {}
+        self.network_request = NetworkRequest(config.NETWORK_REQUEST_TIME_INTERVAL,
+                                              config.NETWORK_REQUEST_MAX_BACKOFF)  # own pending NETWORK_REQUEST
+        self.network_replies = NetworkReplies(config.NETWORK_REQUEST_DUPLICATE_WINDOW)  # NETWORK_REPLYs sent as root
+        self.join_req_attempts = self.candidate_parents_table.attempts
         self.received_JR_guis = []  # keeps received Join Request global unique ids
         ALL_NODES.append(self)
     ###################
@@ -213,10 +236,7 @@ class SensorNode(wsn.Node):
     def assign_tx_power(self, power_level=None):
         if power_level is None:
             #this should not be a fully random choice, we need to pick ranges that the node can still reach its parent
-            parent = next( #search for parent details, we want distance
-                (d for d in self.candidate_parents_table if d.get('gui') == self.parent_gui),
-                None
-            )
+            parent = self.candidate_parents_table.get(self.parent_gui) #search for parent details, we want distance
             #we choose our power based on distance to parent
             dist_diff = []
 
@@ -249,30 +269,32 @@ class SensorNode(wsn.Node):
                 ROLE_COUNTS.pop(old_role, None)
         ROLE_COUNTS[new_role] += 1
         self.role = new_role
+        if old_role != new_role:
+            self.reset_heart_beat()
 
         if recolor:
             if new_role == Roles.UNDISCOVERED:
-                self.scene.nodecolor(self.id, 1, 1, 1)
+                self.vis.nodecolor(self.id, 1, 1, 1)
             elif new_role == Roles.UNREGISTERED:
-                self.scene.nodecolor(self.id, 1, 1, 0)
+                self.vis.nodecolor(self.id, 1, 1, 0)
             elif new_role == Roles.REGISTERED:
-                self.scene.nodecolor(self.id, 0, 1, 0)
+                self.vis.nodecolor(self.id, 0, 1, 0)
             elif new_role == Roles.CLUSTER_HEAD:
-                self.scene.nodecolor(self.id, 0, 0, 1)
+                self.vis.nodecolor(self.id, 0, 0, 1)
                 if config.ALLOW_TX_POWER_CHOICE:
                     self.assign_tx_power()
                 else:
                     self.assign_tx_power(config.NODE_DEFAULT_TX_POWER)
                 self.draw_tx_range()
             elif new_role == Roles.ROUTER:
-                self.scene.nodecolor(self.id, 1, 0.75, 0.8)
+                self.vis.nodecolor(self.id, 1, 0.75, 0.8)
                 if config.ALLOW_TX_POWER_CHOICE:
                     self.assign_tx_power()
                 else:
                     self.assign_tx_power(config.NODE_DEFAULT_TX_POWER)
                 self.draw_tx_range()
             elif new_role == Roles.ROOT:
-                self.scene.nodecolor(self.id, 0, 0, 0)
+                self.vis.nodecolor(self.id, 0, 0, 0)
                 self.assign_tx_power(config.NODE_DEFAULT_TX_POWER)
                 self.set_timer('TIMER_EXPORT_CH_CSV', config.EXPORT_CH_CSV_INTERVAL)
                 self.set_timer('TIMER_EXPORT_NEIGHBOR_CSV', config.EXPORT_NEIGHBOR_CSV_INTERVAL)
@@ -281,7 +303,7 @@ class SensorNode(wsn.Node):
         if self.role != Roles.UNDISCOVERED:
             self.kill_all_timers()
             self.log('I became UNREGISTERED')
-        self.scene.nodecolor(self.id, 1, 1, 0)
+        self.vis.nodecolor(self.id, 1, 1, 0)
         self.remove_tx_range()
         self.erase_parent()
         self.addr = None
@@ -293,11 +315,15 @@ class SensorNode(wsn.Node):
         self.th_probe = 10
         self.hop_count = 99999
         self.neighbors_table = {}
-        self.candidate_parents_table = []
+        self.candidate_parents_table = CandidateParents(self.jr_threshold)
         self.child_networks_table = {}
         self.members_table = []
-        self.join_req_attempts = {}
+        self.fib.clear()
+        self.table_share.clear()
+        self.network_updates.clear()
+        self.join_req_attempts = self.candidate_parents_table.attempts
         self.received_JR_guis = []  # keeps received Join Request global unique ids
+        self.network_request.clear()
         self.send_probe()
         self.set_timer('TIMER_JOIN_REQUEST', config.JOIN_REQUEST_TIME_INTERVAL)
     ###################
@@ -308,6 +334,7 @@ class SensorNode(wsn.Node):
         self.set_role(Roles.ROUTER)
         self.remove_tx_range()
         self.tx_range = config.NODE_TX_RANGES[config.NODE_DEFAULT_TX_POWER] #routers transmit at max range
+        self.net_blocks = None  # handed over with the nomination
         self.ch_addr = None
         self.send_network_update()
         self.set_timer('TIMER_NETWORK_UPDATE', config.TABLE_SHARE_INTERVAL)
@@ -333,7 +360,8 @@ class SensorNode(wsn.Node):
             best_src = max(candidates, key=candidates.get)
             self.ch_nominee = best_src
             self.awaiting_ack = True
-            self.send({'dest': wsn.Addr(best_src[0], best_src[1]), 'type': 'CH_NOMINATION', 'source': self.addr, 'addr': self.ch_addr, 'avail_dict': self.node_available_dict})
+            self.send({'dest': wsn.Addr(best_src[0], best_src[1]), 'type': 'CH_NOMINATION', 'source': self.addr, 'addr': self.ch_addr, 'avail_dict': self.node_allocator.copy(),
+                       'net_blocks': self.net_blocks.copy() if self.net_blocks is not None else None})
             #self.become_router()
     def send_ch_nom_ack(self, pck):
         self.send({'dest': pck['source'], 'type': 'CH_NOMINATION_ACK', 'source': self.addr})
@@ -348,7 +376,15 @@ class SensorNode(wsn.Node):
             x2, y2 = NODE_POS[pck['gui']]
             pck['distance'] = math.hypot(x1 - x2, y1 - y2)
         pck['neighbor_hop_count'] = 1
+        old = self.neighbors_table.get(pck['gui'])
         self.neighbors_table[pck['gui']] = pck
+        if self.node_allocator is not None:  # a member heard is alive
+            self.node_allocator.renew(pck['gui'], self.now)
+        self.fib.set_neighbor(pck['gui'], pck['addr'])
+        self.table_share.touch(pck['gui'], pck)
+        self.candidate_parents_table.set_hop_count(pck['gui'], pck['hop_count'])
+        self.heart_beat_heard(old, pck)
+        self.probe_responder.heard(self.now)
 
         #logic here is if our parent changes to a router, we cant communicate through them directly, need to find new parent
         if self.role == Roles.REGISTERED and self.parent_gui is not None:
@@ -360,36 +396,18 @@ class SensorNode(wsn.Node):
                 self.become_unregistered()
                 return
         # Step 1: skip if child or already a member
-        if pck['gui'] not in self.child_networks_table.keys() or pck['addr'] not in self.members_table:
+        if pck['gui'] not in self.child_networks_table.keys() or not self.fib.is_member(pck['addr']):
 
-            # Step 2: find existing candidate parent with same GUI
-            existing = next((d for d in self.candidate_parents_table if d['gui'] == pck['gui']), None)
-
-            if existing:
-                # Step 3: replace only if arrival_time is newer
-                if pck['arrival_time'] > existing['arrival_time']:
-                    self.candidate_parents_table.remove(existing)
-                    self.candidate_parents_table.append(pck)
-            else:
-                # Step 4: didn’t exist → add it
-                self.candidate_parents_table.append(pck)
+            # Step 2: add it, or replace the one with the same GUI only if arrival_time is newer
+            self.candidate_parents_table.offer(pck)
 
 
 
     ###################
     def select_and_join(self):
-        min_hop = 99999
-        min_hop_gui = 99999
-        for gui in self.candidate_parents_table:
-            gui = gui['gui'] #we are now passing in the full packet
-            attempts = self.join_req_attempts.get(gui, 0)
-            if attempts >= self.jr_threshold:
-                continue
-            if self.neighbors_table[gui]['hop_count'] < min_hop or (self.neighbors_table[gui]['hop_count'] == min_hop and gui < min_hop_gui):
-                min_hop = self.neighbors_table[gui]['hop_count']
-                min_hop_gui = gui
-        if min_hop_gui < 99999:
-            self.join_req_attempts[min_hop_gui] = self.join_req_attempts.get(min_hop_gui, 0) + 1
+        # lowest (hop_count, gui) with fewer than jr_threshold join attempts, counts the attempt
+        min_hop_gui = self.candidate_parents_table.select()
+        if min_hop_gui is not None:
             selected_addr = self.neighbors_table[min_hop_gui]['source']
             self.send_join_request(selected_addr)
         #self.set_timer('TIMER_JOIN_REQUEST', config.JOIN_REQUEST_TIME_INTERVAL)
@@ -404,7 +422,7 @@ class SensorNode(wsn.Node):
         Returns:
 
         """
-        self.send({'dest': wsn.BROADCAST_ADDR, 'type': 'PROBE'})
+        self.send({'dest': wsn.BROADCAST_ADDR, 'type': 'PROBE', 'gui': self.id, 'role': self.role})
 
     ###################
     def send_heart_beat(self):
@@ -423,6 +441,70 @@ class SensorNode(wsn.Node):
                    'addr': self.addr,
                    'ch_addr': self.ch_addr,
                    'hop_count': self.hop_count})
+        self.trickle.sent(self.now)
+        self.probe_responder.sent()
+
+    ###################
+    def start_heart_beat(self):
+        """Setting the heart beat timer, every HEART_BEAT_TIME_INTERVAL or on a trickle schedule
+
+        Args:
+
+        Returns:
+
+        """
+        if config.HEART_BEAT_TRICKLE:
+            self.kill_timer('TIMER_HEART_BEAT')
+            self.set_timer('TIMER_HEART_BEAT', self.trickle.restart(self.now))
+        else:
+            self.set_timer('TIMER_HEART_BEAT', config.HEART_BEAT_TIME_INTERVAL)
+
+    ###################
+    def reset_heart_beat(self):
+        """Going back to the shortest heart beat interval on an inconsistency, if trickle heart beats are running
+
+        Args:
+
+        Returns:
+
+        """
+        if config.HEART_BEAT_TRICKLE and 'TIMER_HEART_BEAT' in self.active_timer_list:
+            delay = self.trickle.inconsistent(self.now)
+            if delay is not None:
+                self.kill_timer('TIMER_HEART_BEAT')
+                self.set_timer('TIMER_HEART_BEAT', delay)
+
+    ###################
+    def heart_beat_heard(self, old, pck):
+        """Counting a heard heart beat for trickle suppression if it matches the neighbor entry it replaces, resetting the schedule otherwise
+
+        Args:
+            old (Dict): previous neighbors_table entry of the sender, or None
+            pck (Dict): heard heart beat
+        Returns:
+
+        """
+        if not config.HEART_BEAT_TRICKLE:
+            return
+        if (old is not None and old['neighbor_hop_count'] == 1 and old['role'] == pck['role']
+                and old['addr'] == pck['addr'] and old['ch_addr'] == pck['ch_addr']
+                and old['hop_count'] == pck['hop_count']):
+            self.trickle.heard(self.now)
+        else:  # new neighbor or changed neighbor
+            self.reset_heart_beat()
+
+    ###################
+    def respond_to_probe(self, pck):
+        """Scheduling a jittered heart beat in reply to a probe, unless a pending reply covers it or the prober was answered recently
+
+        Args:
+            pck (Dict): received PROBE
+        Returns:
+
+        """
+        delay = self.probe_responder.probe(pck, self.now)
+        if delay is not None:
+            self.set_timer('TIMER_PROBE_RESPONSE', delay)
 
     ###################
     def send_join_request(self, dest):
@@ -487,30 +569,23 @@ class SensorNode(wsn.Node):
                 pck['next_hop'] = pck['dest']
                 path_str = "TREE"
             else:
-                for child_gui, child_networks in self.child_networks_table.items():
-                    if pck['dest'].net_addr in child_networks:
-                        pck['next_hop'] = self.neighbors_table[child_gui]['addr']
-                        path_str = "TREE"
-                        break
-        elif self.role == Roles.ROUTER:
-            for child_gui, child_networks in self.child_networks_table.items():
-                if pck['dest'].net_addr in child_networks:
+                child_gui = self.fib.child_for_net(pck['dest'].net_addr)
+                if child_gui is not None:
                     pck['next_hop'] = self.neighbors_table[child_gui]['addr']
                     path_str = "TREE"
-                    break
-        # Search neighbors_table values for a match by 'addr'
-        neighbor_match = next(
-            (entry for entry in self.neighbors_table.values() if entry['addr'] == pck['dest']),
-            None
-        )
+        elif self.role == Roles.ROUTER:
+            child_gui = self.fib.child_for_net(pck['dest'].net_addr)
+            if child_gui is not None:
+                pck['next_hop'] = self.neighbors_table[child_gui]['addr']
+                path_str = "TREE"
+        # Look up neighbors_table entries by 'addr' in the forwarding table
+        neighbor_gui = self.fib.neighbor(pck['dest'])
+        neighbor_match = self.neighbors_table[neighbor_gui] if neighbor_gui is not None else None
 
-        # Search members_table values for a match by 'addr' if no neighbor match
+        # Then members_table if no neighbor match
         member_match = None
-        if not neighbor_match:
-            member_match = next(
-                (entry for entry in self.members_table if entry == pck['dest']),
-                None
-            )
+        if not neighbor_match and self.fib.is_member(pck['dest']):
+            member_match = pck['dest']
 
         # Decide routing based on found match
         match = neighbor_match or member_match
@@ -537,27 +612,36 @@ class SensorNode(wsn.Node):
         Returns:
 
         """
-        self.route_and_forward_package({'dest': self.root_addr, 'type': 'NETWORK_REQUEST', 'source': self.addr})
+        if not self.network_request.request(self.now):  # the pending request covers it
+            self.sim.metrics.inc('coalesced_network_requests')
+            return
+        if config.NET_ID_DELEGATION:  # our cluster head serves it out of its block
+            dest = wsn.Addr(self.addr.net_addr, 254)
+        else:
+            dest = self.root_addr
+        self.route_and_forward_package({'dest': dest, 'type': 'NETWORK_REQUEST', 'source': self.addr, 'gui': self.id})
 
     ###################
-    def send_network_reply(self, dest, addr):
+    def send_network_reply(self, dest, addr, block=None):
         """Sending network reply message to dest address to be cluster head with a new adress
 
         Args:
             dest (Addr): destination address
             addr (Addr): cluster head address of new network
+            block (Tuple): (first, last) network ids granted with NET_ID_DELEGATION, first is the one of addr
 
         Returns:
 
         """
-        self.route_and_forward_package({'dest': dest, 'type': 'NETWORK_REPLY', 'source': self.addr, 'addr': addr})
+        self.route_and_forward_package({'dest': dest, 'type': 'NETWORK_REPLY', 'source': self.addr, 'addr': addr,
+                                        'block': block})
 
     ###################
-    def send_network_update(self):
-        """Sending network update message to parent
+    def send_network_update(self, full=False):
+        """Sending network update message to parent, with the networks changed since the last one unless full
 
         Args:
-
+            full (bool): True to list every network, as the periodic update does
         Returns:
 
         """
@@ -566,15 +650,33 @@ class SensorNode(wsn.Node):
         else:
             child_networks = [self.ch_addr.net_addr]
 
-        for networks in self.child_networks_table.values():
-            child_networks.extend(networks)
+        child_networks.extend(self.fib.child_networks())  # every network below us, from the routing index
         if self.neighbors_table[self.parent_gui]['ch_addr'] is None:
             dest = self.neighbors_table[self.parent_gui]['source']
         else:
             dest = self.neighbors_table[self.parent_gui]['ch_addr']
         #dest = self.neighbors_table[self.parent_gui]['ch_addr']
-        self.send({'dest': dest, 'type': 'NETWORK_UPDATE', 'source': self.addr,
-                   'gui': self.id, 'child_networks': child_networks})
+        fields = self.network_updates.changes(self.parent_gui, child_networks, full)
+        if fields is None:  # the parent has it all
+            self.sim.metrics.inc('unchanged_network_updates')
+            return
+        pck = {'dest': dest, 'type': 'NETWORK_UPDATE', 'source': self.addr, 'gui': self.id}
+        pck.update(fields)
+        pck['size'] = update_size(pck)
+        self.send(pck)
+        self.sim.metrics.inc('network_updates')
+
+    ###################
+    def schedule_network_update(self):
+        """Sending the changes heard from below to the parent after NETWORK_UPDATE_DEBOUNCE, together with the ones heard meanwhile
+
+        Args:
+
+        Returns:
+
+        """
+        if 'TIMER_NETWORK_UPDATE_DEBOUNCE' not in self.active_timer_list:
+            self.set_timer('TIMER_NETWORK_UPDATE_DEBOUNCE', config.NETWORK_UPDATE_DEBOUNCE)
     ###################
     def send_sensor_data(self):
         """Sending network update message to parent
@@ -609,11 +711,34 @@ class SensorNode(wsn.Node):
             if packet['neighbor_hop_count'] <= config.MESH_HOP_N:
                 mesh_neighbors[neighbor] = packet
                 #collect list of these hop count neighbors, and send to all immediate neighbors
+        full = self.table_share.next_round()
         for neighbor in self.neighbors_table.values(): #only send table to immediate neighbors
             if neighbor['neighbor_hop_count'] == 1:
                 if neighbor['role'] != Roles.UNREGISTERED:
-                    self.send({'dest': neighbor['source'], 'type': 'TABLE_SHARE', 'source': self.addr,
-                            'gui': self.id, 'neighbors': mesh_neighbors})
+                    # only the entries changed since the version this neighbor acknowledged
+                    base, entries = self.table_share.changes(neighbor['gui'], mesh_neighbors, full)
+                    if entries:
+                        self.send({'dest': neighbor['source'], 'type': 'TABLE_SHARE', 'source': self.addr,
+                                'gui': self.id, 'neighbors': entries, 'base': base,
+                                'version': self.table_share.version, 'size': share_size(len(entries))})
+
+    ###################
+    def receive_table_share(self, pck):
+        """Merging a table share into the neighbor table and acknowledging it
+
+        Args:
+            pck (Dict): received TABLE_SHARE
+        Returns:
+
+        """
+        if self.role == Roles.ROOT:  # the root keeps no mesh entries, acknowledge so it gets only changes
+            version = pck['version']
+        else:
+            written, version = self.table_share.merge(self.id, pck, self.neighbors_table)
+            for neighbor in written:
+                self.fib.set_neighbor(neighbor, self.neighbors_table[neighbor]['addr'])
+        self.send({'dest': pck['source'], 'type': 'TABLE_SHARE_ACK', 'source': self.addr,
+                   'gui': self.id, 'version': version, 'size': ack_size()})
 
     ###################
     def on_receive(self, pck):
@@ -625,7 +750,7 @@ class SensorNode(wsn.Node):
 
         """
         self.check_power()
-        self.power -= ((config.RX_CURRENT * config.VOLTAGE * 8 * config.MTU / config.DATARATE) + 0.01) / 1000 #+10 microjoules for overhead, / 1000 to get joules
+        self.power -= ((config.RX_CURRENT * config.VOLTAGE * 8 * pck.get('size', config.MTU) / config.DATARATE) + 0.01) / 1000 #+10 microjoules for overhead, / 1000 to get joules
         
         if self.role == Roles.ROOT or self.role == Roles.CLUSTER_HEAD:  # if the node is root or cluster head
             if 'next_hop' in pck.keys() and pck['dest'] != self.addr and pck['dest'] != self.ch_addr:  # forwards message if destination is not itself
@@ -635,30 +760,37 @@ class SensorNode(wsn.Node):
                 self.update_neighbor(pck)
             if pck['type'] == 'PROBE':  # it waits and sends heart beat message once received probe message
                 # yield self.timeout(.5)
-                self.send_heart_beat()
+                self.respond_to_probe(pck)
+                self.reset_heart_beat()  # a node nearby is joining
             if pck['type'] == 'JOIN_REQUEST':  # it waits and sends join reply message once received join request
+                self.reset_heart_beat()  # a neighbor is joining
                 # yield self.timeout(.5)
-                avail_node_id = None
-                for node_id, avail in self.node_available_dict.items():
-                    if avail is None or avail == pck['gui']:
-                        avail_node_id = node_id
-                        break
+                avail_node_id = self.node_allocator.allocate(pck['gui'], self.now)  # same id again if it asked before
                 if avail_node_id is not None:
-                    self.node_available_dict[avail_node_id] = pck['gui'] #this network is now being used
                     self.send_join_reply(pck['gui'], wsn.Addr(self.ch_addr.net_addr, avail_node_id))
             if pck['type'] == 'NETWORK_REQUEST':  # it sends a network reply to requested node
                 # yield self.timeout(.5)
-                if self.role == Roles.ROOT:
-                    avail_net_id = None
-                    for net_id, avail in self.net_id_available_dict.items():
-                        if avail is None or avail == pck['source']:
-                            avail_net_id = net_id
-                            break
-                    new_addr = wsn.Addr(avail_net_id,254)
-                    self.net_id_available_dict[avail_net_id] = pck['source'] #this network is now being used
-                    self.send_network_reply(pck['source'],new_addr)
+                if self.network_replies.duplicate(pck, self.now):
+                    self.sim.metrics.inc('duplicate_network_requests')
+                    return
+                if self.net_id_allocator is not None:
+                    avail_net_id = self.net_id_allocator.allocate(pck['gui'], self.now)  # same id again if it asked before
+                    if avail_net_id is not None:
+                        new_addr = wsn.Addr(avail_net_id,254)
+                        self.send_network_reply(pck['source'],new_addr)
+                        self.network_replies.replied(pck, self.now)
+                else:  # NET_ID_DELEGATION, a block out of ours
+                    block = self.net_blocks.grant(pck['gui'], self.now) if self.net_blocks is not None else None
+                    if block is not None:
+                        self.send_network_reply(pck['source'], wsn.Addr(block[0], 254), block)
+                        self.network_replies.replied(pck, self.now)
+                    elif self.role != Roles.ROOT:  # our block is used up, the root serves it
+                        self.sim.metrics.inc('escalated_network_requests')
+                        self.route_and_forward_package({'dest': self.root_addr, 'type': 'NETWORK_REQUEST',
+                                                        'source': pck['source'], 'gui': pck['gui']})
             if pck['type'] == 'JOIN_ACK':
                 self.members_table.append(pck['source'])
+                self.fib.add_member(pck['source'])
                 if self.role == Roles.CLUSTER_HEAD:
                     # Only transfer if this is the node we became CH for
                     if self.ch_transfer_target is not None and self.transfer_engaged is None:
@@ -667,10 +799,9 @@ class SensorNode(wsn.Node):
                         for gui in self.received_JR_guis:
                             if gui == self.ch_transfer_target:
                                 # Find this node's assigned address
-                                for node_id, assigned_gui in self.node_available_dict.items():
-                                    if assigned_gui == gui:
-                                        target_addr = wsn.Addr(self.ch_addr.net_addr, node_id)
-                                        break
+                                node_id = self.node_allocator.id_of(gui)
+                                if node_id is not None:
+                                    target_addr = wsn.Addr(self.ch_addr.net_addr, node_id)
                                 break
                         
                         if target_addr and pck['source'] == target_addr:
@@ -685,20 +816,21 @@ class SensorNode(wsn.Node):
                             self.awaiting_ack = False
                             self.ch_nominee = None
             if pck['type'] == 'NETWORK_UPDATE':
-                self.child_networks_table[pck['gui']] = pck['child_networks']
+                networks = merge_update(pck, self.child_networks_table.get(pck['gui'], []))
+                self.child_networks_table[pck['gui']] = networks
+                self.fib.set_child_networks(pck['gui'], networks)
+                self.node_allocator.renew(pck['gui'], self.now)  # a member cluster head is alive
+                if self.net_blocks is not None:  # the blocks holding the networks listed are alive
+                    self.net_blocks.renew_ids(networks, self.now)
                 if self.role != Roles.ROOT:
-                    self.send_network_update()
+                    self.schedule_network_update()
+                elif self.net_id_allocator is not None:  # the networks listed below the root are alive
+                    for net_id in networks:
+                        self.net_id_allocator.renew_id(net_id, self.now)
             if pck['type'] == 'TABLE_SHARE':
-                #if neighbor in table share data is not our neighbor, append to neighbor table with hop_count + 1, next_hop = source addr of message
-                if self.role != Roles.ROOT:
-                    for neighbor, packet in pck['neighbors'].items():
-                        if neighbor not in self.neighbors_table and neighbor != self.id and packet['gui'] != self.id:
-                            cpy = packet.copy()
-                            cpy['neighbor_hop_count'] += 1
-                            cpy['next_hop'] = pck['source']
-                            self.neighbors_table[neighbor] = cpy
-                            if cpy['neighbor_hop_count'] > config.MESH_HOP_N + 1:
-                                raise Exception("Something went wrong")
+                self.receive_table_share(pck)
+            if pck['type'] == 'TABLE_SHARE_ACK':
+                self.table_share.ack(pck['gui'], pck['version'])
             if pck['type'] == 'SENSOR_DATA':
                 pass
                 # self.log(str(pck['source'])+'--'+str(pck['sensor_value']))
@@ -712,44 +844,40 @@ class SensorNode(wsn.Node):
                 self.update_neighbor(pck)
             if pck['type'] == 'PROBE':
                 # yield self.timeout(.5)
-                self.send_heart_beat()
+                self.respond_to_probe(pck)
+                self.reset_heart_beat()  # a node nearby is joining
             if pck['type'] == 'JOIN_REQUEST':  # it sends a network request to the root
-                self.received_JR_guis.append(pck['gui'])
+                self.reset_heart_beat()  # a neighbor is joining
+                if pck['gui'] not in self.received_JR_guis:  # a joiner retries, answer it once
+                    self.received_JR_guis.append(pck['gui'])
                 self.ch_transfer_target = pck['gui']
-                self.send_network_request() #this is getting spammed
+                self.send_network_request()  # coalesced while one is pending
             if pck['type'] == 'TABLE_SHARE':
-                #if neighbor in table share data is not our neighbor, append to neighbor table with hop_count + 1, next_hop = source addr of message
-                for neighbor, packet in pck['neighbors'].items():
-                    if neighbor not in self.neighbors_table and neighbor != self.id:
-                        cpy = packet.copy()
-                        cpy['neighbor_hop_count'] += 1
-                        cpy['next_hop'] = pck['source']
-                        self.neighbors_table[neighbor] = cpy
-                        if cpy['neighbor_hop_count'] > config.MESH_HOP_N + 1:
-                            raise Exception("Something went wrong")
+                self.receive_table_share(pck)
+            if pck['type'] == 'TABLE_SHARE_ACK':
+                self.table_share.ack(pck['gui'], pck['version'])
             if pck['type'] == 'NETWORK_REPLY':  # it becomes cluster head and send join reply to the candidates
+                self.network_request.clear()
                 self.set_role(Roles.CLUSTER_HEAD)
                 check_all_nodes_registered()
                 try:
-                    write_clusterhead_distances_csv("clusterhead_distances.csv")
+                    write_clusterhead_distances_csv()
                 except Exception as e:
                     self.log(f"CH CSV export error: {e}")
                 self.set_ch_address(pck['addr'])
+                if pck['block'] is not None:  # our network id is the first of the block
+                    self.net_blocks = BlockAllocator(pck['block'][0] + 1, pck['block'][1],
+                                                     config.NET_ID_BLOCK_SIZE, config.NET_ID_LEASE_TIME)
                 self.send_network_update()
                 self.set_timer('TIMER_NETWORK_UPDATE', config.TABLE_SHARE_INTERVAL)
-                self.node_available_dict = {i: None for i in range(1, config.NUM_OF_CHILDREN+1)} #what we will need to add for this to be stable is the reopening of a lost network, but we get there when we get there
+                self.node_allocator = AddressAllocator(1, config.NUM_OF_CHILDREN, config.NODE_ADDR_LEASE_TIME)
 
                 # yield self.timeout(.5)
                 self.send_heart_beat()
                 for gui in self.received_JR_guis:
                     # yield self.timeout(random.uniform(.1,.5))
-                    avail_node_id = None
-                    for node_id, avail in self.node_available_dict.items():
-                        if avail is None or avail == gui:
-                            avail_node_id = node_id
-                            break
+                    avail_node_id = self.node_allocator.allocate(gui, self.now)  # same id again if it asked before
                     if avail_node_id is not None:
-                        self.node_available_dict[avail_node_id] = gui#this network is now being used
                         self.send_join_reply(gui, wsn.Addr(self.ch_addr.net_addr,avail_node_id))
 
             if pck['type'] == 'CH_NOMINATION':
@@ -758,7 +886,9 @@ class SensorNode(wsn.Node):
                 self.set_ch_address(pck['addr'])
                 self.send_network_update()
                 self.set_timer('TIMER_NETWORK_UPDATE', config.TABLE_SHARE_INTERVAL)
-                self.node_available_dict = pck['avail_dict']
+                self.node_allocator = pck['avail_dict']
+                self.net_blocks = pck['net_blocks']
+                self.node_allocator.hold(self.id)  # our own member address, we never hear ourselves
 
         elif self.role == Roles.ROUTER:
             if 'next_hop' in pck.keys() and pck['dest'] != self.addr and pck['dest'] != self.ch_addr:  # forwards message if destination is not itself
@@ -768,21 +898,18 @@ class SensorNode(wsn.Node):
                 self.update_neighbor(pck)
             if pck['type'] == 'PROBE':
                 # yield self.timeout(.5)
-                self.send_heart_beat()
+                self.respond_to_probe(pck)
+                self.reset_heart_beat()  # a node nearby is joining
             if pck['type'] == 'TABLE_SHARE':
-                #if neighbor in table share data is not our neighbor, append to neighbor table with hop_count + 1, next_hop = source addr of message
-                for neighbor, packet in pck['neighbors'].items():
-                    if neighbor not in self.neighbors_table and neighbor != self.id:
-                        cpy = packet.copy()
-                        cpy['neighbor_hop_count'] += 1
-                        cpy['next_hop'] = pck['source']
-                        self.neighbors_table[neighbor] = cpy
-                        if cpy['neighbor_hop_count'] > config.MESH_HOP_N + 1:
-                            raise Exception("Something went wrong")
+                self.receive_table_share(pck)
+            if pck['type'] == 'TABLE_SHARE_ACK':
+                self.table_share.ack(pck['gui'], pck['version'])
             if pck['type'] == 'NETWORK_UPDATE':
-                self.child_networks_table[pck['gui']] = pck['child_networks']
+                networks = merge_update(pck, self.child_networks_table.get(pck['gui'], []))
+                self.child_networks_table[pck['gui']] = networks
+                self.fib.set_child_networks(pck['gui'], networks)
                 #if self.role != Roles.ROOT:
-                self.send_network_update()
+                self.schedule_network_update()
         elif self.role == Roles.UNDISCOVERED:  # if the node is undiscovered
             if pck['type'] == 'HEART_BEAT':  # it kills probe timer, becomes unregistered and sets join request timer once received heart beat
                 self.update_neighbor(pck)
@@ -804,7 +931,7 @@ class SensorNode(wsn.Node):
                     self.draw_parent()
                     self.kill_timer('TIMER_JOIN_REQUEST')
                     self.send_heart_beat()
-                    self.set_timer('TIMER_HEART_BEAT', config.HEART_BEAT_TIME_INTERVAL)
+                    self.start_heart_beat()
                     self.set_timer('TIMER_SENSOR', config.DATA_INTERVAL)
                     self.send_join_ack(pck['source'])
                     if self.ch_addr is not None: # it could be a cluster head which lost its parent
@@ -824,7 +951,9 @@ class SensorNode(wsn.Node):
                 self.set_ch_address(pck['addr'])
                 self.send_network_update()
                 self.set_timer('TIMER_NETWORK_UPDATE', config.TABLE_SHARE_INTERVAL)
-                self.node_available_dict = {i: None for i in range(1, config.NUM_OF_CHILDREN+1)}
+                self.node_allocator = pck['avail_dict']
+                self.net_blocks = pck['net_blocks']
+                self.node_allocator.hold(self.id)  # our own member address, we never hear ourselves
     ###################
     def on_timer_fired(self, name, *args, **kwargs):
         """Executes when a timer fired.
@@ -837,7 +966,7 @@ class SensorNode(wsn.Node):
 
         """
         if name == 'TIMER_ARRIVAL':  # it wakes up and set timer probe once time arrival timer fired
-            self.scene.nodecolor(self.id, 1, 0, 0)  # sets self color to red
+            self.vis.nodecolor(self.id, 1, 0, 0)  # sets self color to red
             self.wake_up()
             self.wake_up_time = self.now #measure time when powered on
             self.set_timer('TIMER_PROBE', 1)
@@ -851,23 +980,40 @@ class SensorNode(wsn.Node):
                 if self.is_root_eligible:  # if the node is root eligible, it becomes root
                     self.power = 999999 #root cant die
                     self.set_role(Roles.ROOT)
-                    self.scene.nodecolor(self.id, 0, 0, 0)
+                    self.vis.nodecolor(self.id, 0, 0, 0)
                     self.set_address(wsn.Addr(0, 254))
                     self.set_ch_address(wsn.Addr(0, 254))
                     self.root_addr = self.addr
                     self.hop_count = 0
-                    self.net_id_available_dict = {i: None for i in range(1, config.NUM_OF_CLUSTERS)} #what we will need to add for this to be stable is the reopening of a lost network, but we get there when we get there
-                    self.node_available_dict = {i: None for i in range(1, config.NUM_OF_CHILDREN+1)} #what we will need to add for this to be stable is the reopening of a lost network, but we get there when we get there
+                    if config.NET_ID_DELEGATION:
+                        self.net_blocks = BlockAllocator(1, config.NUM_OF_CLUSTERS - 1, config.NET_ID_BLOCK_SIZE,
+                                                         config.NET_ID_LEASE_TIME)
+                    else:
+                        self.net_id_allocator = AddressAllocator(1, config.NUM_OF_CLUSTERS - 1, config.NET_ID_LEASE_TIME)
+                    self.node_allocator = AddressAllocator(1, config.NUM_OF_CHILDREN, config.NODE_ADDR_LEASE_TIME)
 
-                    self.set_timer('TIMER_HEART_BEAT', config.HEART_BEAT_TIME_INTERVAL)
+                    self.start_heart_beat()
                 else:  # otherwise it keeps trying to sending probe after a long time
                     self.c_probe = 0
                     self.set_timer('TIMER_PROBE', 30)
 
         elif name == 'TIMER_HEART_BEAT':  # it sends heart beat message once heart beat timer fired
-            self.send_heart_beat()
-            self.set_timer('TIMER_HEART_BEAT', config.HEART_BEAT_TIME_INTERVAL)
+            if not config.HEART_BEAT_TRICKLE:
+                self.send_heart_beat()
+                self.set_timer('TIMER_HEART_BEAT', config.HEART_BEAT_TIME_INTERVAL)
+            else:
+                send, delay = self.trickle.fire(self.now)
+                if send:
+                    self.send_heart_beat()
+                else:
+                    self.sim.metrics.inc('suppressed_heart_beats')
+                self.set_timer('TIMER_HEART_BEAT', delay)
             #print(self.id)
+        elif name == 'TIMER_PROBE_RESPONSE':
+            if self.probe_responder.fire():
+                self.send_heart_beat()
+            else:  # overheard enough heart beats or sent one meanwhile
+                self.sim.metrics.inc('suppressed_probe_responses')
         #elif name == "NET_REQ_TIMEOUT": #check if we are a clusterhead yet, if we are, cancel timer, else, resend
         #    self.log("TIMEOUT")
         #    if self.role == Roles.CLUSTER_HEAD or self.role == Roles.ROOT:
@@ -886,8 +1032,10 @@ class SensorNode(wsn.Node):
                 self.select_and_join()
                 self.set_timer('TIMER_JOIN_REQUEST', config.JOIN_REQUEST_TIME_INTERVAL)
         elif name == 'TIMER_NETWORK_UPDATE': #periodic transmission of network topology so root has guaranteed context
-            self.send_network_update()
+            self.send_network_update(full=True)
             self.set_timer('TIMER_NETWORK_UPDATE', config.TABLE_SHARE_INTERVAL)
+        elif name == 'TIMER_NETWORK_UPDATE_DEBOUNCE':
+            self.send_network_update()
         elif name == 'TIMER_TABLE_SHARE':
             self.send_table_share()
             self.set_timer('TIMER_TABLE_SHARE', config.TABLE_SHARE_INTERVAL)
@@ -903,17 +1051,17 @@ class SensorNode(wsn.Node):
         elif name == 'TIMER_EXPORT_CH_CSV':
             # Only root should drive exports (cheap guard)
             if self.role == Roles.ROOT:
-                write_clusterhead_distances_csv("clusterhead_distances.csv")
+                write_clusterhead_distances_csv()
                 # reschedule
                 self.set_timer('TIMER_EXPORT_CH_CSV', config.EXPORT_CH_CSV_INTERVAL)
         elif name == 'TIMER_EXPORT_NEIGHBOR_CSV':
             if self.role == Roles.ROOT:
-                write_neighbor_distances_csv("neighbor_distances.csv")
+                write_neighbor_distances_csv()
                 self.set_timer('TIMER_EXPORT_NEIGHBOR_CSV', config.EXPORT_NEIGHBOR_CSV_INTERVAL)
         elif name == 'TIMER_DEAD':  # it dies and goes to sleep
             self.sleep()
             self.log('I AM DEAD')
-            self.scene.nodecolor(self.id, 0.5, 0.5, 0.5)  # sets self color to red
+            self.vis.nodecolor(self.id, 0.5, 0.5, 0.5)  # sets self color to red
             self.erase_parent()
             self.kill_all_timers()
             self.set_timer("TIMER_ARRIVAL", config.KILL_AND_WAKEUP[self.id]['wakeup_time'])
@@ -924,18 +1072,9 @@ ROOT_ID = random.randrange(config.SIM_NODE_COUNT)  # 0..count-1
 
 
 
-def write_node_distances_csv(path="node_distances.csv"):
-    """Write pairwise node-to-node Euclidean distances as an edge list."""
-    ids = sorted(NODE_POS.keys())
-    with open(path, "w", newline="") as f:
-        w = csv.writer(f)
-        w.writerow(["source_id", "target_id", "distance"])
-        for i, sid in enumerate(ids):
-            x1, y1 = NODE_POS[sid]
-            for tid in ids[i+1:]:  # i+1 to avoid duplicates and self-pairs
-                x2, y2 = NODE_POS[tid]
-                dist = math.hypot(x1 - x2, y1 - y2)
-                w.writerow([sid, tid, f"{dist:.6f}"])
+CH_DISTANCES_EXPORT = PairDistanceExporter(config.EXPORT_CH_CSV_PATH, ("clusterhead_1", "clusterhead_2"))
+NEIGHBOR_DISTANCES_EXPORT = DeltaCsvExporter(config.EXPORT_NEIGHBOR_CSV_PATH, ["node_id", "neighbor_id"],
+                                             ["distance", "neighbor_role", "neighbor_hop_count"], ["arrival_time"])
 with open("packet_routes.csv", "w", newline="") as f:
     writer = csv.writer(f)
     writer.writerow(["time", "packet_type", "source", "current_node", "next_hop", "dest", "hop_count", "path_type"])
@@ -955,55 +1094,46 @@ def log_packet_route(pck, current_node, next_hop, path):
         hop = pck.get("hop_count", "")
         w.writerow([time, ptype, src, current_node.id, next_hop, dest, hop, path])
 
-def write_node_distance_matrix_csv(path="node_distance_matrix.csv"):
-    ids = sorted(NODE_POS.keys())
-    with open(path, "w", newline="") as f:
-        w = csv.writer(f)
-        w.writerow(["node_id"] + ids)
-        for sid in ids:
-            x1, y1 = NODE_POS[sid]
-            row = [sid]
-            for tid in ids:
-                x2, y2 = NODE_POS[tid]
-                dist = math.hypot(x1 - x2, y1 - y2)
-                row.append(f"{dist:.6f}")
-            w.writerow(row)
+def write_node_distance_matrix(path=None):
+    """Write pairwise node-to-node Euclidean distances in the binary format chosen in config.
+
+    'npz' stores the full matrix compressed, 'npy' writes it block by block to a memory-mapped
+    file, and 'csr' keeps only the pairs within the maximum radio range as a sparse matrix.
+    """
+    fmt = config.DISTANCE_MATRIX_FORMAT
+    if path is None:
+        path = "node_distance_matrix." + ("npy" if fmt == "npy" else "npz")
+    ids, xy = distances.positions_array(NODE_POS)
+    if fmt == "npy":
+        distances.save_distance_matrix_npy(path, ids, xy, config.DISTANCE_BLOCK_ROWS)
+    elif fmt == "csr":
+        max_range = max(config.NODE_TX_RANGES.values()) * config.SCALE
+        distances.save_distance_csr_npz(path, ids, xy, max_range, config.DISTANCE_BLOCK_ROWS)
+    else:
+        distances.save_distance_matrix_npz(path, ids, xy, config.DISTANCE_BLOCK_ROWS)
 
 
-def write_clusterhead_distances_csv(path="clusterhead_distances.csv"):
-    """Write pairwise distances between current cluster heads."""
-    clusterheads = []
+def write_clusterhead_distances_csv():
+    """Append the changes in pairwise distances between current cluster heads to CH_DISTANCES_EXPORT."""
+    clusterheads = {}
     for node in sim.nodes:
         # Only collect nodes that are cluster heads and have recorded positions
         if hasattr(node, "role") and node.role == Roles.CLUSTER_HEAD and node.id in NODE_POS:
-            x, y = NODE_POS[node.id]
-            clusterheads.append((node.id, x, y))
-
-    if len(clusterheads) < 2:
-        # Still write the header so the file exists/is refreshed
-        with open(path, "w", newline="") as f:
-            csv.writer(f).writerow(["clusterhead_1", "clusterhead_2", "distance"])
-        return
-
-    with open(path, "w", newline="") as f:
-        w = csv.writer(f)
-        w.writerow(["clusterhead_1", "clusterhead_2", "distance"])
-        for i, (id1, x1, y1) in enumerate(clusterheads):
-            for id2, x2, y2 in clusterheads[i+1:]:
-                dist = math.hypot(x1 - x2, y1 - y2)
-                w.writerow([id1, id2, f"{dist:.6f}"])
+            clusterheads[node.id] = NODE_POS[node.id]
+    CH_DISTANCES_EXPORT.export(sim.now, clusterheads)
 
 
 
-def write_neighbor_distances_csv(path="neighbor_distances.csv", dedupe_undirected=True):
+def write_neighbor_distances_csv(dedupe_undirected=True):
     """
-    Export neighbor distances per node.
-    Each row is (node -> neighbor) with distance from NODE_POS.
+    Append the changes in neighbor distances per node to NEIGHBOR_DISTANCES_EXPORT.
+    Each row is (node -> neighbor) with distance from NODE_POS. A row is only written
+    when the neighbor appears, disappears or its distance, role or hop count changes;
+    arrival_time is carried along but does not count as a change.
 
     Args:
-        path (str): output CSV path
-        dedupe_undirected (bool): if True, writes each unordered pair once
-                                  (min(node_id,neighbor_id), max(...)).
+        dedupe_undirected (bool): if True, writes each unordered pair once, keyed
+                                  (min(node_id,neighbor_id), max(...)), whichever end reports it.
                                   If False, writes one row per direction.
     """
     # Safety: ensure we can compute distances
@@ -1012,46 +1142,46 @@ def write_neighbor_distances_csv(path="neighbor_distances.csv", dedupe_undirecte
 
     # Prepare a set to avoid duplicates if dedupe_undirected=True
     seen_pairs = set()
+    rows = {}
 
-    with open(path, "w", newline="") as f:
-        w = csv.writer(f)
-        w.writerow(["node_id", "neighbor_id", "distance",
-                    "neighbor_role", "neighbor_hop_count", "arrival_time"])
+    for node in sim.nodes:
+        # Skip nodes without any neighbor info yet
+        if not hasattr(node, "neighbors_table"):
+            continue
+
+        x1, y1 = NODE_POS.get(node.id, (None, None))
+        if x1 is None:
+            continue  # no position → cannot compute distance
+
+        # neighbors_table: key = neighbor GUI, value = heartbeat packet dict
+        for n_gui, pck in getattr(node, "neighbors_table", {}).items():
+            # Optional dedupe (unordered)
+            if dedupe_undirected:
+                key = (min(node.id, n_gui), max(node.id, n_gui))
+                if key in seen_pairs:
+                    continue
+                seen_pairs.add(key)
+            else:
+                key = (node.id, n_gui)
 
-        for node in sim.nodes:
-            # Skip nodes without any neighbor info yet
-            if not hasattr(node, "neighbors_table"):
+            # Position of neighbor
+            x2, y2 = NODE_POS.get(n_gui, (None, None))
+            if x2 is None:
                 continue
 
-            x1, y1 = NODE_POS.get(node.id, (None, None))
-            if x1 is None:
-                continue  # no position → cannot compute distance
-
-            # neighbors_table: key = neighbor GUI, value = heartbeat packet dict
-            for n_gui, pck in getattr(node, "neighbors_table", {}).items():
-                # Optional dedupe (unordered)
-                if dedupe_undirected:
-                    key = (min(node.id, n_gui), max(node.id, n_gui))
-                    if key in seen_pairs:
-                        continue
-                    seen_pairs.add(key)
-
-                # Position of neighbor
-                x2, y2 = NODE_POS.get(n_gui, (None, None))
-                if x2 is None:
-                    continue
+            # Distance (prefer pck['distance'] if you added it in update_neighbor)
+            dist = pck.get("distance")
+            if dist is None:
+                dist = math.hypot(x1 - x2, y1 - y2)
 
-                # Distance (prefer pck['distance'] if you added it in update_neighbor)
-                dist = pck.get("distance")
-                if dist is None:
-                    dist = math.hypot(x1 - x2, y1 - y2)
+            # Extra fields (best-effort; may be missing)
+            n_role = getattr(pck.get("role", None), "name", pck.get("role", None))
+            hop = pck.get("hop_count", "")
+            at  = pck.get("arrival_time", "")
 
-                # Extra fields (best-effort; may be missing)
-                n_role = getattr(pck.get("role", None), "name", pck.get("role", None))
-                hop = pck.get("hop_count", "")
-                at  = pck.get("arrival_time", "")
+            rows[key] = ((f"{dist:.6f}", n_role, hop), (at,))  # the same link seen from either end is one row
 
-                w.writerow([node.id, n_gui, f"{dist:.6f}", n_role, hop, at])
+    NEIGHBOR_DISTANCES_EXPORT.export(sim.now, rows)
 
 ###########################################################
 def create_network(node_class, number_of_nodes=100):
@@ -1088,8 +1218,7 @@ sim = wsn.Simulator(
 # creating random network
 create_network(SensorNode, config.SIM_NODE_COUNT)
 
-write_node_distances_csv("node_distances.csv")
-write_node_distance_matrix_csv("node_distance_matrix.csv")
+write_node_distance_matrix()
 
 # start the simulation
 sim.run()
@@ -33,7 +33,7 @@ class SensorNode(wsn.Node):
         Returns:
 
         """
-        self.scene.nodecolor(self.id, 1, 1, 1) # sets self color to white
+        self.vis.nodecolor(self.id, 1, 1, 1) # sets self color to white
         self.sleep()
         self.addr = None
         self.ch_addr = None
@@ -78,7 +78,7 @@ class SensorNode(wsn.Node):
         if self.role != Roles.UNDISCOVERED:
             self.kill_all_timers()
             self.log('I became UNREGISTERED')
-        self.scene.nodecolor(self.id, 1, 1, 0)
+        self.vis.nodecolor(self.id, 1, 1, 0)
         self.erase_parent()
         self.addr = None
         self.ch_addr = None
@@ -429,7 +429,7 @@ class SensorNode(wsn.Node):
                 self.send_network_request()
             if pck['type'] == 'NETWORK_REPLY':  # it becomes cluster head and send join reply to the candidates
                 self.role = Roles.CLUSTER_HEAD
-                self.scene.nodecolor(self.id, 0, 0, 1)
+                self.vis.nodecolor(self.id, 0, 0, 1)
                 self.ch_addr = pck['addr']
                 self.send_network_update()
                 self.send_heart_beat()
@@ -464,7 +464,7 @@ class SensorNode(wsn.Node):
                         self.send_network_update()
                     else:
                         self.role = Roles.REGISTERED
-                        self.scene.nodecolor(self.id, 0, 1, 0)
+                        self.vis.nodecolor(self.id, 0, 1, 0)
                     # # sensor implementation
                     # timer_duration =  self.id % 20
                     # if timer_duration == 0: timer_duration = 1
@@ -482,7 +482,7 @@ class SensorNode(wsn.Node):
 
         """
         if name == 'TIMER_ARRIVAL':  # it wakes up and set timer probe once time arrival timer fired
-            self.scene.nodecolor(self.id, 1, 0, 0)  # sets self color to red
+            self.vis.nodecolor(self.id, 1, 0, 0)  # sets self color to red
             self.wake_up()
             self.set_timer('TIMER_PROBE', 1)
 
@@ -494,7 +494,7 @@ class SensorNode(wsn.Node):
             else:  # if the counter reached the threshold
                 if self.is_root_eligible:  # if the node is root eligible, it becomes root
                     self.role = Roles.ROOT
-                    self.scene.nodecolor(self.id, 0, 0, 0)
+                    self.vis.nodecolor(self.id, 0, 0, 0)
                     self.addr = wsn.Addr(self.id, 254)
                     self.ch_addr = wsn.Addr(self.id, 254)
                     self.root_addr = self.addr
@@ -525,7 +525,7 @@ class SensorNode(wsn.Node):
         elif name == 'TIMER_DEAD':  # it dies and goes to sleep
             self.sleep()
             self.log('I AM DEAD')
-            self.scene.nodecolor(self.id, 1, 1, 1)  # sets self color to red
+            self.vis.nodecolor(self.id, 1, 1, 1)  # sets self color to red
             self.erase_parent()
             self.kill_all_timers()
 
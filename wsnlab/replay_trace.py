@@ -0,0 +1,238 @@
+"""Plays back a visual event trace recorded with config.SIM_TRACE_FILE in the TopoVis/Tk viewer.
+
+The trace holds role colors, tx range circles, parent links, moves and packet hops stamped
+with simulation time, so a (headless) run can be inspected and scrubbed any number of times
+without simulating again.
+
+Usage: python replay_trace.py [trace.csv] [--speed S] [--start T] [--end T] [--step T]
+
+Keys: space pause/resume, Left/Right seek back/forward by --step, Home/End jump to the
+window start/end, +/- double/halve the speed.
+"""
+import argparse
+import bisect
+import csv
+
+from source import config
+from source.wsnlab_vis import packet_animation_time
+from topovis import Scene
+from topovis.TkPlotter import Plotter
+
+TRACE_FILE = 'vis_trace.csv'
+SPEED = 10.0  # simulation seconds played per wall-clock second
+SEEK_STEP = 50.0  # simulation seconds skipped by Left/Right
+
+LINE_STYLES = {
+    "wsnsimpy:tx": dict(color=(0, 0, 1), dash=(5, 5)),
+    "wsnsimpy:packet": dict(color=(1, 0, 0), width=3),
+    "wsnsimpy:mesh": dict(color=(1, 0, 1), width=3),
+    "wsnsimpy:data": dict(color=(1, 1, 0), width=3),
+    "parent": dict(color=(0, .8, 0), arrow="tail", width=2),
+}
+
+
+###########################################################
+def read_trace(path):
+    """Reads a trace into a list of (time, event, node, args) sorted by time."""
+    events = []
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            event = row['event']
+            args = [row['a'], row['b'], row['c']]
+            if event == 'packet':
+                args = [int(args[0]), args[1]]
+            elif event in ('parent', 'parent_clear'):
+                args = [int(args[0])]
+            elif event != 'tx_clear':
+                args = [float(v) for v in args if v != '']
+            events.append((float(row['time']), event, int(row['node']), args))
+    events.sort(key=lambda e: e[0])  # stable, keeps the recorded order of simultaneous events
+    return events
+
+
+###########################################################
+class TraceState:
+    """Visual state of the network at one point of the trace.
+
+       Attributes:
+           pos (Dict): node -> (x, y).
+           color (Dict): node -> (r, g, b).
+           tx (Dict): node -> (x, y, radius) of its tx range circle.
+           links (Set): (parent, child) parent links.
+    """
+
+    def __init__(self):
+        self.pos = {}
+        self.color = {}
+        self.tx = {}
+        self.links = set()
+
+    ############################
+    def apply(self, event, node, args):
+        """Applies one non-transient event."""
+        if event in ('node', 'move'):
+            self.pos[node] = tuple(args)
+        elif event == 'color':
+            self.color[node] = tuple(args)
+        elif event == 'tx':
+            self.tx[node] = tuple(args)
+        elif event == 'tx_clear':
+            self.tx.pop(node, None)
+        elif event == 'parent':
+            self.links.add((args[0], node))
+        elif event == 'parent_clear':
+            self.links.discard((args[0], node))
+
+
+###########################################################
+class Replayer:
+    """Drives a TopoVis scene from a trace on the Tk frame clock.
+
+       Attributes:
+           events (List): Trace events sorted by time.
+           start (double): Start of the played time window.
+           end (double): End of the played time window.
+           speed (double): Simulation seconds per wall-clock second.
+           now (double): Current playback time.
+           paused (bool): Playback paused flag.
+    """
+
+    ############################
+    def __init__(self, events, start, end, speed, step):
+        self.events = events
+        self.times = [e[0] for e in events]
+        self.start = start
+        self.end = end
+        self.speed = speed
+        self.step = step
+        self.paused = False
+
+        self.scene = Scene(realtime=True)
+        for name, style in LINE_STYLES.items():
+            self.scene.linestyle(name, **style)
+        self.plotter = Plotter(windowTitle='Trace replay', terrain_size=config.SIM_TERRAIN_SIZE,
+                               fps=config.SIM_FRAME_RATE, maxPackets=config.SIM_MAX_PACKET_ANIMATIONS)
+        self.scene.addPlotter(self.plotter)
+        self.scene.init(*config.SIM_TERRAIN_SIZE)
+        self.shown = TraceState()
+        self.now = start
+        self.cursor = 0  # index of the first event after self.now
+        self.seek(start)
+
+        tk = self.plotter.tk
+        tk.bind('<space>', lambda e: self.toggle())
+        tk.bind('<Left>', lambda e: self.seek(self.now - self.step))
+        tk.bind('<Right>', lambda e: self.seek(self.now + self.step))
+        tk.bind('<Home>', lambda e: self.seek(self.start))
+        tk.bind('<End>', lambda e: self.seek(self.end))
+        tk.bind('<plus>', lambda e: self.set_speed(self.speed * 2))
+        tk.bind('<minus>', lambda e: self.set_speed(self.speed / 2))
+        self.interval = max(int(1000 / config.SIM_FRAME_RATE), 1)
+        tk.after(self.interval, self.tick)
+
+    ############################
+    def toggle(self):
+        self.paused = not self.paused
+
+    ############################
+    def set_speed(self, speed):
+        self.speed = speed
+        print(f"speed: {speed:g}x")
+
+    ############################
+    def seek(self, time):
+        """Jumps to time: rebuilds the state at that time and draws only what differs from
+        the screen. Packets in between are not animated."""
+        time = min(max(time, self.start), self.end)
+        self.cursor = bisect.bisect_right(self.times, time)
+        state = TraceState()
+        for t, event, node, args in self.events[:self.cursor]:
+            state.apply(event, node, args)
+        self.show(state)
+        self.now = time
+        self.scene.setTime(time)
+
+    ############################
+    def tick(self):
+        """Advances playback by one frame and applies the events it covers."""
+        if not self.paused and self.now < self.end:
+            self.advance(min(self.now + self.speed * self.interval / 1000, self.end))
+        self.plotter.tk.after(self.interval, self.tick)
+
+    ############################
+    def advance(self, time):
+        state = self.shown
+        stop = bisect.bisect_right(self.times, time)
+        for t, event, node, args in self.events[self.cursor:stop]:
+            if event == 'packet':
+                if args[0] in self.scene.nodes and node in self.scene.nodes:
+                    self.scene.packet(node, args[0], line=args[1],
+                                      duration=packet_animation_time(
+                                          config.SIM_PACKET_ANIMATION_TIME / self.speed))
+                continue
+            self.draw(event, node, args)
+            state.apply(event, node, args)
+        self.cursor = stop
+        self.now = time
+        self.scene.setTime(time)
+
+    ############################
+    def draw(self, event, node, args):
+        """Applies one event to the scene, given the currently shown state."""
+        scene = self.scene
+        if event == 'node' and node not in scene.nodes:
+            scene.node(node, *args)
+        elif event in ('node', 'move'):
+            scene.nodemove(node, *args)
+        elif event == 'color':
+            scene.nodecolor(node, *args)
+        elif event == 'tx':
+            x, y, r = args
+            scene.circle(x, y, r, id=f"tx_{node}", line="wsnsimpy:tx")
+        elif event == 'tx_clear':
+            scene.delshape(f"tx_{node}")
+        elif event == 'parent':
+            if (args[0], node) not in self.shown.links and args[0] in scene.nodes:
+                scene.addlink(args[0], node, "parent")
+        elif event == 'parent_clear':
+            if (args[0], node) in self.shown.links:
+                scene.dellink(args[0], node, "parent")
+
+    ############################
+    def show(self, state):
+        """Makes the screen show state, issuing commands only for differences."""
+        shown = self.shown
+        for node, pos in state.pos.items():
+            if node not in self.scene.nodes:
+                self.draw('node', node, pos)
+            elif shown.pos.get(node) != pos:
+                self.draw('move', node, pos)
+        for node, color in state.color.items():
+            if shown.color.get(node) != color:
+                self.draw('color', node, color)
+        for node in shown.tx.keys() - state.tx.keys():
+            self.draw('tx_clear', node, [])
+        for node, circle in state.tx.items():
+            if shown.tx.get(node) != circle:
+                self.draw('tx', node, circle)
+        for parent, child in shown.links - state.links:
+            self.draw('parent_clear', child, [parent])
+        for parent, child in state.links - shown.links:
+            self.draw('parent', child, [parent])
+        self.shown = state
+
+
+###########################################################
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a recorded visual event trace.")
+    parser.add_argument("trace", nargs="?", default=TRACE_FILE)
+    parser.add_argument("--speed", type=float, default=SPEED, help="simulation seconds per second")
+    parser.add_argument("--start", type=float, default=0.0, help="start of the time window")
+    parser.add_argument("--end", type=float, default=None, help="end of the time window")
+    parser.add_argument("--step", type=float, default=SEEK_STEP, help="seek step of Left/Right keys")
+    args = parser.parse_args()
+
+    events = read_trace(args.trace)
+    end = args.end if args.end is not None else (events[-1][0] if events else 0.0)
+    replayer = Replayer(events, args.start, end, args.speed, args.step)
+    replayer.plotter.tk.mainloop()
@@ -0,0 +1,312 @@
+"""Address allocation for cluster heads (member node ids) and the root (network ids).
+
+Cluster heads used to scan node_available_dict (NUM_OF_CHILDREN entries) on every
+JOIN_REQUEST and the root scanned net_id_available_dict on every NETWORK_REQUEST, and an
+id stayed taken forever once given out. AddressAllocator keeps the used ids in an integer
+bitmap, so the lowest free id (the one the scans picked) is found with a few big-int
+operations, and owner -> id / id -> owner dicts, so a repeated request from the same owner
+gets its id back instead of a second one.
+
+With a lease time, every allocation holds a lease that the owner renews by being heard
+(heart beats for members, NETWORK_UPDATE for networks). Leases are kept in a heap with lazy
+renewal: an expired heap entry whose lease has been renewed is pushed again with its new
+expiry. Expired ids are reclaimed when the allocator is next asked for an id, so silent
+(dead) nodes give their address back without a timer per lease.
+
+BlockAllocator hands out contiguous blocks of network ids instead, for NET_ID_DELEGATION: the
+root grants a block to a cluster head, whose network id is the first id of the block, and the
+cluster head grants blocks out of the rest of its own to the cluster heads below it. A block is
+leased like an id, renewed whenever a NETWORK_UPDATE lists a network inside it, so a block comes
+back to its grantor once nothing in the subtree that holds it is heard anymore.
+"""
+from bisect import bisect_right, insort
+from heapq import heappush, heappop
+
+
+###########################################################
+class AddressAllocator:
+    """Allocator of the ids first..last with optional leases.
+
+       Attributes:
+           first (int): Smallest id.
+           last (int): Largest id.
+           lease_time (double): Lease duration, None for ids held until released.
+           owners (Dict): id -> owner.
+           ids (Dict): owner -> id.
+           expiry (Dict): id -> lease expiry time.
+           reclaimed (int): Number of ids reclaimed from expired leases.
+    """
+
+    ############################
+    def __init__(self, first, last, lease_time=None):
+        """Constructor for AddressAllocator class.
+
+           Args:
+               first (int): Smallest id.
+               last (int): Largest id.
+               lease_time (double): Lease duration, None for ids held until released.
+
+           Returns:
+               AddressAllocator: Created AddressAllocator object.
+        """
+        self.first = first
+        self.last = last
+        self.lease_time = lease_time
+        self.used = 0  # bit i set if id first+i is allocated
+        self.full = (1 << (last - first + 1)) - 1
+        self.owners = {}
+        self.ids = {}
+        self.expiry = {}
+        self.leases = []  # (expiry, id) heap, an entry is stale if expiry[id] is later
+        self.reclaimed = 0
+
+    ############################
+    def __len__(self):
+        return len(self.owners)
+
+    ############################
+    def copy(self):
+        """Returns an independent copy, e.g. to hand the allocations over to a new cluster head."""
+        other = AddressAllocator(self.first, self.last, self.lease_time)
+        other.used = self.used
+        other.owners = dict(self.owners)
+        other.ids = dict(self.ids)
+        other.expiry = dict(self.expiry)
+        other.leases = list(self.leases)
+        other.reclaimed = self.reclaimed
+        return other
+
+    ############################
+    def id_of(self, owner):
+        """Returns the id allocated to owner, or None."""
+        return self.ids.get(owner)
+
+    ############################
+    def owner_of(self, id):
+        """Returns the owner of id, or None if it is free."""
+        return self.owners.get(id)
+
+    ############################
+    def allocate(self, owner, now=0):
+        """Returns the id of owner, allocating the lowest free id if it has none.
+
+           Args:
+               owner (Object): Hashable owner, e.g. a node gui.
+               now (double): Current time, starts or renews the lease.
+
+           Returns:
+               int: Allocated id, or None if all ids are taken.
+        """
+        id = self.ids.get(owner)
+        if id is None:
+            self.reclaim(now)
+            if self.used == self.full:
+                return None
+            bit = ~self.used & (self.used + 1)  # lowest clear bit
+            self.used |= bit
+            id = self.first + bit.bit_length() - 1
+            self.owners[id] = owner
+            self.ids[owner] = id
+        self._lease(id, now)
+        return id
+
+    ############################
+    def release(self, id):
+        """Frees id. Returns its former owner, or None if it was free."""
+        owner = self.owners.pop(id, None)
+        if owner is not None:
+            del self.ids[owner]
+            self.expiry.pop(id, None)
+            self.used &= ~(1 << (id - self.first))
+        return owner
+
+    ############################
+    def renew(self, owner, now):
+        """Renews the lease of owner's id, if it has one."""
+        id = self.ids.get(owner)
+        if id is not None:
+            self._lease(id, now)
+
+    ############################
+    def renew_id(self, id, now):
+        """Renews the lease of id, if it is allocated."""
+        if id in self.owners:
+            self._lease(id, now)
+
+    ############################
+    def hold(self, owner):
+        """Drops the lease of owner's id so it is kept until released, e.g. for an address
+        the allocating node holds itself and never hears renewed."""
+        id = self.ids.get(owner)
+        if id is not None:
+            self.expiry.pop(id, None)
+
+    ############################
+    def _lease(self, id, now):
+        if self.lease_time is None:
+            return
+        expiry = now + self.lease_time
+        if id not in self.expiry:
+            heappush(self.leases, (expiry, id))
+        self.expiry[id] = expiry
+
+    ############################
+    def reclaim(self, now):
+        """Releases the ids whose lease expired before now. Returns the list of (id, owner)."""
+        released = []
+        leases = self.leases
+        while leases and leases[0][0] < now:
+            expiry, id = heappop(leases)
+            current = self.expiry.get(id)
+            if current is None:
+                continue  # released or held meanwhile
+            if current > expiry:
+                heappush(leases, (current, id))  # renewed meanwhile
+                continue
+            released.append((id, self.release(id)))
+        self.reclaimed += len(released)
+        return released
+
+
+###########################################################
+class BlockAllocator:
+    """Allocator of contiguous blocks of the ids first..last with optional leases.
+
+       Attributes:
+           first (int): Smallest id.
+           last (int): Largest id.
+           max_size (int): Largest block granted.
+           lease_time (double): Lease duration, None for blocks held until released.
+           blocks (Dict): owner -> (first, last) of its block.
+           expiry (Dict): owner -> lease expiry time.
+           reclaimed (int): Number of blocks reclaimed from expired leases.
+    """
+
+    ############################
+    def __init__(self, first, last, max_size, lease_time=None):
+        """Constructor for BlockAllocator class.
+
+           Args:
+               first (int): Smallest id, last < first for an empty allocator.
+               last (int): Largest id.
+               max_size (int): Largest block granted.
+               lease_time (double): Lease duration, None for blocks held until released.
+
+           Returns:
+               BlockAllocator: Created BlockAllocator object.
+        """
+        self.first = first
+        self.last = last
+        self.max_size = max_size
+        self.lease_time = lease_time
+        self.blocks = {}
+        self.starts = []  # sorted first ids of the granted blocks
+        self.owner_at = {}  # first id of a block -> owner
+        self.expiry = {}
+        self.reclaimed = 0
+
+    ############################
+    def __len__(self):
+        return len(self.blocks)
+
+    ############################
+    def copy(self):
+        """Returns an independent copy, e.g. to hand the blocks over to a new cluster head."""
+        other = BlockAllocator(self.first, self.last, self.max_size, self.lease_time)
+        other.blocks = dict(self.blocks)
+        other.starts = list(self.starts)
+        other.owner_at = dict(self.owner_at)
+        other.expiry = dict(self.expiry)
+        other.reclaimed = self.reclaimed
+        return other
+
+    ############################
+    def block_of(self, owner):
+        """Returns the (first, last) block of owner, or None."""
+        return self.blocks.get(owner)
+
+    ############################
+    def _free_runs(self):
+        start = self.first
+        for first in self.starts:
+            if first > start:
+                yield start, first - 1
+            start = self.blocks[self.owner_at[first]][1] + 1
+        if start <= self.last:
+            yield start, self.last
+
+    ############################
+    def grant(self, owner, now=0):
+        """Returns the block of owner, granting one if it has none. A new block is the upper
+        half of the largest free run, at most max_size ids, so the lower half stays free for
+        the next request.
+
+           Args:
+               owner (Object): Hashable owner, e.g. a node gui.
+               now (double): Current time, starts or renews the lease.
+
+           Returns:
+               Tuple(int, int): (first, last) of the block, or None if no id is free.
+        """
+        block = self.blocks.get(owner)
+        if block is None:
+            self.reclaim(now)
+            best = None
+            for first, last in self._free_runs():
+                if best is None or last - first > best[1] - best[0]:
+                    best = (first, last)
+            if best is None:
+                return None
+            size = min(max((best[1] - best[0] + 1) // 2, 1), self.max_size)
+            block = (best[1] - size + 1, best[1])
+            self.blocks[owner] = block
+            insort(self.starts, block[0])
+            self.owner_at[block[0]] = owner
+        self._lease(owner, now)
+        return block
+
+    ############################
+    def release(self, owner):
+        """Frees the block of owner. Returns the block, or None if owner had none."""
+        block = self.blocks.pop(owner, None)
+        if block is not None:
+            self.starts.remove(block[0])
+            del self.owner_at[block[0]]
+            self.expiry.pop(owner, None)
+        return block
+
+    ############################
+    def owner_of(self, id):
+        """Returns the owner of the block holding id, or None."""
+        i = bisect_right(self.starts, id) - 1
+        if i < 0:
+            return None
+        owner = self.owner_at[self.starts[i]]
+        return owner if id <= self.blocks[owner][1] else None
+
+    ############################
+    def renew(self, owner, now):
+        """Renews the lease of owner's block, if it has one."""
+        if owner in self.blocks:
+            self._lease(owner, now)
+
+    ############################
+    def renew_ids(self, ids, now):
+        """Renews the leases of the blocks holding any of ids."""
+        for id in ids:
+            owner = self.owner_of(id)
+            if owner is not None:
+                self._lease(owner, now)
+
+    ############################
+    def _lease(self, owner, now):
+        if self.lease_time is not None:
+            self.expiry[owner] = now + self.lease_time
+
+    ############################
+    def reclaim(self, now):
+        """Releases the blocks whose lease expired before now. Returns the list of (block, owner)."""
+        expired = [owner for owner, expiry in self.expiry.items() if expiry < now]
+        released = [(self.release(owner), owner) for owner in expired]
+        self.reclaimed += len(released)
+        return released
@@ -0,0 +1,120 @@
+"""Candidate parent table of a joining node, indexed for parent selection.
+
+update_neighbor used to find a candidate by gui with a linear scan and list.remove, and
+select_and_join scanned every candidate for the smallest (hop_count, gui) among those with
+fewer than jr_threshold join attempts. CandidateParents keeps the latest heart beat of each
+candidate in a dict and a heap of (hop_count, gui) with lazy invalidation: a hop count change
+pushes a new heap entry and leaves the old one to be discarded when it reaches the top, and
+candidates are dropped from the heap when they run out of join attempts. A heart beat update
+is O(log k) and the best parent is read from the top of the heap.
+
+The hop count of a candidate is the one of its latest heart beat, i.e. of its
+neighbors_table entry, so it is refreshed even when the stored candidate packet is kept.
+"""
+from heapq import heappush, heappop, heapify
+
+
+###########################################################
+class CandidateParents:
+    """Candidate parents keyed by gui with a (hop_count, gui) priority index.
+
+       Attributes:
+           threshold (int): Join attempts after which a candidate is skipped.
+           entries (Dict): gui -> latest candidate heart beat packet.
+           hops (Dict): gui -> hop count used for selection.
+           attempts (Dict): gui -> join requests sent to it (the node's join_req_attempts).
+    """
+
+    ############################
+    def __init__(self, threshold, attempts=None):
+        """Constructor for CandidateParents class.
+
+           Args:
+               threshold (int): Join attempts after which a candidate is skipped.
+               attempts (Dict): Existing gui -> join attempts dict to keep counting in.
+
+           Returns:
+               CandidateParents: Created CandidateParents object.
+        """
+        self.threshold = threshold
+        self.entries = {}
+        self.hops = {}
+        self.attempts = {} if attempts is None else attempts
+        self.heap = []  # (hop_count, gui), stale if hops[gui] differs or gui is exhausted
+
+    ############################
+    def __len__(self):
+        return len(self.entries)
+
+    ############################
+    def __iter__(self):
+        return iter(self.entries.values())
+
+    ############################
+    def get(self, gui):
+        """Returns the candidate packet of gui, or None."""
+        return self.entries.get(gui)
+
+    ############################
+    def _push(self, gui):
+        if self.attempts.get(gui, 0) < self.threshold:
+            heappush(self.heap, (self.hops[gui], gui))
+            if len(self.heap) > 2 * len(self.entries) + 16:
+                self.rebuild()
+
+    ############################
+    def set_hop_count(self, gui, hop_count):
+        """Updates the selection priority of gui if it is a candidate."""
+        if gui in self.entries and self.hops[gui] != hop_count:
+            self.hops[gui] = hop_count
+            self._push(gui)
+
+    ############################
+    def offer(self, pck):
+        """Adds a heart beat as candidate, replacing the stored one of the same gui only if
+        it arrived later."""
+        gui = pck['gui']
+        existing = self.entries.get(gui)
+        if existing is None:
+            self.entries[gui] = pck
+            self.hops[gui] = pck['hop_count']
+            self._push(gui)
+        elif pck['arrival_time'] > existing['arrival_time']:
+            self.entries[gui] = pck
+            self.set_hop_count(gui, pck['hop_count'])
+
+    ############################
+    def best(self):
+        """Returns the gui with the smallest (hop_count, gui) among candidates with join
+        attempts left, or None."""
+        heap = self.heap
+        while heap:
+            hop_count, gui = heap[0]
+            if self.hops.get(gui) == hop_count and self.attempts.get(gui, 0) < self.threshold:
+                return gui
+            heappop(heap)
+        return None
+
+    ############################
+    def select(self):
+        """Returns best() and counts a join attempt for it."""
+        gui = self.best()
+        if gui is not None:
+            self.attempts[gui] = self.attempts.get(gui, 0) + 1
+            if self.attempts[gui] >= self.threshold:
+                heappop(self.heap)
+        return gui
+
+    ############################
+    def reset_attempts(self):
+        """Sets all join attempts back to 0, making every candidate eligible again."""
+        for gui in self.attempts:
+            self.attempts[gui] = 0
+        self.rebuild()
+
+    ############################
+    def rebuild(self):
+        """Rebuilds the heap from the live entries, dropping stale ones."""
+        self.heap = [(self.hops[gui], gui) for gui in self.entries
+                     if self.attempts.get(gui, 0) < self.threshold]
+        heapify(self.heap)
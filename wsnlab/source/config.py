@@ -17,6 +17,8 @@ def get_tx_range(power):
 ##Radio properties, CC2420
 DATARATE = 250000 #data rate, 250kbps
 MTU = 127 + 6 #size of the over the air packet
+FRAME_OVERHEAD = 6 + 11 #PHY header and MAC header/FCS of every frame, bytes
+MAX_FRAME_PAYLOAD = 127 - 11 #message bytes carried by one frame, larger messages are fragmented
 VOLTAGE = 3 #volts
 TX_CURRENTS = {"-25 dBm": 8.5, "-15 dBm": 9.9, "-10 dBm": 11, "-5 dBm": 14, "0 dBm": 17.4} #mA
 RX_CURRENT = 18.8 #mA
@@ -30,6 +32,17 @@ SIM_TIME_SCALE = 0.01  #  The real time dureation of 1 second simualtion time
 SIM_TERRAIN_SIZE = (1400, 1400)  #terrain size
 SIM_TITLE = 'Data Collection Tree'  # title of visualization window
 SIM_VISUALIZATION = True  # visualization active
+SIM_FRAME_RATE = 30  # frames per second; scene changes within a frame are coalesced into one redraw
+SIM_PACKET_ANIMATION_TIME = 0.5  # simulation seconds a packet takes to cross a link on screen
+SIM_PACKET_ANIMATION_MIN_FRAMES = 3  # a packet stays on screen for at least this many frames, however fast the time scale
+SIM_MAX_PACKET_ANIMATIONS = 200  # packet markers animated at once; packets beyond this are not drawn
+SIM_LOD_MAX_NODES = 2000  # above this many nodes in view, the Tk window draws aggregated tiles instead of nodes
+SIM_LOD_TILE_SIZE = 24  # tile size in pixels in level-of-detail mode
+SIM_LOD_TILE_COLOR = 'role'  # 'role' for the mean role color of a tile, 'energy' for mean residual energy
+SIM_RENDER_DIR = None  # e.g. 'frames' to write the scene as PNG frames off-screen (needs Pillow); None disables
+SIM_RENDER_INTERVAL = 10  # simulation seconds between rendered frames
+SIM_RENDER_FORMAT = 'png'  # 'png' for numbered frames only, 'gif' to also assemble frames/animation.gif
+SIM_TRACE_FILE = None  # e.g. 'vis_trace.csv' to record visual events for replay_trace.py; None disables
 SCALE = 1  # scale factor for visualization
 VIS = 0 #0 for no viz, 1 for viz
 SEED = 1 #seed for reproducibility 
@@ -43,16 +56,41 @@ TRANSMISSION_TIME = 0.00000005 #seconds, 133 * 8 / tx_rate = 4.256 ms round up t
 PROCESSING_TIME = 0.000001 #seconds, research for CC2420 was around a mean of 1 ms. HAD TO SCALE THESE VALUES DOWN FOR SAKE OF THE SIMULATION
 ## application properties
 SLEEP_MODE_PROBE_TIME_INTERVAL = 30
+PROBE_RESPONSE_JITTER = 0.5  # heart beat replies to a PROBE wait a random time up to this
+PROBE_RESPONSE_REDUNDANCY = 3  # a pending probe reply is dropped if this many heart beats were overheard meanwhile
+PROBE_RESPONSE_MIN_INTERVAL = 5  # a prober is answered at most once in this time
 HEART_BEAT_TIME_INTERVAL = 1
 JOIN_REQUEST_TIME_INTERVAL = 10
 JR_THRESHOLD_TO_EXPAND_TX_RANGE = 10
-NETWORK_REQUEST_TIME_INTERVAL = JOIN_REQUEST_TIME_INTERVAL * 2
+NETWORK_REQUEST_TIME_INTERVAL = JOIN_REQUEST_TIME_INTERVAL * 2  # a pending NETWORK_REQUEST is retried after a random time of up to this, doubling per retry
+NETWORK_REQUEST_MAX_BACKOFF = NETWORK_REQUEST_TIME_INTERVAL * 8  # largest wait between two NETWORK_REQUESTs of a node
+NETWORK_REQUEST_DUPLICATE_WINDOW = NETWORK_REQUEST_TIME_INTERVAL / 4  # the root drops a request from a requester it answered this recently
 DATA_INTERVAL = 100
 MESH_HOP_N = 5
 TABLE_SHARE_INTERVAL = 30
+TABLE_SHARE_FULL_SYNC_EVERY = 10  # every Nth table share sends the whole table instead of the changes, 1 to always send it
+NETWORK_UPDATE_DEBOUNCE = 2  # network updates heard from below go up together this long after the first, as changes only
+HEART_BEAT_TRICKLE = False  # True for adaptive (Trickle) heart beat intervals, False for one heart beat every HEART_BEAT_TIME_INTERVAL
+HEART_BEAT_MAX_INTERVAL = HEART_BEAT_TIME_INTERVAL * 16  # heart beat intervals double up to this while the neighborhood is consistent
+HEART_BEAT_REDUNDANCY = 3  # a heart beat is suppressed if this many consistent ones were heard earlier in its interval
+HEART_BEAT_MAX_SILENCE = TABLE_SHARE_INTERVAL  # suppression never keeps a node unheard longer, parents are given up after TABLE_SHARE_INTERVAL * 2
+NODE_ADDR_LEASE_TIME = TABLE_SHARE_INTERVAL * 4  # member id reclaimed when no heart beat heard for this long, None to keep forever
+NET_ID_LEASE_TIME = TABLE_SHARE_INTERVAL * 4  # network id reclaimed when no NETWORK_UPDATE at the root lists it for this long
+NET_ID_DELEGATION = False  # True for cluster heads to get blocks of network ids and serve the NETWORK_REQUESTs of their members, False for the root to serve every request
+NET_ID_BLOCK_SIZE = 32  # largest block of network ids granted to a cluster head
 REPAIRING_METHOD = 'FIND_ANOTHER_PARENT' # 'ALL_ORPHAN', 'FIND_ANOTHER_PARENT'
 EXPORT_CH_CSV_INTERVAL = 10  # simulation time units;
 EXPORT_NEIGHBOR_CSV_INTERVAL = 10  # simulation time units;
+EXPORT_CH_CSV_PATH = 'clusterhead_distances_delta.csv'  # change stream, rebuild with compact_topology_deltas.py
+EXPORT_NEIGHBOR_CSV_PATH = 'neighbor_distances_delta.csv'  # change stream, rebuild with compact_topology_deltas.py
+DISTANCE_MATRIX_FORMAT = 'npz'  # 'npz' compressed full matrix, 'npy' memory-mapped full matrix, 'csr' only pairs within max tx range
+DISTANCE_BLOCK_ROWS = 512  # rows of the distance matrix computed at once, bounds memory on large networks
+METRICS_SUMMARY_FILE = 'metrics_summary.json'  # online metrics dumped at the end of a run
+STATE_SAMPLE_INTERVAL = 100  # simulation time units between node state snapshots
+STATE_SAMPLE_FILE = 'node_state_samples.npz'  # time x node matrices, read by average_power_analysis.py
+DASHBOARD = False  # live metrics dashboard in the terminal, e.g. with SIM_VISUALIZATION = False
+DASHBOARD_REFRESH_RATE = 2  # maximum dashboard redraws per wall-clock second
+DASHBOARD_CHECK_INTERVAL = 1  # simulation time between checks of the wall clock
 
 #PARAMETERS TO KILL NODES
 node_ids = [] #25 is a good one to kill
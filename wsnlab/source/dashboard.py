@@ -0,0 +1,124 @@
+"""Terminal dashboard showing live simulation metrics without a GUI.
+
+A single simulator process wakes up every check interval of simulation time and redraws
+the dashboard only if 1/refresh_rate wall-clock seconds have passed, so the cost to the
+event loop is one timeout per check interval plus a few formatted lines a few times per
+second. Values come from the simulator's MetricsRegistry (role gauges, registered
+fraction, cluster count, energy, packet counters), so any scenario that registers those
+gauges gets the full view.
+
+On a terminal the dashboard is redrawn in place with ANSI escapes at the top of the
+screen (curses is not used because scenario code keeps printing to stdout); otherwise
+one summary line is written per refresh, which suits log files of batch runs.
+"""
+import sys
+import time
+
+ROLE_PREFIX = 'role.'
+
+
+def _fmt(value, spec='.3f'):
+    if value is None:
+        return '-'
+    return format(value, spec) if isinstance(value, float) else str(value)
+
+
+###########################################################
+class Dashboard:
+    """Live terminal view of a running simulation.
+
+       Attributes:
+           sim (Simulator): Simulation to watch.
+           refresh_rate (double): Maximum redraws per wall-clock second.
+           check_interval (double): Simulation time between checks of the wall clock.
+           stream (File): Output stream.
+           ansi (bool): Redraw in place with ANSI escapes instead of printing lines.
+    """
+
+    ############################
+    def __init__(self, sim, refresh_rate=2, check_interval=1, stream=None):
+        """Constructor for Dashboard class.
+
+           Args:
+               sim (Simulator): Simulation to watch.
+               refresh_rate (double): Maximum redraws per wall-clock second.
+               check_interval (double): Simulation time between checks of the wall clock.
+               stream (File): Output stream, sys.stdout if None.
+
+           Returns:
+               Dashboard: Created Dashboard object.
+        """
+        self.sim = sim
+        self.refresh_rate = refresh_rate
+        self.check_interval = check_interval
+        self.stream = sys.stdout if stream is None else stream
+        self.ansi = hasattr(self.stream, 'isatty') and self.stream.isatty()
+        self.redraws = 0
+        self._last_wall = None
+        self._last_events = None
+        self._start_wall = None
+
+    ############################
+    def start(self):
+        """Starts the dashboard process in the simulator."""
+        self.sim.env.process(self._run())
+
+    ############################
+    def _run(self):
+        period = 1.0 / self.refresh_rate
+        self._start_wall = self._last_wall = time.monotonic()
+        self._last_events = self.sim.env.event_count
+        while True:
+            now = time.monotonic()
+            if now - self._last_wall >= period:
+                self.draw(now)
+            yield self.sim.timeout(self.check_interval)
+
+    ############################
+    def values(self, wall=None):
+        """Returns the dashboard values as an ordered dict of label -> value.
+
+           Args:
+               wall (double): Current time.monotonic(); the events/sec rate is measured since
+                   the previous call with a wall time.
+
+           Returns:
+               Dict: label -> value.
+        """
+        metrics = self.sim.metrics
+        gauges = metrics.gauges
+        counters = metrics.counters
+        out = {'sim time': self.sim.now}
+
+        events = self.sim.env.event_count
+        if wall is not None and self._last_events is not None:
+            out['events/sec'] = (events - self._last_events) / max(wall - self._last_wall, 1e-9)
+            out['sim s / wall s'] = self.sim.now / max(wall - self._start_wall, 1e-9)
+            self._last_events = events
+            self._last_wall = wall
+
+        roles = {name[len(ROLE_PREFIX):]: g.summary() for name, g in gauges.items()
+                 if name.startswith(ROLE_PREFIX)}
+        if roles:
+            out['roles'] = '  '.join(f"{name}={count}" for name, count in roles.items())
+        for name in ('registered_fraction', 'cluster_count', 'energy_mean', 'energy_min'):
+            if name in gauges:
+                out[name] = gauges[name].summary()
+        for name in ('tx_packets', 'delivered_packets', 'dropped_packets'):
+            out[name] = counters[name].summary() if name in counters else 0
+        return out
+
+    ############################
+    def draw(self, wall=None):
+        """Redraws the dashboard."""
+        wall = time.monotonic() if wall is None else wall
+        values = self.values(wall)
+        if self.ansi:
+            lines = [f"{label:>20}: {_fmt(value)}" for label, value in values.items()]
+            # save cursor, go home, draw, clear to end of each line, restore cursor
+            text = '\x1b7\x1b[H' + ''.join(f"{line}\x1b[K\n" for line in lines) + '\x1b[K\x1b8'
+        else:
+            text = ' | '.join(f"{label}={_fmt(value)}" for label, value in values.items()) + '\n'
+        self.stream.write(text)
+        self.stream.flush()
+        self.redraws += 1
@@ -0,0 +1,161 @@
+"""Vectorized node-to-node distance outputs.
+
+Distances are computed with NumPy one block of rows at a time, so temporary memory is
+bounded by block_rows x N regardless of network size, and written in binary form:
+a compressed .npz, a memory-mapped .npy, or a sparse CSR matrix holding only the pairs
+within radio range. The full matrix never sits in memory: the .npz is filled block by block
+through a temporary memory-mapped .npy, which is then compressed in buffered chunks. The CSR file uses the same keys as scipy.sparse.save_npz, so it can be
+opened with scipy.sparse.load_npz when SciPy is available.
+"""
+import os
+import tempfile
+
+import numpy as np
+
+DEFAULT_BLOCK_ROWS = 512
+
+
+###########################################################
+def positions_array(node_pos):
+    """Converts a position dict to sorted ids and a coordinate array.
+
+       Args:
+           node_pos (Dict): node id -> (x, y).
+
+       Returns:
+           Tuple(ndarray,ndarray): ids (N,) and coordinates (N, 2), sorted by id.
+    """
+    ids = np.array(sorted(node_pos.keys()), dtype=np.int64)
+    xy = np.array([node_pos[i] for i in ids.tolist()], dtype=np.float64).reshape(-1, 2)
+    return ids, xy
+
+
+###########################################################
+def distance_blocks(xy, block_rows=DEFAULT_BLOCK_ROWS):
+    """Yields the distance matrix one block of rows at a time.
+
+       Args:
+           xy (ndarray): Coordinates, shape (N, 2).
+           block_rows (int): Number of rows computed at once.
+
+       Returns:
+           Iterator of Tuple(int,ndarray): first row index and a (rows, N) block of distances.
+    """
+    x = xy[:, 0]
+    y = xy[:, 1]
+    for start in range(0, len(xy), block_rows):
+        stop = min(start + block_rows, len(xy))
+        yield start, np.hypot(x[start:stop, None] - x[None, :], y[start:stop, None] - y[None, :])
+
+
+###########################################################
+def save_distance_matrix_npz(path, ids, xy, block_rows=DEFAULT_BLOCK_ROWS, dtype=np.float32):
+    """Writes the full distance matrix and node ids to a compressed .npz file. The blocks go
+    to a temporary memory-mapped .npy next to path first, so memory stays bounded.
+
+       Args:
+           path (string): Output path.
+           ids (ndarray): Node ids, row/column order of the matrix.
+           xy (ndarray): Coordinates, shape (N, 2).
+           block_rows (int): Number of rows computed at once.
+           dtype (dtype): Stored element type.
+
+       Returns:
+    """
+    fd, tmp = tempfile.mkstemp(suffix=".npy", dir=os.path.dirname(os.path.abspath(path)))
+    os.close(fd)
+    try:
+        matrix = _fill_memmap(tmp, xy, block_rows, dtype)
+        np.savez_compressed(path, ids=ids, distance=matrix)  # reads the memmap in buffered chunks
+        del matrix
+    finally:
+        os.remove(tmp)
+
+
+###########################################################
+def save_distance_matrix_npy(path, ids, xy, block_rows=DEFAULT_BLOCK_ROWS, dtype=np.float32):
+    """Writes the full distance matrix to a memory-mapped .npy file, block by block.
+    Node ids go to a sibling file with an _ids suffix.
+
+       Args:
+           path (string): Output path, should end with .npy.
+           ids (ndarray): Node ids, row/column order of the matrix.
+           xy (ndarray): Coordinates, shape (N, 2).
+           block_rows (int): Number of rows computed at once.
+           dtype (dtype): Stored element type.
+
+       Returns:
+    """
+    matrix = _fill_memmap(path, xy, block_rows, dtype)
+    del matrix
+    np.save(ids_path(path), ids)
+
+
+###########################################################
+def _fill_memmap(path, xy, block_rows, dtype):
+    matrix = np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=(len(xy), len(xy)))
+    for start, block in distance_blocks(xy, block_rows):
+        matrix[start:start + len(block)] = block
+    matrix.flush()
+    return matrix
+
+
+###########################################################
+def save_distance_csr_npz(path, ids, xy, max_range, block_rows=DEFAULT_BLOCK_ROWS, dtype=np.float32):
+    """Writes only the pairs within max_range (self pairs excluded) as a CSR matrix.
+
+       Args:
+           path (string): Output path.
+           ids (ndarray): Node ids, row/column order of the matrix.
+           xy (ndarray): Coordinates, shape (N, 2).
+           max_range (double): Largest distance kept, e.g. the maximum tx range.
+           block_rows (int): Number of rows computed at once.
+           dtype (dtype): Stored element type.
+
+       Returns:
+           int: Number of stored pairs.
+    """
+    n = len(ids)
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    indices = []
+    data = []
+    for start, block in distance_blocks(xy, block_rows):
+        rows = np.arange(start, start + len(block))
+        mask = block <= max_range
+        mask[rows - start, rows] = False
+        r, c = np.nonzero(mask)
+        indices.append(c)
+        data.append(block[r, c].astype(dtype))
+        indptr[start + 1:start + len(block) + 1] = np.bincount(r, minlength=len(block))
+    np.cumsum(indptr, out=indptr)
+    indices = np.concatenate(indices) if indices else np.zeros(0, dtype=np.int64)
+    data = np.concatenate(data) if data else np.zeros(0, dtype=dtype)
+    np.savez_compressed(path, format=np.array(b"csr"), shape=np.array([n, n]),
+                        indptr=indptr, indices=indices.astype(np.int32), data=data, ids=ids)
+    return len(data)
+
+
+###########################################################
+def ids_path(path):
+    """Returns the sibling path holding node ids of a memory-mapped .npy matrix."""
+    return path[:-4] + "_ids.npy" if path.endswith(".npy") else path + "_ids.npy"
+
+
+###########################################################
+def load_distance_matrix(path):
+    """Loads a matrix written by one of the save functions.
+
+       Args:
+           path (string): .npz or .npy path.
+
+       Returns:
+           Tuple(ndarray,object): ids and the matrix. The matrix is a read-only memmap for .npy
+           files, a dense array for full .npz files and a (data, indices, indptr, shape) tuple for
+           CSR files.
+    """
+    if path.endswith(".npy"):
+        return np.load(ids_path(path)), np.load(path, mmap_mode="r")
+    with np.load(path) as f:
+        if "indptr" in f:
+            return f["ids"], (f["data"], f["indices"], f["indptr"], tuple(f["shape"]))
+        return f["ids"], f["distance"]
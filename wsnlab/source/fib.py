@@ -0,0 +1,124 @@
+"""Per-node forwarding information base (FIB) over the routing tables of a node.
+
+route_and_forward_package used to scan neighbors_table for an entry whose addr equals the
+destination, then members_table, then every child_networks_table list for the destination
+network, on every forwarded packet. ForwardingTable keeps hash indexes over the same tables:
+neighbor addr -> gui, member addrs, and child net_addr -> gui. The node updates it wherever
+it writes those tables (heart beats, table shares, join acks, network updates), so next hop
+selection is a few dict lookups.
+
+The net_addr -> gui index is the node's hierarchical routing index: a NETWORK_UPDATE only
+touches the networks that appeared or disappeared under that child, and its keys are the
+networks below the node, which send_network_update reports upward instead of flattening
+every child list again.
+
+Addr defines __eq__ without __hash__, so addresses are indexed by addr_key(addr), the
+(net_addr, node_addr) tuple. Where several guis share a key (a stale entry of a node that
+changed address), the one inserted first in the node's table wins, as with the linear scans.
+"""
+
+
+###########################################################
+def addr_key(addr):
+    """Returns the hashable (net_addr, node_addr) key of an Addr, or None."""
+    if addr is None:
+        return None
+    return addr.net_addr, addr.node_addr
+
+
+###########################################################
+class ForwardingTable:
+    """Address indexes over neighbors_table, members_table and child_networks_table.
+
+       Attributes:
+           neighbor_addr (Dict): neighbor gui -> addr key of its entry.
+           by_addr (Dict): addr key -> set of neighbor guis with that address.
+           members (Set): addr keys of the members that acked a join.
+           child_nets (Dict): child gui -> set of net_addrs announced by it.
+           by_net (Dict): net_addr -> set of child guis announcing it.
+    """
+
+    ############################
+    def __init__(self):
+        self.clear()
+
+    ############################
+    def clear(self):
+        """Empties the indexes, for when the node resets its tables."""
+        self.neighbor_addr = {}
+        self.by_addr = {}
+        self.neighbor_rank = {}  # gui -> position in neighbors_table
+        self.members = set()
+        self.child_nets = {}
+        self.by_net = {}
+        self.child_rank = {}  # gui -> position in child_networks_table
+
+    ############################
+    @staticmethod
+    def _first(guis, rank):
+        if not guis:
+            return None
+        if len(guis) == 1:
+            return next(iter(guis))
+        return min(guis, key=rank.__getitem__)
+
+    ############################
+    def set_neighbor(self, gui, addr):
+        """Records that neighbors_table[gui] now holds an entry with address addr."""
+        self.neighbor_rank.setdefault(gui, len(self.neighbor_rank))
+        key = addr_key(addr)
+        old = self.neighbor_addr.get(gui)
+        if old == key and gui in self.neighbor_addr:
+            return
+        if old is not None:
+            guis = self.by_addr[old]
+            guis.discard(gui)
+            if not guis:
+                del self.by_addr[old]
+        self.neighbor_addr[gui] = key
+        if key is not None:
+            self.by_addr.setdefault(key, set()).add(gui)
+
+    ############################
+    def neighbor(self, addr):
+        """Returns the gui of the first neighbors_table entry with address addr, or None."""
+        return self._first(self.by_addr.get(addr_key(addr)), self.neighbor_rank)
+
+    ############################
+    def add_member(self, addr):
+        """Records an address appended to members_table."""
+        if addr is not None:
+            self.members.add(addr_key(addr))
+
+    ############################
+    def is_member(self, addr):
+        """Returns True if addr is in members_table."""
+        return addr_key(addr) in self.members
+
+    ############################
+    def set_child_networks(self, gui, networks):
+        """Records that child_networks_table[gui] now lists networks. Only the networks
+        added or removed since the previous update of gui touch the index."""
+        self.child_rank.setdefault(gui, len(self.child_rank))
+        old = self.child_nets.get(gui, frozenset())
+        networks = frozenset(networks)  # a child can list a network twice
+        if networks == old:
+            return
+        for net in old - networks:
+            guis = self.by_net[net]
+            guis.discard(gui)
+            if not guis:
+                del self.by_net[net]
+        for net in networks - old:
+            self.by_net.setdefault(net, set()).add(gui)
+        self.child_nets[gui] = networks
+
+    ############################
+    def child_networks(self):
+        """Returns the net_addrs announced by any child, i.e. the networks below this node."""
+        return list(self.by_net)
+
+    ############################
+    def child_for_net(self, net_addr):
+        """Returns the gui of the first child announcing net_addr, or None."""
+        return self._first(self.by_net.get(net_addr), self.child_rank)
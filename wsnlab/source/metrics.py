@@ -0,0 +1,296 @@
+"""Online metrics collected while the simulation runs.
+
+Counters, gauges and histograms are kept in a MetricsRegistry owned by the Simulator and
+updated from the send/receive/register/role-change hooks. Histograms estimate quantiles
+with the P-square algorithm (Jain & Chlamtac, 1985), which keeps five markers per quantile,
+so a p99 costs constant memory no matter how many samples are observed. The registry can
+be queried at any time and dumped as a small JSON summary at the end of a run.
+"""
+import json
+import math
+
+DEFAULT_QUANTILES = (0.5, 0.9, 0.99)
+
+
+###########################################################
+class P2Quantile:
+    """Streaming estimate of one quantile with the P-square algorithm.
+
+       Attributes:
+           p (double): Quantile to estimate, between 0 and 1.
+           n (int): Number of observed samples.
+    """
+
+    ############################
+    def __init__(self, p):
+        """Constructor for P2Quantile class.
+
+           Args:
+               p (double): Quantile to estimate, between 0 and 1.
+
+           Returns:
+               P2Quantile: Created P2Quantile object.
+        """
+        self.p = p
+        self.n = 0
+        self._q = []  # marker heights
+        self._pos = [1, 2, 3, 4, 5]  # actual marker positions
+        self._desired = [1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5]
+        self._incr = [0, p / 2, p, (1 + p) / 2, 1]
+
+    ############################
+    def add(self, x):
+        """Adds a sample.
+
+           Args:
+               x (double): Observed value.
+
+           Returns:
+
+        """
+        q = self._q
+        self.n += 1
+        if self.n <= 5:
+            q.append(x)
+            if self.n == 5:
+                q.sort()
+            return
+
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = 0
+            while x >= q[k + 1]:
+                k += 1
+
+        pos = self._pos
+        for i in range(k + 1, 5):
+            pos[i] += 1
+        desired = self._desired
+        for i in range(5):
+            desired[i] += self._incr[i]
+
+        for i in (1, 2, 3):
+            d = desired[i] - pos[i]
+            if (d >= 1 and pos[i + 1] - pos[i] > 1) or (d <= -1 and pos[i - 1] - pos[i] < -1):
+                d = 1 if d > 0 else -1
+                height = self._parabolic(i, d)
+                if not q[i - 1] < height < q[i + 1]:
+                    height = q[i] + d * (q[i + d] - q[i]) / (pos[i + d] - pos[i])
+                q[i] = height
+                pos[i] += d
+
+    ############################
+    def _parabolic(self, i, d):
+        """Piecewise-parabolic prediction of marker i moved by d."""
+        q, n = self._q, self._pos
+        return q[i] + d / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i]) +
+            (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+
+    ############################
+    def value(self):
+        """Returns the current estimate, or None before the first sample."""
+        if self.n == 0:
+            return None
+        if self.n < 5:
+            ordered = sorted(self._q)
+            return ordered[int(round(self.p * (self.n - 1)))]
+        return self._q[2]
+
+
+###########################################################
+class Counter:
+    """Monotonic counter.
+
+       Attributes:
+           value (double): Current count.
+    """
+
+    ############################
+    def __init__(self):
+        self.value = 0
+
+    ############################
+    def inc(self, amount=1):
+        """Increments the counter by amount."""
+        self.value += amount
+
+    ############################
+    def summary(self):
+        return self.value
+
+
+###########################################################
+class Gauge:
+    """Value that can go up and down. If fn is given it is evaluated on every read, so a
+    gauge over simulation state costs nothing until it is queried.
+
+       Attributes:
+           value (double): Last set value.
+           fn (Function): Optional callable returning the current value.
+    """
+
+    ############################
+    def __init__(self, fn=None):
+        self.value = None
+        self.fn = fn
+
+    ############################
+    def set(self, value):
+        """Sets the gauge to value."""
+        self.value = value
+
+    ############################
+    def summary(self):
+        return self.fn() if self.fn is not None else self.value
+
+
+###########################################################
+class Histogram:
+    """Distribution summary with count, sum, min, max and streaming quantile estimates.
+
+       Attributes:
+           count (int): Number of samples.
+           total (double): Sum of samples.
+           min (double): Smallest sample.
+           max (double): Largest sample.
+           quantiles (Dict): quantile -> P2Quantile estimator.
+    """
+
+    ############################
+    def __init__(self, quantiles=DEFAULT_QUANTILES):
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.quantiles = {p: P2Quantile(p) for p in quantiles}
+
+    ############################
+    def observe(self, value):
+        """Adds a sample to the histogram."""
+        self.count += 1
+        self.total += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        for estimator in self.quantiles.values():
+            estimator.add(value)
+
+    ############################
+    def quantile(self, p):
+        """Returns the estimate of quantile p, which must be one of the tracked quantiles."""
+        return self.quantiles[p].value()
+
+    ############################
+    def summary(self):
+        if self.count == 0:
+            return {'count': 0}
+        out = {'count': self.count, 'mean': self.total / self.count, 'min': self.min, 'max': self.max}
+        for p, estimator in self.quantiles.items():
+            out['p%g' % (p * 100)] = estimator.value()
+        return out
+
+
+###########################################################
+class MetricsRegistry:
+    """Named counters, gauges and histograms of one simulation run.
+
+       Attributes:
+           counters (Dict): name -> Counter.
+           gauges (Dict): name -> Gauge.
+           histograms (Dict): name -> Histogram.
+    """
+
+    ############################
+    def __init__(self, quantiles=DEFAULT_QUANTILES):
+        """Constructor for MetricsRegistry class.
+
+           Args:
+               quantiles (Tuple of double): Quantiles tracked by every histogram.
+
+           Returns:
+               MetricsRegistry: Created MetricsRegistry object.
+        """
+        self.quantiles = quantiles
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+
+    ############################
+    def counter(self, name):
+        """Returns the counter with the given name, creating it if needed."""
+        c = self.counters.get(name)
+        if c is None:
+            c = self.counters[name] = Counter()
+        return c
+
+    ############################
+    def gauge(self, name, fn=None):
+        """Returns the gauge with the given name, creating it (optionally backed by fn) if needed."""
+        g = self.gauges.get(name)
+        if g is None:
+            g = self.gauges[name] = Gauge(fn)
+        elif fn is not None:
+            g.fn = fn
+        return g
+
+    ############################
+    def histogram(self, name):
+        """Returns the histogram with the given name, creating it if needed."""
+        h = self.histograms.get(name)
+        if h is None:
+            h = self.histograms[name] = Histogram(self.quantiles)
+        return h
+
+    ############################
+    def inc(self, name, amount=1):
+        """Increments counter name by amount."""
+        self.counter(name).inc(amount)
+
+    ############################
+    def set(self, name, value):
+        """Sets gauge name to value."""
+        self.gauge(name).set(value)
+
+    ############################
+    def observe(self, name, value):
+        """Adds value to histogram name."""
+        self.histogram(name).observe(value)
+
+    ############################
+    def quantile(self, name, p):
+        """Returns the live estimate of quantile p of histogram name, None if it has no samples."""
+        h = self.histograms.get(name)
+        return None if h is None else h.quantile(p)
+
+    ############################
+    def snapshot(self):
+        """Returns all metrics as a dict of plain values."""
+        return {
+            'counters': {name: c.summary() for name, c in sorted(self.counters.items())},
+            'gauges': {name: g.summary() for name, g in sorted(self.gauges.items())},
+            'histograms': {name: h.summary() for name, h in sorted(self.histograms.items())},
+        }
+
+    ############################
+    def dump(self, path, **extra):
+        """Writes the snapshot (plus any extra top-level fields) to a JSON file.
+
+           Args:
+               path (string): Output file.
+               **extra: Additional fields, e.g. sim_time.
+
+           Returns:
+               Dict: The written summary.
+        """
+        summary = dict(extra)
+        summary.update(self.snapshot())
+        with open(path, "w") as f:
+            json.dump(summary, f, indent=2, default=str)
+        return summary
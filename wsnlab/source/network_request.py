@@ -0,0 +1,113 @@
+"""Coalesced NETWORK_REQUESTs with exponential backoff, and duplicate detection at the root.
+
+A REGISTERED node used to send a NETWORK_REQUEST to the root for every JOIN_REQUEST it heard,
+so a few joiners retrying every JOIN_REQUEST_TIME_INTERVAL kept one request per join request
+in flight, each routed hop by hop and answered by the root. NetworkRequest keeps the node's
+one pending request instead. The first JOIN_REQUEST sends it, and the ones heard while it is
+pending are coalesced into it until its retry time. Retries back off exponentially from
+NETWORK_REQUEST_TIME_INTERVAL up to NETWORK_REQUEST_MAX_BACKOFF, each wait drawn from the
+upper half of the current backoff so that neighbors that started together drift apart. The
+request is no longer pending once a NETWORK_REPLY arrives or the node resets its tables.
+
+The root allocates the same net id again to a gui it already gave one, so answering a request
+twice is harmless but wasted. NetworkReplies remembers the time and source address of the
+last reply per requester gui, and the root drops a request from the same gui and address
+within NETWORK_REQUEST_DUPLICATE_WINDOW of it. A retry comes later than that and is answered,
+which covers a lost reply, and so is a requester that moved to another address.
+"""
+import random
+
+from source.fib import addr_key
+
+
+###########################################################
+class NetworkRequest:
+    """Pending NETWORK_REQUEST of a node.
+
+       Attributes:
+           base (double): Backoff before the first retry.
+           max_backoff (double): Largest backoff.
+           first (double): Time the pending request was first sent, None if none is pending.
+           attempts (int): Times the pending request was sent.
+           retry_at (double): Earliest time the pending request may be sent again.
+    """
+
+    ############################
+    def __init__(self, base, max_backoff):
+        """Constructor for NetworkRequest class.
+
+           Args:
+               base (double): Backoff before the first retry.
+               max_backoff (double): Largest backoff.
+
+           Returns:
+               NetworkRequest: Created NetworkRequest object.
+        """
+        self.base = base
+        self.max_backoff = max_backoff
+        self.clear()
+
+    ############################
+    def clear(self):
+        """Forgets the pending request, for when it was answered or the node resets its tables."""
+        self.first = None
+        self.attempts = 0
+        self.retry_at = None
+
+    ############################
+    def request(self, now):
+        """Asks for a network at now. Returns True if a NETWORK_REQUEST is to be sent, False
+        if the pending one covers it."""
+        if self.first is not None and now < self.retry_at:
+            return False
+        if self.first is None:
+            self.first = now
+        backoff = min(self.base * 2 ** self.attempts, self.max_backoff)
+        self.attempts += 1
+        self.retry_at = now + random.uniform(backoff / 2, backoff)
+        return True
+
+    ############################
+    def replied(self, now):
+        """Records a NETWORK_REPLY. Returns the time since the request was first sent, or None
+        if no request was pending."""
+        first = self.first
+        self.clear()
+        if first is None:
+            return None
+        return now - first
+
+
+###########################################################
+class NetworkReplies:
+    """NETWORK_REPLYs sent by the root, per requester.
+
+       Attributes:
+           window (double): Time after a reply in which the same request is a duplicate.
+           last (Dict): requester gui -> (addr key it asked from, time of the reply).
+    """
+
+    ############################
+    def __init__(self, window):
+        """Constructor for NetworkReplies class.
+
+           Args:
+               window (double): Time after a reply in which the same request is a duplicate.
+
+           Returns:
+               NetworkReplies: Created NetworkReplies object.
+        """
+        self.window = window
+        self.last = {}
+
+    ############################
+    def duplicate(self, pck, now):
+        """Returns True if the NETWORK_REQUEST pck was answered within the window."""
+        last = self.last.get(pck['gui'])
+        return (last is not None and last[0] == addr_key(pck['source'])
+                and now - last[1] < self.window)
+
+    ############################
+    def replied(self, pck, now):
+        """Records a reply to the NETWORK_REQUEST pck sent at now."""
+        self.last[pck['gui']] = (addr_key(pck['source']), now)
@@ -0,0 +1,87 @@
+"""Debounced NETWORK_UPDATEs that carry only the changed networks.
+
+A cluster head or router used to send its full list of networks to its parent as soon as a
+NETWORK_UPDATE arrived from below, on top of the one every TABLE_SHARE_INTERVAL. One change
+deep in the tree went up as a full update per hop, the cascades of neighboring subtrees
+overlapped during formation, and two nodes that took each other as parent kept bouncing
+updates. Now an update heard from below only starts a NETWORK_UPDATE_DEBOUNCE timer, and
+the updates heard until it fires go out together. NetworkUpdates remembers what was last
+reported to which parent, so the merged update carries only the networks added and removed
+since then, and a network that appeared and went away within the window is not reported at
+all. Nothing is sent if nothing changed.
+
+A diff is applied with set operations, so a receiver that missed one still takes in the
+changes of the next. The periodic update and the first one to a new parent carry the full
+list, which repairs the rest and renews the leases of the networks listed.
+"""
+from source.wsnlab import packet_size
+
+HEADER_SIZE = 6  # bytes of a NETWORK_UPDATE without networks: type, gui, source, count
+NET_SIZE = 1  # bytes of a listed network id
+
+
+###########################################################
+def update_size(pck):
+    """Returns the over the air bytes of a NETWORK_UPDATE."""
+    if 'child_networks' in pck:
+        return packet_size(HEADER_SIZE + NET_SIZE * len(pck['child_networks']))
+    return packet_size(HEADER_SIZE + 1 + NET_SIZE * (len(pck['added']) + len(pck['removed'])))
+
+
+###########################################################
+def merge_update(pck, networks):
+    """Returns the networks listed by the sender of NETWORK_UPDATE pck, given the list
+    networks held for it before."""
+    if 'child_networks' in pck:
+        return pck['child_networks']
+    removed = set(pck['removed'])
+    merged = [net for net in networks if net not in removed]
+    merged.extend(net for net in pck['added'] if net not in networks)
+    return merged
+
+
+###########################################################
+class NetworkUpdates:
+    """Networks last reported to the parent.
+
+       Attributes:
+           parent (int): gui of the parent the last update went to, None before the first.
+           sent (FrozenSet): Networks listed by the last update.
+    """
+
+    ############################
+    def __init__(self):
+        self.clear()
+
+    ############################
+    def clear(self):
+        """Forgets what was reported, for when the node resets its tables. The next update is full."""
+        self.parent = None
+        self.sent = frozenset()
+
+    ############################
+    def changes(self, parent, networks, full=False):
+        """Returns the NETWORK_UPDATE fields that report networks to parent, and records them
+        as reported.
+
+           Args:
+               parent (int): gui of the parent.
+               networks (List): Networks at and below the node.
+               full (bool): True to list every network even if the parent has them.
+
+           Returns:
+               Dict: 'child_networks' with the full list, or 'added' and 'removed' with the
+               changes since the last update to parent, None if there are none.
+        """
+        current = frozenset(networks)
+        if full or parent != self.parent:
+            fields = {'child_networks': networks}
+        else:
+            added = [net for net in networks if net not in self.sent]
+            removed = [net for net in self.sent if net not in current]
+            if not added and not removed:
+                return None
+            fields = {'added': added, 'removed': removed}
+        self.parent = parent
+        self.sent = current
+        return fields
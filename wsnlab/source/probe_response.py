@@ -0,0 +1,100 @@
+"""Jittered, suppressed and rate limited heart beat replies to PROBE messages.
+
+Every ROOT, CLUSTER_HEAD, REGISTERED and ROUTER node used to answer a PROBE with an immediate
+broadcast heart beat, so all neighbors of a waking node transmitted at the same instant, and
+again for each of the probes an UNDISCOVERED node sends every second. ProbeResponder turns a
+PROBE into at most one pending reply:
+
+- the reply waits a random time of up to PROBE_RESPONSE_JITTER, and probes arriving meanwhile
+  are answered by the same reply;
+- it is dropped if PROBE_RESPONSE_REDUNDANCY heart beats were overheard while it waited (the
+  prober most likely heard them too), or if the node sent a heart beat of its own meanwhile;
+- a prober is answered at most once per PROBE_RESPONSE_MIN_INTERVAL. Probers are told apart
+  by gui and role, so a node that lost its tables and probes again as UNREGISTERED is
+  answered even if it was answered as UNDISCOVERED a moment before.
+
+A reply is pending until its deadline, so a reply timer killed with the node's other timers
+does not keep the responder from scheduling the next one.
+"""
+import random
+
+
+###########################################################
+class ProbeResponder:
+    """Probe reply state of a node.
+
+       Attributes:
+           jitter (double): Longest wait before a reply.
+           k (int): Overheard heart beats that make a pending reply redundant.
+           min_interval (double): Shortest time between two replies to the same prober.
+           deadline (double): Time the pending reply is due, None if none is pending.
+           overheard (int): Heart beats overheard while the reply is pending.
+           answered (Dict): (gui, role) of a prober -> time it was last answered.
+    """
+
+    ############################
+    def __init__(self, jitter, k, min_interval):
+        """Constructor for ProbeResponder class.
+
+           Args:
+               jitter (double): Longest wait before a reply.
+               k (int): Overheard heart beats that make a pending reply redundant.
+               min_interval (double): Shortest time between two replies to the same prober.
+
+           Returns:
+               ProbeResponder: Created ProbeResponder object.
+        """
+        self.jitter = jitter
+        self.k = k
+        self.min_interval = min_interval
+        self.deadline = None
+        self.overheard = 0
+        self.answered = {}
+
+    ############################
+    def _pending(self, now):
+        return self.deadline is not None and now <= self.deadline
+
+    ############################
+    def probe(self, pck, now):
+        """Handles a received PROBE.
+
+           Args:
+               pck (Dict): Received PROBE.
+               now (double): Current time.
+
+           Returns:
+               double: Delay of a new reply to schedule, or None if a pending reply covers the
+               probe or the prober was answered recently.
+        """
+        key = (pck.get('gui'), pck.get('role'))
+        last = self.answered.get(key)
+        if last is not None and now - last < self.min_interval:
+            return None
+        self.answered[key] = now
+        if self._pending(now):
+            return None
+        delay = random.uniform(0.1 * self.jitter, self.jitter)
+        self.deadline = now + delay
+        self.overheard = 0
+        return delay
+
+    ############################
+    def heard(self, now):
+        """Counts a heart beat overheard at now."""
+        if self._pending(now):
+            self.overheard += 1
+
+    ############################
+    def sent(self):
+        """Records a heart beat sent by the node, which answers the pending reply."""
+        self.deadline = None
+
+    ############################
+    def fire(self):
+        """Returns True if the reply that is due is still to be sent, False if it was
+        suppressed or answered already."""
+        if self.deadline is None:
+            return False
+        self.deadline = None
+        return self.overheard < self.k
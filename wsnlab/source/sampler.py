@@ -0,0 +1,131 @@
+"""Periodic sampling of node state into dense time x node arrays.
+
+One simulator process takes a snapshot of every node at each interval, instead of one
+process, file open and CSV row per node per tick. Samples go into arrays preallocated for
+the whole run and are saved once at the end as a compressed .npz holding 'times',
+'node_ids' and one (samples x nodes) matrix per field.
+"""
+import numpy as np
+
+from source import config
+
+
+###########################################################
+def _role(node):
+    role = getattr(node, 'role', None)
+    return np.nan if role is None else role.value
+
+
+def _tx_power(node):
+    tx_power = getattr(node, 'tx_power', None)
+    return np.nan if tx_power is None else config.TX_POWER_LEVELS.index(tx_power)
+
+
+def _table_size(name):
+    def _size(node):
+        table = getattr(node, name, None)
+        return np.nan if table is None else len(table)
+    return _size
+
+
+DEFAULT_FIELDS = {
+    'power': lambda node: node.power,
+    'role': _role,  # Roles enum value
+    'tx_power': _tx_power,  # index in config.TX_POWER_LEVELS
+    'tx_range': lambda node: node.tx_range,
+    'neighbors': _table_size('neighbors_table'),
+    'members': _table_size('members_table'),
+    'child_networks': _table_size('child_networks_table'),
+}
+"""Dict: Default sampled fields, name -> function(node) returning a number (nan if unknown).
+"""
+
+
+###########################################################
+class StateSampler:
+    """Samples chosen attributes of all nodes in one simulator event per interval.
+
+       Attributes:
+           sim (Simulator): Simulation whose nodes are sampled.
+           interval (double): Simulation time between samples.
+           fields (Dict): name -> function(node) returning a number.
+           times (ndarray): Sample times, shape (samples,).
+           data (Dict): name -> ndarray of shape (samples, nodes).
+           count (int): Number of samples taken so far.
+    """
+
+    ############################
+    def __init__(self, sim, interval, fields=None):
+        """Constructor for StateSampler class. Preallocates arrays for the whole run, so it should
+        be created after all nodes are added.
+
+           Args:
+               sim (Simulator): Simulation whose nodes are sampled.
+               interval (double): Simulation time between samples.
+               fields (Dict): name -> function(node); DEFAULT_FIELDS if None.
+
+           Returns:
+               StateSampler: Created StateSampler object.
+        """
+        self.sim = sim
+        self.interval = interval
+        self.fields = dict(DEFAULT_FIELDS if fields is None else fields)
+        self.nodes = list(sim.nodes)
+        capacity = int(sim.duration // interval) + 1
+        self.times = np.full(capacity, np.nan)
+        self.data = {name: np.full((capacity, len(self.nodes)), np.nan) for name in self.fields}
+        self.count = 0
+
+    ############################
+    def start(self):
+        """Starts the sampling process in the simulator."""
+        self.sim.env.process(self._run())
+
+    ############################
+    def _run(self):
+        while True:
+            self.sample()
+            yield self.sim.timeout(self.interval)
+
+    ############################
+    def sample(self):
+        """Takes one snapshot of all nodes at the current simulation time."""
+        if self.count == len(self.times):
+            self._grow()
+        row = self.count
+        self.times[row] = self.sim.now
+        nodes = self.nodes
+        for name, fn in self.fields.items():
+            self.data[name][row] = [fn(node) for node in nodes]
+        self.count += 1
+
+    ############################
+    def _grow(self):
+        """Doubles the capacity if the run lasts longer than planned."""
+        capacity = max(2 * len(self.times), 1)
+        self.times = np.resize(self.times, capacity)
+        self.times[self.count:] = np.nan
+        for name, arr in self.data.items():
+            grown = np.full((capacity, arr.shape[1]), np.nan)
+            grown[:self.count] = arr[:self.count]
+            self.data[name] = grown
+
+    ############################
+    def matrix(self, name):
+        """Returns the (samples x nodes) matrix of a field, trimmed to the samples taken."""
+        return self.data[name][:self.count]
+
+    ############################
+    def save(self, path):
+        """Writes times, node ids and every field matrix to a compressed .npz file.
+
+           Args:
+               path (string): Output path.
+
+           Returns:
+
+        """
+        np.savez_compressed(path,
+                            times=self.times[:self.count],
+                            node_ids=np.array([node.id for node in self.nodes]),
+                            **{name: self.matrix(name) for name in self.data})
@@ -0,0 +1,139 @@
+"""Versioned neighbor table entries for delta TABLE_SHARE messages.
+
+send_table_share used to send every neighbors_table entry up to MESH_HOP_N hops, as full
+heart beat packets, to every one-hop neighbor every TABLE_SHARE_INTERVAL. A receiver only adds
+the entries it does not have and keeps the first copy of an entry, so all a share can tell it
+is which entries appeared since the previous one. TableShare gives every entry a version from
+a per-node counter when it first becomes shareable, and remembers per neighbor the version it
+acknowledged with TABLE_SHARE_ACK. A share then carries only the entries with a later version,
+with 'base' set to the acknowledged version, and nothing is sent to a neighbor that is up to
+date.
+
+A receiver acknowledges the version of a share only if it holds everything up to its base,
+i.e. its base is 0 (a full share) or the version it acknowledged last. Otherwise it lost state
+(it reset its tables) and acknowledges 0, so the next share to it is full. Every
+TABLE_SHARE_FULL_SYNC_EVERY-th round sends the whole table regardless, which covers lost
+acknowledgements and receivers that reset without saying so. A lost share needs nothing: it
+is not acknowledged, so its entries go out again with the next delta.
+"""
+from source import config
+from source.wsnlab import packet_size
+
+ENTRY_SIZE = 12  # bytes of a shared entry: gui, source, addr, ch_addr, role, hop counts, version
+HEADER_SIZE = 7  # bytes of a TABLE_SHARE without entries: type, gui, base, version
+ACK_SIZE = 5  # bytes of a TABLE_SHARE_ACK: type, gui, version
+
+
+###########################################################
+def share_size(entries):
+    """Returns the over the air bytes of a TABLE_SHARE carrying the given number of entries."""
+    return packet_size(HEADER_SIZE + entries * ENTRY_SIZE)
+
+
+###########################################################
+def ack_size():
+    """Returns the over the air bytes of a TABLE_SHARE_ACK."""
+    return packet_size(ACK_SIZE)
+
+
+###########################################################
+class TableShare:
+    """Entry versions and acknowledgements of a node's table shares.
+
+       Attributes:
+           version (int): Latest version given to an entry, never goes back.
+           entry_version (Dict): gui -> version of its entry.
+           acked (Dict): neighbor gui -> version of this table it acknowledged.
+           received (Dict): sender gui -> version of its table held here.
+           rounds (int): Number of share rounds sent.
+    """
+
+    ############################
+    def __init__(self, full_sync_every=None):
+        """Constructor for TableShare class.
+
+           Args:
+               full_sync_every (int): Every how many rounds the whole table is sent, defaults
+                   to config.TABLE_SHARE_FULL_SYNC_EVERY.
+
+           Returns:
+               TableShare: Created TableShare object.
+        """
+        if full_sync_every is None:
+            full_sync_every = config.TABLE_SHARE_FULL_SYNC_EVERY
+        self.full_sync_every = full_sync_every
+        self.version = 0
+        self.rounds = 0
+        self.clear()
+
+    ############################
+    def clear(self):
+        """Forgets entries and acknowledgements, for when the node resets its tables. The
+        version keeps counting so older acknowledgements cannot match new entries."""
+        self.entry_version = {}
+        self.acked = {}
+        self.received = {}
+
+    ############################
+    def touch(self, gui, entry):
+        """Records that neighbors_table[gui] now holds entry. The entry gets the next version
+        when it first comes within MESH_HOP_N hops, the ones send_table_share shares."""
+        if gui not in self.entry_version and entry['neighbor_hop_count'] <= config.MESH_HOP_N:
+            self.version += 1
+            self.entry_version[gui] = self.version
+
+    ############################
+    def next_round(self):
+        """Starts a share round. Returns True if this round sends the whole table."""
+        self.rounds += 1
+        return not self.full_sync_every or self.rounds % self.full_sync_every == 0
+
+    ############################
+    def changes(self, neighbor, table, full=False):
+        """Returns (base, entries): the version neighbor acknowledged, 0 if full, and the
+        entries of table changed after it."""
+        base = 0 if full else self.acked.get(neighbor, 0)
+        if base == 0:
+            return 0, table
+        entry_version = self.entry_version
+        return base, {gui: entry for gui, entry in table.items() if entry_version.get(gui, 0) > base}
+
+    ############################
+    def ack(self, neighbor, version):
+        """Records a TABLE_SHARE_ACK from neighbor."""
+        if version <= self.version:
+            self.acked[neighbor] = version
+
+    ############################
+    def merge(self, own_gui, pck, table):
+        """Applies a received TABLE_SHARE to table: entries not in it are added with
+        neighbor_hop_count + 1 and next_hop the sender.
+
+           Args:
+               own_gui (int): gui of the receiving node, never added to its own table.
+               pck (Dict): Received TABLE_SHARE.
+               table (Dict): neighbors_table of the receiving node.
+
+           Returns:
+               Tuple(List, int): guis whose entries were written, and the version to acknowledge.
+        """
+        sender = pck['gui']
+        written = []
+        for gui, packet in pck['neighbors'].items():
+            if gui == own_gui or packet['gui'] == own_gui:
+                continue
+            if gui in table:
+                continue
+            cpy = packet.copy()
+            cpy['neighbor_hop_count'] += 1
+            cpy['next_hop'] = pck['source']
+            if cpy['neighbor_hop_count'] > config.MESH_HOP_N + 1:
+                raise Exception("Something went wrong")
+            table[gui] = cpy
+            self.touch(gui, cpy)
+            written.append(gui)
+        if pck['base'] == 0 or pck['base'] == self.received.get(sender):
+            self.received[sender] = pck['version']
+        else:
+            self.received.pop(sender, None)  # entries up to base are missing, ask for all
+        return written, self.received.get(sender, 0)
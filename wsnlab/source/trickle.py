@@ -0,0 +1,113 @@
+"""Trickle scheduling of heart beats (RFC 6206).
+
+Registered nodes, cluster heads, routers and the root used to send a HEART_BEAT every
+HEART_BEAT_TIME_INTERVAL for the whole run. With Trickle a node sends at most one heart beat
+per interval, at a random point t in the second half of it. The interval starts at
+HEART_BEAT_TIME_INTERVAL and doubles up to HEART_BEAT_MAX_INTERVAL while the neighborhood is
+consistent, and goes back to the minimum on an inconsistency: a new neighbor, a neighbor whose
+role, address or hop count changed, a probe or join request, or a role change of the node
+itself. A heart beat is suppressed if HEART_BEAT_REDUNDANCY consistent ones were heard in the
+interval before t.
+
+update_neighbor declares a parent lost after TABLE_SHARE_INTERVAL * 2 without a heart beat, so
+suppression is capped: a node sends anyway if staying silent could leave it unheard for longer
+than HEART_BEAT_MAX_SILENCE before its next chance to send.
+
+The node drives the schedule with one timer that fires at t; the end of an interval needs no
+event of its own, fire() starts the next interval and returns the delay to its t. A reset
+kills the timer and sets it again for the new t.
+"""
+import random
+
+
+###########################################################
+class Trickle:
+    """Trickle timer state of a node's heart beats.
+
+       Attributes:
+           imin (double): Smallest interval.
+           imax (double): Largest interval.
+           k (int): Redundancy constant, consistent heart beats that suppress one.
+           max_silence (double): Longest time suppression may keep the node unheard.
+           interval (double): Current interval length I.
+           start (double): Start time of the current interval.
+           t (double): Time of the send decision in the current interval.
+           c (int): Consistent heart beats heard in the current interval.
+           last_sent (double): Time of the latest heart beat sent, None before the first.
+    """
+
+    ############################
+    def __init__(self, imin, imax, k, max_silence):
+        """Constructor for Trickle class.
+
+           Args:
+               imin (double): Smallest interval.
+               imax (double): Largest interval.
+               k (int): Redundancy constant.
+               max_silence (double): Longest time suppression may keep the node unheard.
+
+           Returns:
+               Trickle: Created Trickle object.
+        """
+        self.imin = imin
+        self.imax = imax
+        self.k = k
+        self.max_silence = max_silence
+        self.interval = imin
+        self.start = 0
+        self.t = 0
+        self.c = 0
+        self.last_sent = None
+
+    ############################
+    def _begin(self, start):
+        self.start = start
+        self.t = start + random.uniform(self.interval / 2, self.interval)
+
+    ############################
+    def restart(self, now):
+        """Starts over with the smallest interval. Returns the delay to its t."""
+        self.interval = self.imin
+        self.c = 0
+        self._begin(now)
+        return self.t - now
+
+    ############################
+    def inconsistent(self, now):
+        """Handles an inconsistency. Returns the delay to the new t, or None if the interval
+        already is the smallest one and the schedule stays as it is."""
+        if self.interval == self.imin:
+            return None
+        return self.restart(now)
+
+    ############################
+    def heard(self, now):
+        """Counts a consistent heart beat heard at now. Between t and the end of an interval
+        fire() has already started the next one, and what is heard there counts for neither."""
+        if self.start <= now:
+            self.c += 1
+
+    ############################
+    def sent(self, now):
+        """Records a heart beat sent at now, scheduled or not."""
+        self.last_sent = now
+
+    ############################
+    def fire(self, now):
+        """Decides at t whether to send and starts the next interval.
+
+           Args:
+               now (double): Current time, t of the current interval.
+
+           Returns:
+               Tuple(bool, double): True to send a heart beat, and the delay to the next t.
+        """
+        end = self.start + self.interval
+        self.interval = min(self.interval * 2, self.imax)
+        # latest time the node could send next if it stays silent now
+        next_chance = end + self.interval
+        send = (self.c < self.k or self.last_sent is None
+                or next_chance - self.last_sent > self.max_silence)
+        self.c = 0
+        self._begin(end)
+        return send, self.t - now
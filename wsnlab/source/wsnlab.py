@@ -10,6 +10,7 @@ import random
 import simpy
 from simpy.util import start_delayed
 from source import config
+from source.metrics import MetricsRegistry
 Roles = Enum('Roles', 'UNDISCOVERED UNREGISTERED ROOT REGISTERED CLUSTER_HEAD ROUTER')
 ###########################################################
 class Addr:
@@ -111,6 +112,20 @@ def distance(pos1, pos2):
     return ((pos1[0] - pos2[0]) ** 2 + (pos1[1] - pos2[1]) ** 2) ** 0.5
 
 
+###########################################################
+def packet_size(payload):
+    """Calculates the over the air size of a message, split into as many frames as needed.
+
+       Args:
+           payload (int): Message bytes.
+
+       Returns:
+           int: returns payload plus the PHY and MAC overhead of every frame, in bytes.
+    """
+    frames = max(1, -(-payload // config.MAX_FRAME_PAYLOAD))
+    return payload + frames * config.FRAME_OVERHEAD
+
+
 ###########################################################
 class Node:
     """Class to model a network node with basic operations. It's base class for more complex node classes.
@@ -126,6 +141,8 @@ class Node:
            Otherwise, node is awaken.
            logging (bool): It is a flag for logging. If it is True, nodes outputs can be seen in terminal.
            active_timer_list (List of strings): It keeps the names of active timers.
+           pending_timers (List of Tuple(string,int)): Name and serial of every timer set and not fired or killed.
+           timer_serial (int): Serial of the latest timer set.
            neighbor_distance_list (List of Tuple(double,int)): Sorted list of nodes distances to other nodes.
             Each Tuple keeps a distance and a node id.
            timeout (Function): timeout function
@@ -155,6 +172,8 @@ class Node:
         self.is_sleep = False
         self.logging = True
         self.active_timer_list = []
+        self.pending_timers = []
+        self.timer_serial = 0
         self.neighbor_distance_list = []
         self.timeout = self.sim.timeout
 
@@ -223,7 +242,7 @@ class Node:
             self.remove_tx_range()
             self.sleep()
             self.log('I AM DEAD')
-            self.scene.nodecolor(self.id, 0.5, 0.5, 0.5)  # sets self color to red
+            self.vis.nodecolor(self.id, 0.5, 0.5, 0.5)  # sets self color to red
 
             self.erase_parent()
             self.kill_all_timers()
@@ -237,9 +256,15 @@ class Node:
 
         """
         self.check_power()
+        metrics = self.sim.metrics
+        metrics.inc('tx_packets')
+        size = pck.get('size', config.MTU)  # packets without a size are sent as full frames
+        metrics.inc('tx_bytes', size)
+        tx_energy = ((self.tx_current * config.VOLTAGE * 8 * size / config.DATARATE) + 0.01) / 1000 #+10 microjoules for overhead, / 1000 to get joules
         for (dist, node) in self.neighbor_distance_list:
             if dist <= self.tx_range:
-                self.power -= ((self.tx_current * config.VOLTAGE * 8 * config.MTU / config.DATARATE) + 0.01) / 1000 #+10 microjoules for overhead, / 1000 to get joules
+                self.power -= tx_energy
+                metrics.inc('tx_energy', tx_energy)
                 if random.random() > config.NODE_LOSS_CHANCE: #simulating loss of the packet
                     if node.can_receive(pck):
                         if pck['dest'] != Addr(255,255):
@@ -260,6 +285,7 @@ class Node:
                         prop_time = dist / 1000000 - 0.00001 if dist / 1000000 - 0.00001 >0 else 0.00001
                         self.delayed_exec(prop_time, node.on_receive_check, pck)
                 else:
+                    metrics.inc('dropped_packets')
                     if pck['type'] != "HEART_BEAT" and pck['type'] != "TABLE_SHARE":
                         self.log("PACKET DROPPED")
                         self.log(pck)
@@ -278,12 +304,16 @@ class Node:
            Returns:
 
         """
+        self.timer_serial += 1
         self.active_timer_list.append(name)
-        self.delayed_exec(time - 0.00001, self.on_timer_fired_check, name, *args, **kwargs)
+        self.pending_timers.append((name, self.timer_serial))
+        self.delayed_exec(time - 0.00001, self.on_timer_fired_check, name, self.timer_serial, *args, **kwargs)
 
     ############################
     def kill_timer(self, name):
         """Kills a timer with a given name. It removes name of timer from the active timer list if exists.
+        The earliest set timer with that name is cancelled and never fires, even if another one
+        with the same name is set before it was due.
 
            Args:
                 name (string): Name of timer.
@@ -292,6 +322,7 @@ class Node:
         """
         if name in self.active_timer_list:
             self.active_timer_list.remove(name)
+            self.pending_timers.remove(next(timer for timer in self.pending_timers if timer[0] == name))
 
     ############################
     def kill_all_timers(self):
@@ -303,6 +334,7 @@ class Node:
 
         """
         self.active_timer_list = []
+        self.pending_timers = []
 
     ############################
     def delayed_exec(self, delay, func, *args, **kwargs):
@@ -385,7 +417,11 @@ class Node:
                         src = (pck['source'].net_addr, pck['source'].node_addr)
                     dest = (pck['dest'].net_addr, pck['dest'].node_addr)
                     pck_id = (src, dest)
-                    self.sim.packet_log[pck_id]['received_at'].append(self.now)
+                    entry = self.sim.packet_log[pck_id]
+                    entry['received_at'].append(self.now)
+                    self.sim.metrics.inc('delivered_packets')
+                    self.sim.metrics.observe('packet_delay', self.now - entry['created_at'])
+            self.sim.metrics.inc('rx_packets')
             self.delayed_exec(config.PROCESSING_TIME, self.on_receive, pck) #processing delay
 
     ############################
@@ -402,17 +438,19 @@ class Node:
         pass
 
     ############################
-    def on_timer_fired_check(self, name, *args, **kwargs):
-        """Checks if the timer about to fire is in active timer list or not. If not, does not call on_timer_fired().
+    def on_timer_fired_check(self, name, serial, *args, **kwargs):
+        """Checks if the timer about to fire is still pending or not. If it was killed, does not call on_timer_fired().
 
            Args:
                 name (string): Name of timer.
+                serial (int): Serial given to the timer by set_timer.
                 *args (string): Additional args.
                 **kwargs (string): Additional key word args.
            Returns:
 
         """
-        if name in self.active_timer_list:
+        if (name, serial) in self.pending_timers:
+            self.pending_timers.remove((name, serial))
             self.active_timer_list.remove(name)
             self.delayed_exec(0.00001, self.on_timer_fired, name, *args, **kwargs)
 
@@ -450,6 +488,26 @@ class Node:
         pass
 
 
+###########################################################
+class Environment(simpy.rt.RealtimeEnvironment):
+    """Real time SimPy environment that counts the events it processes.
+
+       Attributes:
+           event_count (int): Events processed so far.
+    """
+
+    ############################
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.event_count = 0
+
+    ############################
+    def step(self):
+        """Processes the next event and counts it."""
+        super().step()
+        self.event_count += 1
+
+
 ###########################################################
 class Simulator:
     """Class to model a network.
@@ -460,6 +518,8 @@ class Simulator:
            duration (double): Duration of simulation.
            random (Random): Random object to use.
            timeout (Function): Timeout Function.
+           metrics (MetricsRegistry): Online counters, gauges and histograms of the run.
+           env (Environment): SimPy environment running the nodes, counts the events processed.
 
     """
 
@@ -475,13 +535,14 @@ class Simulator:
            Returns:
                Simulator: Created Simulator object.
         """
-        self.env = simpy.rt.RealtimeEnvironment(factor=timescale, strict=False)
+        self.env = Environment(factor=timescale, strict=False)
         self.nodes = []
         self.packet_log = {}
         self.duration = duration
         self.timescale = timescale
         self.random = random.Random(seed)
         self.timeout = self.env.timeout
+        self.metrics = MetricsRegistry()
 
     ############################
     @property
@@ -2,16 +2,248 @@
 """
 from source import wsnlab
 from source.wsnlab import *
+import csv
 from threading import Thread
 from topovis import Scene
 from topovis.TkPlotter import Plotter
+from topovis.ImagePlotter import Plotter as ImagePlotter
 from source.address_registry import ADDR_TO_NODE
 
+###########################################################
+class VisSink:
+    """Interface through which nodes and scenario code report visual events. The simulator
+    installs a SceneSink drawing on topovis when visualised and a NullSink otherwise, so
+    protocol code never has to check whether a GUI exists.
+    """
+
+    def node(self, node): pass
+    def nodemove(self, node, x, y): pass
+    def nodemoves(self, nodes): pass
+    def nodecolor(self, id, r, g, b): pass
+    def tx_range(self, node): pass
+    def clear_tx_range(self, node): pass
+    def parent_link(self, node): pass
+    def clear_parent_link(self, node, link=None): pass
+    def packet(self, node, pck, line): pass
+    def setTime(self, time): pass
+    def close(self): pass
+
+
+###########################################################
+def packet_destination(pck):
+    """Returns the node a unicast package is sent to (next hop if set), None for broadcasts
+    or unknown addresses.
+    """
+    if pck['dest'].is_equal(wsnlab.BROADCAST_ADDR):
+        return None
+    # pick address from next_hop or dest
+    hop = pck['next_hop'] if 'next_hop' in pck else pck['dest']
+    key = (hop.net_addr, hop.node_addr)
+    mapped = ADDR_TO_NODE.get(key)
+    if mapped is None:
+        print(f"[WARN] No mapping for key {key} — cannot draw trace")
+    return mapped
+
+
+###########################################################
+def packet_animation_time(duration):
+    """Returns the wall-clock seconds to animate a packet hop meant to take duration, raised
+    to SIM_PACKET_ANIMATION_MIN_FRAMES frame periods so that fast time scales still show it.
+    """
+    return max(duration, config.SIM_PACKET_ANIMATION_MIN_FRAMES / config.SIM_FRAME_RATE)
+
+
+###########################################################
+class NullSink(VisSink):
+    """Sink used in headless runs. Every event is a plain no-op method defined on the class,
+    so a call costs one ordinary method lookup and nothing else.
+    """
+    pass
+
+
+###########################################################
+class SceneSink(VisSink):
+    """Sink drawing events on a topovis Scene.
+
+       Attributes:
+           scene (Scene): Scene object to visualise
+    """
+
+    def __init__(self, scene):
+        self.scene = scene
+
+    ###################
+    def node(self, node):
+        self.scene.node(node.id, *node.pos)
+
+    ###################
+    def nodemove(self, node, x, y):
+        self.scene.nodemove(node.id, x, y)
+
+    ###################
+    def nodemoves(self, nodes):
+        self.scene.nodemoves([(node.id, node.pos[0], node.pos[1]) for node in nodes])
+
+    ###################
+    def nodecolor(self, id, r, g, b):
+        self.scene.nodecolor(id, r, g, b)
+
+    ###################
+    def tx_range(self, node):
+        # always use a fixed ID per node
+        tx_id = f"tx_{node.id}"
+
+        # remove old one if exists
+        self.scene.delshape(tx_id)
+
+        # draw new one
+        node.tx_range_obj = tx_id
+        self.scene.circle(
+            node.pos[0],
+            node.pos[1],
+            node.tx_range,
+            id=tx_id,
+            line="wsnsimpy:tx"
+        )
+
+    ###################
+    def clear_tx_range(self, node):
+        if getattr(node, "tx_range_obj", None) is not None:
+            self.scene.delshape(node.tx_range_obj)
+            node.tx_range_obj = None
+
+    ###################
+    def parent_link(self, node):
+        self.scene.addlink(node.parent_gui, node.id, "parent")
+        node.parent_link_id = [node.parent_gui, node.id, "parent"]
+
+    ###################
+    def clear_parent_link(self, node, link=None):
+        if link is not None:
+            self.scene.dellink(*link)
+        elif node.parent_gui is not None:
+            self.scene.dellink(node.parent_gui, node.id, "parent")
+
+    ###################
+    def packet(self, node, pck, line):
+        mapped = packet_destination(pck)
+        if mapped is not None:
+            # one marker animated by the plotter on its frame clock; nothing is
+            # scheduled in the simulator
+            self.scene.packet(node.id, mapped.id, line=line,
+                              duration=packet_animation_time(
+                                  config.SIM_PACKET_ANIMATION_TIME * node.sim.timescale))
+
+    ###################
+    def setTime(self, time):
+        self.scene.setTime(time)
+
+    ###################
+    def close(self):
+        for plotter in self.scene.plotters:
+            plotter.close()
+
+
+###########################################################
+class TraceSink(VisSink):
+    """Sink recording visual events with their simulation time to a CSV trace, which
+    replay_trace.py plays back without re-running the simulation. Events are forwarded to
+    an inner sink, so a run can be traced with or without the GUI.
+
+       Trace rows are time,event,node,a,b,c with event one of
+           node (a,b = x,y), move (a,b = x,y), color (a,b,c = r,g,b),
+           tx (a,b,c = x,y,radius), tx_clear, parent (a = parent id),
+           parent_clear (a = parent id), packet (a = destination id, b = line style).
+
+       Attributes:
+           sim (Simulator): Simulation whose clock stamps the events.
+           inner (VisSink): Sink receiving every event after it is recorded.
+           tx_drawn (Set): Ids of nodes whose latest tx row has not been cleared yet.
+    """
+
+    HEADER = ['time', 'event', 'node', 'a', 'b', 'c']
+
+    def __init__(self, sim, path, inner):
+        self.sim = sim
+        self.inner = inner
+        self.tx_drawn = set()
+        self.file = open(path, 'w', newline='')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(self.HEADER)
+
+    ###################
+    def _record(self, event, id, a='', b='', c=''):
+        self.writer.writerow((self.sim.env.now, event, id, a, b, c))
+
+    ###################
+    def node(self, node):
+        self._record('node', node.id, *node.pos)
+        self.inner.node(node)
+
+    ###################
+    def nodemove(self, node, x, y):
+        self._record('move', node.id, x, y)
+        self.inner.nodemove(node, x, y)
+
+    ###################
+    def nodemoves(self, nodes):
+        for node in nodes:
+            self._record('move', node.id, *node.pos)
+        self.inner.nodemoves(nodes)
+
+    ###################
+    def nodecolor(self, id, r, g, b):
+        self._record('color', id, r, g, b)
+        self.inner.nodecolor(id, r, g, b)
+
+    ###################
+    def tx_range(self, node):
+        self._record('tx', node.id, node.pos[0], node.pos[1], node.tx_range)
+        self.tx_drawn.add(node.id)
+        self.inner.tx_range(node)
+
+    ###################
+    def clear_tx_range(self, node):
+        if node.id in self.tx_drawn:  # nothing to clear if no range circle was recorded
+            self.tx_drawn.remove(node.id)
+            self._record('tx_clear', node.id)
+        self.inner.clear_tx_range(node)
+
+    ###################
+    def parent_link(self, node):
+        self._record('parent', node.id, node.parent_gui)
+        self.inner.parent_link(node)
+
+    ###################
+    def clear_parent_link(self, node, link=None):
+        parent = link[0] if link is not None else node.parent_gui
+        if parent is not None:
+            self._record('parent_clear', node.id, parent)
+        self.inner.clear_parent_link(node, link)
+
+    ###################
+    def packet(self, node, pck, line):
+        mapped = packet_destination(pck)
+        if mapped is not None:
+            self._record('packet', node.id, mapped.id, line)
+            self.inner.packet(node, pck, line)
+
+    ###################
+    def setTime(self, time):
+        self.inner.setTime(time)
+
+    ###################
+    def close(self):
+        self.file.close()
+        self.inner.close()
+
+
+###########################################################
 class Node(wsnlab.Node):
     """Class to model a visualised network node inherited wsnlab.Node.
 
        Attributes:
-           scene (Scene): Scene object to visualise
+           vis (VisSink): Sink receiving the visual events of the node
 
     """
 
@@ -28,8 +260,8 @@ class Node(wsnlab.Node):
                Node: Created node object.
         """
         super().__init__(sim, id, pos)
-        self.scene = self.sim.scene
-        self.scene.node(id, *pos)
+        self.vis = self.sim.vis
+        self.vis.node(self)
 
     ###################
     def send(self, pck):
@@ -62,30 +294,7 @@ class Node(wsnlab.Node):
             else:
                 self.draw_pck_trace(pck, "wsnsimpy:packet")
     def draw_pck_trace(self, pck, line_arg):
-        #from cluster_overlap_reduction import ADDR_TO_NODE
-        if not pck['dest'].is_equal(wsnlab.BROADCAST_ADDR):
-
-            # pick address from next_hop or dest
-            hop = pck['next_hop'] if 'next_hop' in pck else pck['dest']
-            key = (hop.net_addr, hop.node_addr)
-
-            mapped = ADDR_TO_NODE.get(key)
-            if mapped is None:
-                print(f"[WARN] No mapping for key {key} — cannot draw trace")
-                return
-
-            #dest_x, dest_y = self.sim.nodes[mapped].pos
-            dest_x, dest_y = mapped.pos
-            src_x, src_y = self.pos
-
-            steps = 25
-            for i in range(steps + 1):
-                t = i / steps
-                dot_x = src_x + (dest_x - src_x) * t
-                dot_y = src_y + (dest_y - src_y) * t
-
-                dot_id = self.scene.circle(dot_x, dot_y, 1, line=line_arg)
-                self.delayed_exec(0.02 * (i + 1), self.scene.delshape, dot_id)
+        self.vis.packet(self, pck, line_arg)
     '''def draw_pck_trace(self, pck, line_arg):
         if not pck['dest'].is_equal(wsnlab.BROADCAST_ADDR):
             if 'next_hop' in pck.keys():
@@ -146,31 +355,14 @@ class Node(wsnlab.Node):
 
 
     def draw_tx_range(self):
-        # always use a fixed ID per node
-        tx_id = f"tx_{self.id}"
-        
-        # remove old one if exists
-        self.scene.delshape(tx_id)
-
-        # draw new one
-        self.tx_range_obj = tx_id
-        self.scene.circle(
-            self.pos[0],
-            self.pos[1],
-            self.tx_range,
-            id=tx_id,                # <-- FIXED HERE
-            line="wsnsimpy:tx"
-        )
-
+        self.vis.tx_range(self)
 
     def remove_tx_range(self):
-        if hasattr(self, "tx_range_obj"):
-            self.scene.delshape(self.tx_range_obj)
-            self.tx_range_obj = None
+        self.vis.clear_tx_range(self)
 
     def remove_parent(self):
-        if hasattr(self, 'parent_gui'):
-            self.scene.dellink(self.parent_link_id[0], self.parent_link_id[1], self.parent_link_id[2])
+        if hasattr(self, 'parent_link_id'):
+            self.vis.clear_parent_link(self, self.parent_link_id)
     def move(self, x, y):
         """Visualise move process in addition to base move method.
 
@@ -182,7 +374,7 @@ class Node(wsnlab.Node):
 
         """
         super().move(x, y)
-        self.scene.nodemove(self.id, x, y)
+        self.vis.nodemove(self, x, y)
 
     ####################
     def draw_parent(self):
@@ -193,8 +385,7 @@ class Node(wsnlab.Node):
            Returns:
 
         """
-        self.scene.addlink(self.parent_gui, self.id, "parent")
-        self.parent_link_id = [self.parent_gui, self.id, "parent"]
+        self.vis.parent_link(self)
 
     ####################
     def erase_parent(self):
@@ -205,21 +396,9 @@ class Node(wsnlab.Node):
            Returns:
 
         """
-        if self.parent_gui is not None:
-            self.scene.dellink(self.parent_gui, self.id, "parent")
+        self.vis.clear_parent_link(self)
 
 
-###########################################################
-class _FakeScene:
-    def _fake_method(self, *args, **kwargs):
-        pass
-
-    def __getattr__(self, name):
-        return self._fake_method
-
-
-###########################################################
-
 
 ###########################################################
 class Simulator(wsnlab.Simulator):
@@ -228,6 +407,8 @@ class Simulator(wsnlab.Simulator):
 
     Attributes:
         visual (bool): A flag to visualising process.
+        scene (Scene): topovis scene, None when neither visualised nor rendered to images.
+        vis (VisSink): Sink receiving visual events from nodes.
         terrain_size (Tuple(double,double)): Size of visualised terrain.
     '''
 
@@ -248,7 +429,9 @@ class Simulator(wsnlab.Simulator):
         super().__init__(duration, timescale, seed)
         self.visual = visual
         self.terrain_size = terrain_size
-        if self.visual:
+        self.scene = None
+        self.vis = NullSink()
+        if self.visual or config.SIM_RENDER_DIR:
             self.scene = Scene(realtime=True)
             self.scene.linestyle("wsnsimpy:tx", color=(0, 0, 1), dash=(5, 5))
             self.scene.linestyle("wsnsimpy:ack", color=(0, 1, 1), dash=(5, 5))
@@ -263,25 +446,62 @@ class Simulator(wsnlab.Simulator):
 
             self.scene.linestyle("wsnsimpy:collision", color=(1, 0, 0), width=3)
             self.scene.linestyle("parent", color=(0,.8,0), arrow="tail", width=2)
+            self.vis = SceneSink(self.scene)
+        if config.SIM_RENDER_DIR:
+            # started before Tk so the forked render worker holds no Tk state
+            self.imgplot = ImagePlotter(outdir=config.SIM_RENDER_DIR, terrain_size=terrain_size,
+                                        interval=config.SIM_RENDER_INTERVAL, fmt=config.SIM_RENDER_FORMAT)
+            self.scene.addPlotter(self.imgplot)
+        if self.visual:
             if title is None:
                 title = "WsnSimPy"
-            self.tkplot = Plotter(windowTitle=title, terrain_size=terrain_size)
+            tile_value = self._residual_energy if config.SIM_LOD_TILE_COLOR == 'energy' else None
+            self.tkplot = Plotter(windowTitle=title, terrain_size=terrain_size, fps=config.SIM_FRAME_RATE,
+                                  maxPackets=config.SIM_MAX_PACKET_ANIMATIONS,
+                                  maxDetailNodes=config.SIM_LOD_MAX_NODES, tileSize=config.SIM_LOD_TILE_SIZE,
+                                  tileValue=tile_value)
             self.tk = self.tkplot.tk
-            self.scene.addPlotter(self.tkplot)
+            # the scene is driven by the simulation thread; commands are queued and
+            # applied by the Tk main loop once per frame
+            self.scene.addPlotter(self.tkplot.queued())
+        if self.scene is not None:
             self.scene.init(*terrain_size)
-        else:
-            self.scene = _FakeScene()
+        if config.SIM_TRACE_FILE:
+            self.vis = TraceSink(self, config.SIM_TRACE_FILE, self.vis)
+
+    def _residual_energy(self, id):
+        """Returns the residual energy of node id as a fraction of config.JOULES (for LOD tiles)."""
+        return min(self.nodes[id].power / config.JOULES, 1.0)
 
-    def _update_time(self):
+    def move_nodes(self, moves):
+        """Moves many nodes and reports them to the visualisation as one batch, so links
+        between moved nodes are redrawn once.
+
+           Args:
+               moves (List of Tuple(Node,double,double)): Nodes and their new positions.
+
+           Returns:
+        """
+        for node, x, y in moves:
+            wsnlab.Node.move(node, x, y)
+        self.vis.nodemoves([node for node, x, y in moves])
+
+    def _update_time(self, period=0.1):
         """Updates time in scene.
 
            Args:
+               period (double): Simulation time between updates.
 
            Returns:
         """
         while True:
-            self.scene.setTime(self.now)
-            yield self.timeout(0.1)
+            self.vis.setTime(self.now)
+            yield self.timeout(period)
+
+    def _run_and_close(self):
+        """Runs the simulation and closes the visualisation sink (flushing any trace)."""
+        super().run()
+        self.vis.close()
 
     def run(self):
         """Starts visualisation process. Puts base run method to a Thread so that visualisation become main process.
@@ -292,9 +512,12 @@ class Simulator(wsnlab.Simulator):
         """
         if self.visual:
             self.env.process(self._update_time())
-            thr = Thread(target=super().run)
+            thr = Thread(target=self._run_and_close)
             thr.setDaemon(True)
             thr.start()
             self.tkplot.tk.mainloop()
         else:
-            super().run()
+            if self.scene is not None:
+                # frames are only rendered at image plotter intervals
+                self.env.process(self._update_time(config.SIM_RENDER_INTERVAL))
+            self._run_and_close()
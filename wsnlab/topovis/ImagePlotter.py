@@ -0,0 +1,207 @@
+import os
+import multiprocessing
+from .common import *
+from . import GenericPlotter
+
+try:
+    from PIL import Image, ImageDraw
+except ImportError:  # Pillow is only needed when frames are rendered
+    Image = ImageDraw = None
+
+def colorTuple(color, default=(0,0,0)):
+    if color is None:
+        return default
+    return tuple(int(x*255) for x in color)
+
+###############################################
+class Plotter(GenericPlotter):
+    """
+    Off-screen plotter writing the scene (nodes, colors, links, circles,
+    lines and rectangles) as numbered PNG frames every interval time units,
+    and optionally an animated GIF of them when closed.
+
+    Rasterizing happens in a worker process.  Scene commands are reduced to
+    small tuples, collected in a batch and sent to the worker once per frame
+    (or every batchSize commands), so the caller only pays for building the
+    tuples and never waits for drawing.  Pillow is required.
+    """
+    def __init__(self, outdir='frames', terrain_size=None, interval=10.0,
+                 fmt='png', params=None, batchSize=5000, gifFrameTime=100):
+        if Image is None:
+            raise ImportError('topovis.ImagePlotter needs Pillow (pip install pillow)')
+        if fmt not in ('png', 'gif'):
+            raise ValueError('fmt must be "png" or "gif"')
+        GenericPlotter.__init__(self, params)
+        if terrain_size is None:
+            terrain_size = (700,700)
+        self.interval = interval
+        self.nextFrame = 0.0
+        self.batchSize = batchSize
+        self.batch = []
+
+        # fork keeps the worker from re-running the (script style) main module
+        if 'fork' in multiprocessing.get_all_start_methods():
+            ctx = multiprocessing.get_context('fork')
+        else:
+            ctx = multiprocessing.get_context()
+        self.queue = ctx.Queue()
+        self.worker = ctx.Process(target=renderWorker,
+                args=(self.queue, outdir, tuple(terrain_size), fmt,
+                      self.params.nodesize, gifFrameTime),
+                daemon=True)
+        self.worker.start()
+
+    ###################
+    def send(self, *cmd):
+        self.batch.append(cmd)
+        if len(self.batch) >= self.batchSize:
+            self.flush()
+
+    ###################
+    def flush(self):
+        if self.batch:
+            self.queue.put(self.batch)
+            self.batch = []
+
+    ###################
+    def lineStyle(self, style):
+        if not isinstance(style, LineStyle):
+            style = self.scene.lineStyles[style]
+        return (colorTuple(style.color), int(style.width))
+
+    ###################
+    def setTime(self, time):
+        while time >= self.nextFrame:
+            self.send('frame', self.nextFrame)
+            self.nextFrame += self.interval
+            self.flush()
+
+    ###################
+    def node(self,id,x,y):
+        self.send('node', id, x, y)
+
+    ###################
+    def nodemove(self,id,x,y):
+        self.send('move', id, x, y)
+
+    ###################
+    def nodecolor(self,id,r,g,b):
+        self.send('color', id, colorTuple((r,g,b)))
+
+    ###################
+    def nodewidth(self,id,width):
+        self.send('width', id, int(width))
+
+    ###################
+    def nodelabel(self,id,label):
+        self.send('label', id, str(label))
+
+    ###################
+    def addlink(self,src,dst,style):
+        self.send('addlink', (src,dst,style), self.lineStyle(style))
+
+    ###################
+    def dellink(self,src,dst,style):
+        self.send('dellink', (src,dst,style))
+
+    ###################
+    def clearlinks(self):
+        self.send('clearlinks')
+
+    ###################
+    def circle(self,x,y,r,id,linestyle,fillstyle):
+        self.send('shape', id, 'circle', (x-r,y-r,x+r,y+r),
+                  self.lineStyle(linestyle), colorTuple(fillstyle.color, None))
+
+    ###################
+    def line(self,x1,y1,x2,y2,id,linestyle):
+        self.send('shape', id, 'line', (x1,y1,x2,y2), self.lineStyle(linestyle), None)
+
+    ###################
+    def rect(self,x1,y1,x2,y2,id,linestyle,fillstyle):
+        self.send('shape', id, 'rect', (x1,y1,x2,y2),
+                  self.lineStyle(linestyle), colorTuple(fillstyle.color, None))
+
+    ###################
+    def delshape(self,id):
+        self.send('delshape', id)
+
+    ###################
+    def close(self):
+        """
+        Send the remaining commands, then wait for the worker to write the
+        last frames (and the GIF)
+        """
+        self.flush()
+        self.queue.put(None)
+        self.worker.join()
+
+###############################################
+def renderWorker(queue, outdir, size, fmt, nodesize, gifFrameTime):
+    """
+    (Worker process) Keep a copy of the scene built from the command
+    batches in queue and rasterize it on every 'frame' command
+    """
+    os.makedirs(outdir, exist_ok=True)
+    nodes = {}    # id -> [x, y, color, width, label]
+    links = {}    # (src,dst,style) -> (color, width)
+    shapes = {}   # id -> (kind, box, (color, width), fill)
+    frames = []
+
+    def render(time):
+        img = Image.new('RGB', size, (255,255,255))
+        draw = ImageDraw.Draw(img)
+        for (src,dst,style), (color,width) in links.items():
+            if src in nodes and dst in nodes:
+                draw.line((nodes[src][0], nodes[src][1], nodes[dst][0], nodes[dst][1]),
+                          fill=color, width=width)
+        for kind, box, (color,width), fill in shapes.values():
+            if kind == 'circle':
+                draw.ellipse(box, outline=color, fill=fill, width=width)
+            elif kind == 'line':
+                draw.line(box, fill=color, width=width)
+            else:
+                draw.rectangle(box, outline=color, fill=fill, width=width)
+        for x, y, color, width, label in nodes.values():
+            draw.ellipse((x-nodesize, y-nodesize, x+nodesize, y+nodesize),
+                         outline=color, width=width)
+            draw.text((x, y), label, fill=color, anchor='mm')
+        draw.text((2, 2), 'Time: %.2fS' % time, fill=(0,0,0))
+        path = os.path.join(outdir, 'frame_%05d.png' % len(frames))
+        img.save(path)
+        frames.append(path)
+
+    while True:
+        batch = queue.get()
+        if batch is None:
+            break
+        for cmd in batch:
+            op = cmd[0]
+            if op == 'node':
+                nodes[cmd[1]] = [cmd[2], cmd[3], (0,0,0), 1, str(cmd[1])]
+            elif op == 'move':
+                nodes[cmd[1]][0:2] = cmd[2:4]
+            elif op == 'color':
+                nodes[cmd[1]][2] = cmd[2]
+            elif op == 'width':
+                nodes[cmd[1]][3] = cmd[2]
+            elif op == 'label':
+                nodes[cmd[1]][4] = cmd[2]
+            elif op == 'addlink':
+                links[cmd[1]] = cmd[2]
+            elif op == 'dellink':
+                links.pop(cmd[1], None)
+            elif op == 'clearlinks':
+                links.clear()
+            elif op == 'shape':
+                shapes[cmd[1]] = cmd[2:]
+            elif op == 'delshape':
+                shapes.pop(cmd[1], None)
+            elif op == 'frame':
+                render(cmd[1])
+
+    if fmt == 'gif' and frames:
+        first = Image.open(frames[0])
+        first.save(os.path.join(outdir, 'animation.gif'), save_all=True,
+                   append_images=(Image.open(p) for p in frames[1:]),
+                   duration=gifFrameTime, loop=0)
@@ -1,9 +1,11 @@
+from math import floor
+from time import monotonic
 from .common import *
 try:
     from Tkinter import *
 except ImportError:  # could be Python3
     from tkinter import *
-from . import GenericPlotter
+from . import GenericPlotter, QueuedPlotter
 
 arrowMap = { 'head' : LAST, 'tail' : FIRST, 'both' : BOTH, 'none' : NONE }
 
@@ -13,18 +15,83 @@ def colorStr(color):
     else:
         return '#%02x%02x%02x' % tuple(int(x*255) for x in color)
 
+def heatColor(value):
+    "Color ramp from red (0) through yellow to green (1)"
+    value = min(max(value, 0.0), 1.0)
+    return (min(1.0, 2 - 2*value), min(1.0, 2*value), 0.0)
+
 ###############################################
 class Plotter(GenericPlotter):
-    def __init__(self, windowTitle='TopoVis', terrain_size=None, params=None):
+    """
+    Tk canvas plotter.  Scene scripting commands do not touch the canvas
+    directly; they record the change in a set of dirty entries which is
+    applied once per frame (fps times per second) from the Tk event loop.
+    Repeated updates of the same node, link or shape within a frame are
+    coalesced so only the last one is drawn.
+
+    An animated packet is a single marker whose coordinates are moved along
+    its link every frame.  Packets sent over a link that already carries a
+    marker are folded into it (the marker restarts and grows), and at most
+    maxPackets markers are animated at a time; extra packets are counted in
+    droppedPackets but not drawn.
+
+    The view can be zoomed with the mouse wheel and panned by dragging.
+    Canvas items exist only for what is inside the viewport.  When more than
+    maxDetailNodes nodes are visible the plotter switches to level of detail
+    rendering: nodes, labels, links and shapes are replaced by square tiles
+    of tileSize pixels, colored by the mean color (role mix) of their nodes,
+    or by the mean of tileValue(id) (e.g. residual energy between 0 and 1)
+    on a red to green ramp if tileValue is given.
+
+    All methods must run on the Tk thread.  A scene driven from another
+    thread should be given queued() instead of the plotter itself; the
+    queued commands are then drained, at most maxBatch per frame, right
+    before the frame is drawn.
+    """
+    def __init__(self, windowTitle='TopoVis', terrain_size=None, params=None, fps=30, maxBatch=50000,
+                 maxPackets=200, maxDetailNodes=2000, tileSize=24, tileValue=None):
         GenericPlotter.__init__(self, params)
-        self.nodes = {}
-        self.links = {}
-        self.nodeLinks = {}
+        self.nodes = {}          # node id -> (oval, label) of nodes drawn in detail
+        self.links = {}          # (src,dst,style) -> line of links drawn in detail
+        self.nodeLinks = {}      # node id -> set of (src,dst,style) links attached to it
         self.lineStyles = {}
-        self.shapes = {}
+        self.shapes = {}         # shape id -> canvas item
+        self.shapeSpecs = {}     # shape id -> (kind, args), kept to redraw after view changes
         self.windowTitle = windowTitle
         self.prepareCanvas(terrain_size)
         self.lastShownTime = 0
+        self.frameInterval = max(int(1000 / fps), 1)
+        self.fps = fps
+        self.frameCount = 0
+        self.maxBatch = maxBatch
+        self.inbox = None
+        self.packets = {}        # (src,dst,linestyle) -> [item, start, duration, count]
+        self.maxPackets = maxPackets
+        self.droppedPackets = 0
+
+        # view and level of detail
+        self.zoom = 1.0
+        self.ox, self.oy = 0.0, 0.0   # world coordinates at the top left corner
+        self.maxDetailNodes = maxDetailNodes
+        self.tileSize = tileSize
+        self.tileValue = tileValue
+        self.detail = True
+        self.visible = set()     # ids of nodes inside the viewport (detail mode)
+        self.tiles = {}          # (i,j) -> canvas item (aggregate mode)
+        self.tileNodes = {}      # (i,j) -> set of node ids (aggregate mode)
+        self.nodeTile = {}       # node id -> (i,j) (aggregate mode)
+        self.dirtyTiles = set()
+
+        # dirty entries waiting for the next frame
+        self.dirtyNew = []       # nodes defined since the last frame
+        self.dirtyPos = set()    # nodes whose position or scale changed
+        self.dirtyStyle = {}     # node id -> {'color': .., 'width': .., 'label': ..}
+        self.dirtyLinks = {}     # (src,dst,style) -> True (add) / False (delete)
+        self.dirtyShapes = {}    # shape id -> ('circle'|'line'|'rect', args) or None (delete)
+        self.dirtyTime = None
+        self.dirtyClear = False
+        self.dirtyView = True    # zoom, pan or resize: redraw everything
+        self.tk.after(self.frameInterval, self.onFrame)
 
     ###################
     def prepareCanvas(self,terrain_size=None):
@@ -36,35 +103,390 @@ class Plotter(GenericPlotter):
         self.tk.title(self.windowTitle)
         self.canvas = Canvas(self.tk, width=tx, height=ty)
         self.canvas.pack(fill=BOTH, expand=YES)
+        self.canvasSize = (tx,ty)
         self.timeText = self.canvas.create_text(0,0,text="time=0.0",anchor=NW)
+        self.canvas.bind('<Configure>', self.onResize)
+        self.canvas.bind('<MouseWheel>', self.onWheel)
+        self.canvas.bind('<Button-4>', self.onWheel)
+        self.canvas.bind('<Button-5>', self.onWheel)
+        self.canvas.bind('<ButtonPress-1>', self.onPress)
+        self.canvas.bind('<B1-Motion>', self.onDrag)
+
+    ###################
+    def queued(self):
+        """
+        Return a QueuedPlotter feeding this plotter, for use by a scene that
+        runs in another thread
+        """
+        if self.inbox is None:
+            self.inbox = QueuedPlotter(self)
+        return self.inbox
+
+    #######################################################
+    # View handling
+    #######################################################
+    def toScreen(self, x, y):
+        return ((x - self.ox) * self.zoom, (y - self.oy) * self.zoom)
+
+    ###################
+    def inView(self, x, y, r=0):
+        (sx,sy) = self.toScreen(x, y)
+        r = r * self.zoom + self.params.nodesize
+        (w,h) = self.canvasSize
+        return -r <= sx <= w + r and -r <= sy <= h + r
+
+    ###################
+    def setView(self, zoom, ox, oy):
+        """
+        Show the world from (ox,oy) at the top left corner, magnified zoom
+        times
+        """
+        self.zoom = zoom
+        self.ox, self.oy = ox, oy
+        self.dirtyView = True
+
+    ###################
+    def onResize(self, event):
+        self.canvasSize = (event.width, event.height)
+        self.dirtyView = True
+
+    ###################
+    def onWheel(self, event):
+        factor = 1.25 if (event.num == 4 or getattr(event, 'delta', 0) > 0) else 0.8
+        # keep the point under the cursor in place
+        wx = self.ox + event.x / self.zoom
+        wy = self.oy + event.y / self.zoom
+        zoom = self.zoom * factor
+        self.setView(zoom, wx - event.x / zoom, wy - event.y / zoom)
+
+    ###################
+    def onPress(self, event):
+        self.dragFrom = (event.x, event.y)
+
+    ###################
+    def onDrag(self, event):
+        (x,y) = self.dragFrom
+        self.dragFrom = (event.x, event.y)
+        self.setView(self.zoom, self.ox - (event.x - x) / self.zoom,
+                     self.oy - (event.y - y) / self.zoom)
+
+    ###################
+    def onFrame(self):
+        """
+        Apply queued commands and the changes recorded since the last frame,
+        then schedule the next frame
+        """
+        if self.inbox is not None:
+            self.inbox.drain(self.maxBatch)
+        self.flush()
+        self.frameCount += 1
+        self.tk.after(self.frameInterval, self.onFrame)
+
+    ###################
+    def flush(self):
+        """
+        Apply all dirty entries to the canvas
+        """
+        new, self.dirtyNew = self.dirtyNew, []
+        pos, self.dirtyPos = self.dirtyPos, set()
+        style, self.dirtyStyle = self.dirtyStyle, {}
+        links, self.dirtyLinks = self.dirtyLinks, {}
+        shapes, self.dirtyShapes = self.dirtyShapes, {}
+        time, self.dirtyTime = self.dirtyTime, None
+        clear, self.dirtyClear = self.dirtyClear, False
+        view, self.dirtyView = self.dirtyView, False
+
+        for id, shape in shapes.items():
+            if shape is None:
+                self.shapeSpecs.pop(id, None)
+            else:
+                self.shapeSpecs[id] = shape
+
+        c = self.canvas
+        if view or clear:
+            self.redraw()
+        elif self.detail:
+            self.flushDetail(new, pos, style, links, shapes)
+        else:
+            for id in new:
+                self.retile(id)
+            for id in pos:
+                self.retile(id)
+            if self.tileValue is not None:
+                # values such as energy change without scene commands
+                if self.frameCount % self.fps == 0:
+                    self.dirtyTiles.update(self.tileNodes)
+            else:
+                for id, attrs in style.items():
+                    if 'color' in attrs and id in self.nodeTile:
+                        self.dirtyTiles.add(self.nodeTile[id])
+            self.paintTiles()
+        if time is not None:
+            c.itemconfigure(self.timeText, text='Time: %.2fS' % time)
+        if self.packets:
+            self.animatePackets()
+
+    ###################
+    def flushDetail(self, new, pos, style, links, shapes):
+        """
+        Apply dirty entries in detail mode, creating and deleting canvas
+        items of nodes as they enter and leave the viewport
+        """
+        c = self.canvas
+        nodes = self.scene.nodes
+        visible = self.visible
+        for id in new:
+            if id not in visible and self.inView(*nodes[id].pos):
+                self.showNode(id)
+        for key, add in links.items():
+            if add:
+                if key in self.links:
+                    self.updateLink(*key)
+                elif key[0] in visible or key[1] in visible:
+                    self.links[key] = self.createLink(*key)
+            elif key in self.links:
+                c.delete(self.links.pop(key))
+        touched = set()
+        for id in pos:
+            inside = self.inView(*nodes[id].pos)
+            if id in visible:
+                if inside:
+                    self.updateNodePosAndSize(id)
+                    touched.update(self.nodeLinks.get(id, ()))
+                else:
+                    self.hideNode(id)
+            elif inside:
+                self.showNode(id)
+        for key in touched:
+            if key in self.links and key not in links:
+                self.updateLink(*key)
+        for id, attrs in style.items():
+            if id not in self.nodes:
+                continue
+            (node_tag,label_tag) = self.nodes[id]
+            if 'color' in attrs:
+                color = colorStr(attrs['color'])
+                c.itemconfig(node_tag, outline=color)
+                c.itemconfigure(label_tag, fill=color)
+            if 'width' in attrs:
+                c.itemconfig(node_tag, width=attrs['width'])
+            if 'label' in attrs:
+                c.itemconfigure(label_tag, text=attrs['label'])
+        for id, shape in shapes.items():
+            if id in self.shapes:
+                c.delete(self.shapes.pop(id))
+            if shape is not None:
+                self.drawShape(id, *shape)
+
+    ###################
+    def redraw(self):
+        """
+        Rebuild all canvas items for the current view, choosing between
+        detail and aggregate rendering
+        """
+        c = self.canvas
+        for tag in ('node', 'link', 'shape', 'tile', 'packet'):
+            c.delete(tag)
+        self.nodes.clear()
+        self.links.clear()
+        self.shapes.clear()
+        self.tiles.clear()
+        self.tileNodes.clear()
+        self.nodeTile.clear()
+        self.dirtyTiles = set()
+        for anim in self.packets.values():
+            anim[0] = None
+        if self.scene is None:
+            return
+
+        # the scene may be updated by another thread: iterate over a copy
+        nodes = list(self.scene.nodes.items())
+        self.visible = set(id for id, node in nodes if self.inView(*node.pos))
+        self.detail = len(self.visible) <= self.maxDetailNodes
+        if self.detail:
+            for id in self.visible:
+                self.createNode(id)
+            for id in self.visible:
+                for key in self.nodeLinks.get(id, ()):
+                    if key not in self.links:
+                        self.links[key] = self.createLink(*key)
+            for id, (kind, args) in self.shapeSpecs.items():
+                self.drawShape(id, kind, args)
+        else:
+            self.visible = set()
+            for id, node in nodes:
+                self.retile(id)
+            self.paintTiles()
+        c.tag_raise(self.timeText)
+
+    #######################################################
+    # Aggregate (level of detail) rendering
+    #######################################################
+    def retile(self, id):
+        """
+        Move node id into the tile under its current position and mark the
+        affected tiles for repainting
+        """
+        t = self.tileSize / self.zoom
+        (x,y) = self.scene.nodes[id].pos
+        key = (floor(x / t), floor(y / t))
+        old = self.nodeTile.get(id)
+        if old != key:
+            if old is not None:
+                self.tileNodes[old].discard(id)
+                self.dirtyTiles.add(old)
+            self.nodeTile[id] = key
+            self.tileNodes.setdefault(key, set()).add(id)
+        self.dirtyTiles.add(key)
+
+    ###################
+    def paintTiles(self):
+        """
+        Create, recolor or delete the canvas items of dirty tiles that are
+        inside the viewport
+        """
+        c = self.canvas
+        t = self.tileSize / self.zoom
+        nodes = self.scene.nodes
+        for key in self.dirtyTiles:
+            ids = self.tileNodes.get(key)
+            if not ids:
+                self.tileNodes.pop(key, None)
+                if key in self.tiles:
+                    c.delete(self.tiles.pop(key))
+                continue
+            (i,j) = key
+            if not self.inView((i + 0.5) * t, (j + 0.5) * t, t):
+                continue
+            if self.tileValue is not None:
+                color = heatColor(sum(self.tileValue(id) for id in ids) / len(ids))
+            else:
+                colors = [nodes[id].color if nodes[id].color != DEFAULT else (0,0,0) for id in ids]
+                color = tuple(sum(col[k] for col in colors) / len(colors) for k in range(3))
+            item = self.tiles.get(key)
+            if item is None:
+                (x1,y1) = self.toScreen(i * t, j * t)
+                item = self.tiles[key] = c.create_rectangle(
+                        x1, y1, x1 + self.tileSize, y1 + self.tileSize,
+                        outline='#c0c0c0', tags='tile')
+            c.itemconfigure(item, fill=colorStr(color))
+        self.dirtyTiles = set()
+
+    #######################################################
+    # Detail rendering
+    #######################################################
+    def createNode(self, id):
+        """
+        Create the canvas items of node id from its current scene state
+        """
+        c = self.canvas
+        node = self.scene.nodes[id]
+        self.nodes[id] = (c.create_oval(0,0,0,0, tags='node'),
+                          c.create_text(0,0,text=node.label, tags='node'))
+        (node_tag,label_tag) = self.nodes[id]
+        if node.color != DEFAULT:
+            c.itemconfig(node_tag, outline=colorStr(node.color))
+            c.itemconfigure(label_tag, fill=colorStr(node.color))
+        if node.width != DEFAULT:
+            c.itemconfig(node_tag, width=node.width)
+        self.updateNodePosAndSize(id)
+
+    ###################
+    def showNode(self, id):
+        "Node id entered the viewport: create it and its links"
+        self.visible.add(id)
+        self.createNode(id)
+        for key in self.nodeLinks.get(id, ()):
+            if key in self.links:
+                self.updateLink(*key)
+            else:
+                self.links[key] = self.createLink(*key)
+
+    ###################
+    def hideNode(self, id):
+        "Node id left the viewport: delete it and links with no visible end"
+        c = self.canvas
+        self.visible.discard(id)
+        for item in self.nodes.pop(id):
+            c.delete(item)
+        for key in self.nodeLinks.get(id, ()):
+            if key in self.links:
+                if key[0] in self.visible or key[1] in self.visible:
+                    self.updateLink(*key)
+                else:
+                    c.delete(self.links.pop(key))
+
+    ###################
+    def drawShape(self, id, kind, args):
+        c = self.canvas
+        if kind == 'circle':
+            x, y, r, linestyle, fillstyle = args
+            if not self.inView(x, y, r):
+                return
+            (x,y) = self.toScreen(x, y)
+            r = r * self.zoom
+            self.shapes[id] = c.create_oval(x-r,y-r,x+r,y+r, tags='shape')
+            self.configPolygon(self.shapes[id], linestyle, fillstyle)
+        elif kind == 'line':
+            x1, y1, x2, y2, linestyle = args
+            if not (self.inView(x1, y1) or self.inView(x2, y2)):
+                return
+            self.shapes[id] = c.create_line(*self.toScreen(x1,y1), *self.toScreen(x2,y2), tags='shape')
+            self.configLine(self.shapes[id], linestyle)
+        else:
+            x1, y1, x2, y2, linestyle, fillstyle = args
+            if not (self.inView(x1, y1) or self.inView(x2, y2)):
+                return
+            self.shapes[id] = c.create_rectangle(*self.toScreen(x1,y1), *self.toScreen(x2,y2), tags='shape')
+            self.configPolygon(self.shapes[id], linestyle, fillstyle)
+
+    ###################
+    def animatePackets(self):
+        """
+        Move every packet marker to its current position on the link and
+        remove the ones that have arrived (all of them in aggregate mode)
+        """
+        c = self.canvas
+        size = self.params.nodesize * 0.3
+        now = monotonic()
+        for key in list(self.packets):
+            item, start, duration, count = anim = self.packets[key]
+            t = (now - start) / duration
+            if t >= 1 or not self.detail:
+                if item is not None:
+                    c.delete(item)
+                del self.packets[key]
+                continue
+            src, dst, linestyle = key
+            (x1,y1) = self.scene.nodes[src].pos
+            (x2,y2) = self.scene.nodes[dst].pos
+            (x,y) = self.toScreen(x1 + (x2 - x1) * t, y1 + (y2 - y1) * t)
+            r = size * min(count, 4)
+            if item is None:
+                anim[0] = item = c.create_oval(x-r,y-r,x+r,y+r, tags='packet')
+                color = colorStr(linestyle.color)
+                c.itemconfigure(item, outline=color, fill=color)
+            else:
+                c.coords(item, x-r, y-r, x+r, y+r)
 
     ###################
     def setTime(self, time):
-        if (time - self.lastShownTime > 0.05):
-            self.canvas.itemconfigure(self.timeText, text='Time: %.2fS' % time)
+        # abs() so a replay seeking backwards still updates the label
+        if (abs(time - self.lastShownTime) > 0.05):
+            self.dirtyTime = time
             self.lastShownTime = time
 
     ###################
     def updateNodePosAndSize(self,id):
         p = self.params
         c = self.canvas
-        if id not in self.nodes.keys():
-            node_tag = c.create_oval(0,0,0,0)
-            label_tag = c.create_text(0,0,text=str(id))
-            self.nodes[id] = (node_tag,label_tag)
-        else:
-            (node_tag,label_tag) = self.nodes[id]
+        (node_tag,label_tag) = self.nodes[id]
 
         node = self.scene.nodes[id]
-        nodesize = node.scale*p.nodesize
-        x1 = node.pos[0] - nodesize
-        y1 = node.pos[1] - nodesize
-        (x2,y2) = (x1 + nodesize*2, y1 + nodesize*2)
-        c.coords(node_tag, x1, y1, x2, y2)
-        c.coords(label_tag, node.pos)
-
-        for l in self.nodeLinks[id]:
-            self.updateLink(*l)
+        nodesize = node.scale*p.nodesize*self.zoom
+        (x,y) = self.toScreen(*node.pos)
+        c.coords(node_tag, x - nodesize, y - nodesize, x + nodesize, y + nodesize)
+        c.coords(label_tag, x, y)
 
     ###################
     def configLine(self,tagOrId,style):
@@ -84,121 +506,106 @@ class Plotter(GenericPlotter):
         config['fill']     = colorStr(fillStyle.color)
         self.canvas.itemconfigure(tagOrId,**config)
 
+    ###################
+    def linkEndPoints(self,src,dst):
+        (x1,y1,x2,y2) = computeLinkEndPoints(
+                self.scene.nodes[src],
+                self.scene.nodes[dst],
+                self.params.nodesize)
+        return self.toScreen(x1,y1) + self.toScreen(x2,y2)
+
     ###################
     def createLink(self,src,dst,style):
         if src is dst:
             raise('Source and destination are the same node')
-        p = self.params
-        c = self.canvas
-        (x1,y1,x2,y2) = computeLinkEndPoints(
-                self.scene.nodes[src],
-                self.scene.nodes[dst], 
-                p.nodesize)
-        link_obj = c.create_line(x1, y1, x2, y2, tags='link')
+        link_obj = self.canvas.create_line(*self.linkEndPoints(src, dst), tags='link')
         self.configLine(link_obj, self.scene.lineStyles[style])
         return link_obj
 
     ###################
     def updateLink(self,src,dst,style):
-        p = self.params
-        c = self.canvas
         link_obj = self.links[(src,dst,style)]
-        (x1,y1,x2,y2) = computeLinkEndPoints(
-                self.scene.nodes[src],
-                self.scene.nodes[dst], 
-                p.nodesize)
-        c.coords(link_obj, x1, y1, x2, y2)
+        self.canvas.coords(link_obj, *self.linkEndPoints(src, dst))
 
 
+    ###################
+    def setNodeStyle(self,id,attr,value):
+        self.dirtyStyle.setdefault(id, {})[attr] = value
+
     ###################
     def node(self,id,x,y):
-        self.nodeLinks[id] = []
-        self.updateNodePosAndSize(id)
-        self.tk.update()
+        self.nodeLinks.setdefault(id, set())
+        self.dirtyNew.append(id)
 
     ###################
     def nodemove(self,id,x,y):
-        self.updateNodePosAndSize(id)
-        self.tk.update()
+        self.dirtyPos.add(id)
+
+    ###################
+    def nodemoves(self,moves):
+        self.dirtyPos.update([id for (id,x,y) in moves])
 
     ###################
     def nodecolor(self,id,r,g,b):
-        (node_tag,label_tag) = self.nodes[id]
-        self.canvas.itemconfig(node_tag, outline=colorStr((r,g,b)))
-        self.canvas.itemconfigure(label_tag, fill=colorStr((r,g,b)))
-        self.tk.update()
+        self.setNodeStyle(id, 'color', (r,g,b))
 
     ###################
     def nodewidth(self,id,width):
-        (node_tag,label_tag) = self.nodes[id]
-        self.canvas.itemconfig(node_tag, width=width)
-        self.tk.update()
+        self.setNodeStyle(id, 'width', width)
 
     ###################
     def nodescale(self,id,scale):
         # scale attribute has been set by TopoVis
         # just update the node
-        self.updateNodePosAndSize(id)
-        self.tk.update()
+        self.dirtyPos.add(id)
 
     ###################
     def nodelabel(self,id,label):
-        (node_tag,label_tag) = self.nodes[id]
-        self.canvas.itemconfigure(label_tag, text=self.scene.nodes[id].label)
-        self.tk.update()
+        self.setNodeStyle(id, 'label', self.scene.nodes[id].label)
 
     ###################
     def addlink(self,src,dst,style):
-        self.nodeLinks[src].append((src,dst,style))
-        self.nodeLinks[dst].append((src,dst,style))
-        self.links[(src,dst,style)] = self.createLink(src, dst, style)
-        self.tk.update()
+        self.nodeLinks[src].add((src,dst,style))
+        self.nodeLinks[dst].add((src,dst,style))
+        self.dirtyLinks[(src,dst,style)] = True
 
     ###################
     def dellink(self,src,dst,style):
-        self.nodeLinks[src].remove((src,dst,style))
-        self.nodeLinks[dst].remove((src,dst,style))
-        self.canvas.delete(self.links[(src,dst,style)])
-        del self.links[(src,dst,style)]
-        self.tk.update()
+        self.nodeLinks[src].discard((src,dst,style))
+        self.nodeLinks[dst].discard((src,dst,style))
+        self.dirtyLinks[(src,dst,style)] = False
 
     ###################
     def clearlinks(self):
-        self.canvas.delete('link')
-        self.links.clear()
-        for n in self.nodes.keys():
-            self.nodeLinks[n] = []
-        self.tk.update()
+        for links in self.nodeLinks.values():
+            links.clear()
+        self.dirtyLinks.clear()
+        self.dirtyClear = True
 
     ###################
     def circle(self,x,y,r,id,linestyle,fillstyle):
-        if id in self.shapes.keys():
-            self.canvas.delete(self.shapes[id])
-            del self.shapes[id]
-        self.shapes[id] = self.canvas.create_oval(x-r,y-r,x+r,y+r)
-        self.configPolygon(self.shapes[id], linestyle, fillstyle)
-        self.tk.update()
+        self.dirtyShapes[id] = ('circle', (x, y, r, linestyle, fillstyle))
 
     ###################
     def line(self,x1,y1,x2,y2,id,linestyle):
-        if id in self.shapes.keys():
-            self.canvas.delete(self.shapes[id])
-            del self.shapes[id]
-        self.shapes[id] = self.canvas.create_line(x1,y1,x2,y2)
-        self.configLine(self.shapes[id], linestyle)
-        self.tk.update()
+        self.dirtyShapes[id] = ('line', (x1, y1, x2, y2, linestyle))
 
     ###################
     def rect(self,x1,y1,x2,y2,id,linestyle,fillstyle):
-        if id in self.shapes.keys():
-            self.canvas.delete(self.shapes[id])
-            del self.shapes[id]
-        self.shapes[id] = self.canvas.create_rectangle(x1,y1,x2,y2)
-        self.configPolygon(self.shapes[id], linestyle, fillstyle)
-        self.tk.update()
+        self.dirtyShapes[id] = ('rect', (x1, y1, x2, y2, linestyle, fillstyle))
 
     ###################
     def delshape(self,id):
-        if id in self.shapes.keys():
-            self.canvas.delete(self.shapes[id])
-            self.tk.update()
+        self.dirtyShapes[id] = None
+
+    ###################
+    def packet(self,src,dst,linestyle,duration):
+        key = (src,dst,linestyle)
+        anim = self.packets.get(key)
+        if anim is not None:
+            anim[1] = monotonic()
+            anim[3] += 1
+        elif len(self.packets) < self.maxPackets:
+            self.packets[key] = [None, monotonic(), max(duration, 1e-3), 1]
+        else:
+            self.droppedPackets += 1
@@ -1,6 +1,8 @@
-from time import sleep, time as systime
-from threading import Timer
+from time import time as systime
+from threading import Thread, Condition
+import traceback
 from heapq import heappush, heappop
+from collections import deque
 import inspect
 import functools
 
@@ -35,6 +37,9 @@ class GenericPlotter:
     def setTime(self, time): pass
     def node(self,id,x,y): pass
     def nodemove(self,id,x,y): pass
+    def nodemoves(self,moves):
+        for (id,x,y) in moves:
+            self.nodemove(id,x,y)
     def nodehollow(self,id,flag): pass
     def nodedouble(self,id,flag): pass
     def nodecolor(self,id,r,g,b): pass
@@ -49,10 +54,67 @@ class GenericPlotter:
     def line(self,x1,y1,x2,y2,id,linestyle): pass
     def rect(self,x1,y1,x2,y2,id,linestyle,fillstyle): pass
     def delshape(self,id): pass
+    def packet(self,src,dst,linestyle,duration): pass
     def linestyle(self,id,**kwargs): pass
     def fillstyle(self,id,**kwargs): pass
     def textstyle(self,id,**kwargs): pass
 
+    # called once when the scene is finished, e.g. to flush output
+    def close(self): pass
+
+###############################################
+class QueuedPlotter(GenericPlotter):
+    """
+    Thread-safe front end of a plotter that must only be touched by its own
+    (e.g. Tk main) thread.  Every scene scripting command is appended as a
+    compact (name, args) tuple to a deque, which needs no lock since append
+    and popleft are atomic, and the owning thread applies them in batches by
+    calling drain().  The producer never waits for rendering, so the
+    simulation can run ahead while the GUI catches up.
+    """
+    def __init__(self, target):
+        GenericPlotter.__init__(self, target.params)
+        self.target = target
+        self.commands = deque()
+
+    ###################
+    def setScene(self, scene):
+        self.scene = scene
+        self.target.setScene(scene)
+
+    ###################
+    def pending(self):
+        """
+        Return the number of commands waiting to be applied
+        """
+        return len(self.commands)
+
+    ###################
+    def drain(self, limit=None):
+        """
+        (Consumer thread only) Apply up to limit queued commands to the
+        target plotter in FIFO order and return how many were applied
+        """
+        commands = self.commands
+        target = self.target
+        n = len(commands) if limit is None else min(limit, len(commands))
+        for _ in range(n):
+            name, args = commands.popleft()
+            getattr(target, name)(*args)
+        return n
+
+def _queueCommand(name):
+    def _enqueue_(self, *args):
+        self.commands.append((name, args))
+    _enqueue_.__name__ = name
+    return _enqueue_
+
+for _name in ('init', 'setTime', 'node', 'nodemove', 'nodemoves', 'nodehollow',
+              'nodedouble', 'nodecolor', 'nodewidth', 'nodelabel', 'nodescale', 'addlink',
+              'dellink', 'clearlinks', 'show', 'circle', 'line', 'rect',
+              'delshape', 'packet', 'linestyle', 'fillstyle', 'textstyle'):
+    setattr(QueuedPlotter, _name, _queueCommand(_name))
+
 ###############################################
 
 def informPlotters(_func_):
@@ -99,12 +161,18 @@ class Scene:
         self.initialized = False
         self.timescale = timescale
         self.realtime = realtime
-        self.evq = []        # Event queue
+        self.evq = []        # Event queue of (time, seq, cmd, args, kwargs)
+        self.evseq = 0       # Tie breaker keeping FIFO order of simultaneous events
+        self.evlock = Condition()
+        self.dispatcher = None  # Thread running due events, alive while evq is not empty
+        self.epoch = 0.0     # Wall clock time of scene time 0 (non-realtime)
+        self.lastTime = 0.0  # Latest time passed to execute() (non-realtime)
         self.uniqueId = 0    # Counter for generating unique IDs
 
         self.dim = (0,0)     # Terrain dimension
         self.nodes = {}      # Nodes' information
         self.links = set()   # Set of links between nodes
+        self.nodeLinks = {}  # Node id -> set of links attached to it
         self.lineStyles = {} # List of defined line styles
         self.fillStyles = {} # List of defined fill styles
         self.textStyles = {} # List of defined text styles
@@ -146,18 +214,25 @@ class Scene:
     def execute(self, time, cmd, *args, **kwargs):
         """
         Execute the scene scripting command, cmd, with specified
-        variable-length and keyword arguments
+        variable-length and keyword arguments.  In realtime mode the command
+        takes effect immediately.  Otherwise it is scheduled to take effect
+        at the given time (scaled by timescale) on the dispatcher thread and
+        this method returns at once.
         """
         if self.realtime:
             self.setTime(systime()-self.startTime)
+            self._run(cmd, args, kwargs)
         else:
-            # examine the event queue and execute everything prior to
-            # the 'current time'
-            while len(self.evq) > 0 and self.evq[0][0] < time:
-                (t,proc,a,kw) = heappop(self.evq)
-                self.setTime(t)
-                proc(*a,**kw)
-            self.setTime(time)
+            if time < self.lastTime:
+                raise Exception(
+                        'Time cannot flow backward: current = %.3f, new = %.3f'
+                        % (self.lastTime, time)
+                        )
+            self.lastTime = time
+            self._schedule(time, cmd, args, kwargs)
+
+    ###################
+    def _run(self, cmd, args, kwargs):
         if type(cmd) is str:
             #exec 'self.' + cmd    # Python2
             exec('self.' + cmd)  # Python3
@@ -174,20 +249,79 @@ class Scene:
             # no need to scedule any execution at time infinity
             return
         if self.realtime:
-            def execfn():
-                self.execute(0, cmd, *args, **kwargs)
-            Timer(delay, execfn).start()
+            self._schedule(systime()-self.startTime+delay, cmd, args, kwargs)
         else:
-            heappush(self.evq, (self.time+delay, cmd, args, kwargs))
+            self._schedule(self.time+delay, cmd, args, kwargs)
+
+    ###################
+    def _schedule(self, time, cmd, args, kwargs):
+        """
+        (Use internally) Put a command on the event queue and make sure the
+        dispatcher thread is running.  All delayed commands share this one
+        thread, which sleeps until the earliest of them is due.
+        """
+        with self.evlock:
+            self.evseq += 1
+            heappush(self.evq, (time, self.evseq, cmd, args, kwargs))
+            if self.dispatcher is None:
+                if not self.realtime:
+                    self.epoch = systime() - self.time*self.timescale
+                self.dispatcher = Thread(target=self._dispatch, name='TopoVis dispatcher')
+                self.dispatcher.start()
+            elif self.evq[0][1] == self.evseq:
+                self.evlock.notify()   # new earliest event, wake the dispatcher
+
+    ###################
+    def _dueTime(self, time):
+        """
+        (Use internally) Return the wall clock time at which an event of the
+        event queue is due
+        """
+        if self.realtime:
+            return self.startTime + time
+        return self.epoch + time*self.timescale
+
+    ###################
+    def _dispatch(self):
+        """
+        (Dispatcher thread) Execute queued commands in time order as they
+        become due, and exit once the event queue is empty
+        """
+        with self.evlock:
+            while self.evq:
+                wait = self._dueTime(self.evq[0][0]) - systime()
+                if wait > 0:
+                    self.evlock.wait(wait)
+                    continue
+                (t,seq,cmd,args,kwargs) = heappop(self.evq)
+                self.evlock.release()
+                try:
+                    self.setTime(systime()-self.startTime if self.realtime else t)
+                    self._run(cmd, args, kwargs)
+                except Exception:
+                    traceback.print_exc()
+                finally:
+                    self.evlock.acquire()
+            self.dispatcher = None
+
+    ###################
+    def wait(self):
+        """
+        Block until every command on the event queue has been executed
+        """
+        with self.evlock:
+            dispatcher = self.dispatcher
+        if dispatcher is not None:
+            dispatcher.join()
 
     ###################
     def setTime(self,time):
         """
         Set the current time being tracked by TopoVis to the specified time.
-        A corresponding amount of delay will be applied unless TopoVis scene
-        was instantiated to run in real-time.  This method also informs all
-        registered plotters about the updated time so that a label or window
-        title can be updated accordingly.
+        The caller is never delayed; in non-realtime mode commands passed to
+        execute() are paced by the dispatcher thread instead.  This method
+        also informs all registered plotters about the updated time so that
+        a label or window title can be updated accordingly.
         """
         if time < self.time:
             raise Exception(
@@ -195,7 +329,6 @@ class Scene:
                     % (self.time, time)
                     )
         if not self.realtime:
-            sleep((time-self.time)*self.timescale)
             self.time = time
         for plotter in self.plotters:
             plotter.setTime(time)
@@ -235,6 +368,7 @@ class Scene:
         self.nodes[id].double = DEFAULT
         self.nodes[id].width  = DEFAULT
         self.nodes[id].color  = DEFAULT
+        self.nodeLinks.setdefault(id, set())
 
     ###################
     @informPlotters
@@ -245,6 +379,19 @@ class Scene:
         """
         self.nodes[id].pos = (x,y)
 
+    ###################
+    @informPlotters
+    def nodemoves(self,moves):
+        """
+        (Scene scripting command)
+        Move several nodes at once; moves is a list of (id,x,y).  Plotters
+        get the whole batch, so a link between two moved nodes is redrawn
+        once instead of once per endpoint
+        """
+        nodes = self.nodes
+        for (id,x,y) in moves:
+            nodes[id].pos = (x,y)
+
     ###################
     @informPlotters
     def nodecolor(self,id,r,g,b):
@@ -309,7 +456,10 @@ class Scene:
         Add a link with the specified style, which is an instance of
         LineStyle, between a pair of nodes
         """
-        self.links.add((src,dst,style))
+        link = (src,dst,style)
+        self.links.add(link)
+        self.nodeLinks[src].add(link)
+        self.nodeLinks[dst].add(link)
 
     ###################
     @informPlotters
@@ -318,7 +468,10 @@ class Scene:
         (Scene scripting command)
         Remove a link with the specified style from a pair of nodes
         """
-        self.links.remove((src,dst,style))
+        link = (src,dst,style)
+        self.links.remove(link)
+        self.nodeLinks[src].discard(link)
+        self.nodeLinks[dst].discard(link)
 
     ###################
     @informPlotters
@@ -328,6 +481,8 @@ class Scene:
         Delete all links previously added
         """
         self.links.clear()
+        for links in self.nodeLinks.values():
+            links.clear()
 
     ###################
     @informPlotters
@@ -407,6 +562,19 @@ class Scene:
         else:
             return id
 
+    ###################
+    def packet(self,src,dst,line=LineStyle(),duration=0.5):
+        """
+        (Scene scripting command)
+        Animate a packet travelling from node src to node dst in duration
+        seconds of wall-clock time.  Plotters animate it on their own render
+        clock, so no deletion has to be scheduled by the caller.
+        """
+        if not isinstance(line,LineStyle):
+            line = self.lineStyles[line]
+        for plotter in self.plotters:
+            plotter.packet(src, dst, line, duration)
+
     ###################
     @informPlotters
     def delshape(self,id):
@@ -2,4 +2,4 @@ from .TopoVis import *
 from .common import Parameters
 
 __all__ = ['LineStyle', 'FillStyle', 'TextStyle', 'Node', 'Scene',
-		'GenericPlotter', 'Parameters']
+		'GenericPlotter', 'QueuedPlotter', 'Parameters']